@@ -0,0 +1,146 @@
+# benchmarks/batch_generation.py
+# Tokens and wall time of Easy + Medium + Hard quizzes for one article:
+# three PUT /generate_quiz calls (what users do today) vs one PUT /generate_quiz/batch call.
+# Runs the real prompts, compaction and storage against a fake Gemini that answers with
+# schema-valid quizzes; latency is modelled from input and output tokens.
+#
+#   cd backend && python benchmarks/batch_generation.py --sections 30
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("QUIZ_LLM_RPM", "100000")     # Measure the calls, not the rate limiter
+os.environ.setdefault("QUIZ_LLM_TPM", "100000000")
+
+import httpx
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+import main
+import llm_quiz_generator
+from llm_quiz_generator import quiz_llm
+from scraper_service import save_scraped_content
+from tokens import estimate_tokens
+
+URL = "https://en.wikipedia.org/wiki/Benchmark_Article"
+DIFFICULTIES = ["Easy", "Medium", "Hard"]
+
+# Rough Gemini Flash profile: fixed overhead, prompt prefill and output decoding
+LLM_BASE_MS = 600
+LLM_MS_PER_1K_INPUT = 40
+LLM_MS_PER_OUTPUT_TOKEN = 4
+
+
+def synthetic_article(sections: int, rng: random.Random):
+    words = "turing machine cipher enigma computation theory logic proof bletchley park war codebreaking algorithm".split()
+    return {
+        "title": "Benchmark Article",
+        "sections": [
+            {
+                "heading": f"Section {n}",
+                "content": " ".join(
+                    f"In {1900 + rng.randrange(100)} the {rng.choice(words)} {rng.choice(words)} of section {n} fact {i} was {rng.choice(words)}."
+                    for i in range(60)
+                ),
+                "subsections": [],
+            }
+            for n in range(sections)
+        ],
+        "summary_points": [],
+    }
+
+
+def fake_question(n, difficulty):
+    return {
+        "question": f"Which statement about fact {n} of the benchmark article is supported by the source text?",
+        "options": [f"Option {c} describing a plausible but specific detail {n}" for c in "ABCD"],
+        "answer": f"Option A describing a plausible but specific detail {n}",
+        "difficulty": difficulty.lower(),
+        "explanation": f"The source text states that fact {n} happened as described in option A.",
+        "section": "Section 1",
+    }
+
+
+def shared_fields():
+    return {
+        "title": "Benchmark Article",
+        "summary": "A synthetic article used to benchmark quiz generation. It has many sections of short factual sentences.",
+        "key_entities": {"people": ["Alan Turing"], "organizations": ["Bletchley Park"], "locations": ["England"]},
+        "sections": [f"Section {n}" for n in range(8)],
+        "related_topics": ["Cryptography", "Computability"],
+    }
+
+
+class FakeGemini:
+    def __init__(self):
+        self.modelled_ms = 0.0
+
+    async def __call__(self, prompt):
+        text = prompt.to_string()
+        variants = re.findall(r"^\s*\d+\. difficulty: (\w+)", text, re.MULTILINE) if "<VARIANTS>" in text else []
+        if variants:
+            body = {**shared_fields(), "variants": [
+                {"difficulty": d, "scope": "All", "quiz": [fake_question(i, d) for i in range(8)]} for d in variants
+            ]}
+        else:
+            difficulty = re.search(r"Difficulty Mode: (\w+)", text).group(1)
+            body = {"url": URL, **shared_fields(), "quiz": [fake_question(i, difficulty) for i in range(8)]}
+        content = json.dumps(body)
+        ms = LLM_BASE_MS + LLM_MS_PER_1K_INPUT * estimate_tokens(text) / 1000 + LLM_MS_PER_OUTPUT_TOKEN * estimate_tokens(content)
+        self.modelled_ms += ms
+        await asyncio.sleep(ms / 1000 / 50)     # Scaled down, the modelled value is what gets reported
+        return AIMessage(content=content)
+
+
+async def measure(client, fake, requests):
+    before = dict(quiz_llm.stats)
+    fake.modelled_ms = 0.0
+    for method, path, body in requests:
+        res = await client.request(method, path, json=body)
+        res.raise_for_status()
+    return (quiz_llm.stats["tokens_in"] - before["tokens_in"], quiz_llm.stats["tokens_out"] - before["tokens_out"],
+            quiz_llm.stats["calls"] - before["calls"], fake.modelled_ms)
+
+
+async def run(args):
+    fake = FakeGemini()
+    llm_quiz_generator._model = RunnableLambda(fake)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        rows = []
+        for n in range(args.rounds):
+            url = f"{URL}_{n}"  # A fresh article per round, so nothing comes from the variant cache
+            save_scraped_content(url, synthetic_article(args.sections, random.Random(n)))
+            rows.append(("3 x PUT /generate_quiz", await measure(client, fake, [
+                ("PUT", "/generate_quiz", {"url": url, "difficulty": d}) for d in DIFFICULTIES
+            ])))
+            url = f"{URL}_{n}_batch"
+            save_scraped_content(url, synthetic_article(args.sections, random.Random(n)))
+            rows.append(("1 x PUT /generate_quiz/batch", await measure(client, fake, [
+                ("PUT", "/generate_quiz/batch", {"url": url, "variants": [{"difficulty": d} for d in DIFFICULTIES]})
+            ])))
+
+    print(f"\n{args.sections} sections, Easy + Medium + Hard, mean of {args.rounds} rounds")
+    print(f"{'strategy':30} {'calls':>5} {'tokens in':>10} {'tokens out':>10} {'total':>10} {'model time':>11}")
+    summary = {}
+    for name in dict(rows):
+        values = [v for n, v in rows if n == name]
+        tin, tout, calls, ms = (sum(x) / len(values) for x in zip(*values))
+        summary[name] = (tin + tout, ms)
+        print(f"{name:30} {calls:5.0f} {tin:10,.0f} {tout:10,.0f} {tin + tout:10,.0f} {ms / 1000:10.1f}s")
+    (single_tokens, single_ms), (batch_tokens, batch_ms) = summary.values()
+    print(f"\nbatch saves {1 - batch_tokens / single_tokens:.0%} of the tokens and {1 - batch_ms / single_ms:.0%} of the model time")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sections", type=int, default=30)
+    parser.add_argument("--rounds", type=int, default=3)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,90 @@
+# benchmarks/bytes_per_request.py
+# Bytes read from the database per request, old single-row LONGTEXT layout vs the
+# split + compressed layout (article_contents / generated_quizzes).
+#
+#   cd backend && python benchmarks/bytes_per_request.py --sections 120
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from sqlalchemy import text
+from database import SessionLocal, engine, init_db, Quiz, ArticleContent, GeneratedQuiz
+from compression import pack_json
+
+URL = "https://en.wikipedia.org/wiki/World_War_II"
+WORDS = "war army navy treaty empire battle front alliance invasion government city river people year".split()
+
+
+def sentence(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(14)).capitalize() + "."
+
+
+def synthetic_article(n_sections):
+    rng = random.Random(42)
+    sections = [
+        {"heading": f"Section {i}", "content": " ".join(sentence(rng) for _ in range(25)),
+         "subsections": [{"subheading": f"Part {i}.{j}", "content": " ".join(sentence(rng) for _ in range(15))} for j in range(2)]}
+        for i in range(n_sections)
+    ]
+    return {"title": "World War II", "sections": sections, "summary_points": [sentence(rng) for _ in range(10)]}
+
+
+def synthetic_quiz(rng=random.Random(7)):
+    return {"title": "World War II", "summary": sentence(rng), "sections": ["Section 0"],
+            "quiz": [{"question": sentence(rng), "options": [sentence(rng) for _ in range(4)], "answer": "a",
+                      "difficulty": "medium", "explanation": sentence(rng), "section": "Section 0"} for _ in range(8)]}
+
+
+def row_bytes(row):
+    if row is None:
+        return 0
+    return sum(len(v.encode("utf-8") if isinstance(v, str) else v) for v in row if isinstance(v, (str, bytes)))
+
+
+def main(n_sections):
+    article, quiz = synthetic_article(n_sections), synthetic_quiz()
+    init_db()
+
+    # Old layout: everything in one row
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE legacy_quizzes (id INTEGER PRIMARY KEY, url VARCHAR(500), title VARCHAR(255), "
+                          "date_generated DATETIME, scraped_content TEXT, full_quiz_data TEXT)"))
+        conn.execute(text("INSERT INTO legacy_quizzes (url, title, scraped_content, full_quiz_data) VALUES (:u, :t, :s, :q)"),
+                     {"u": URL, "t": article["title"], "s": json.dumps(article, ensure_ascii=False), "q": json.dumps(quiz, ensure_ascii=False)})
+        legacy_row = lambda cols: conn.execute(text(f"SELECT {cols} FROM legacy_quizzes WHERE url = :u"), {"u": URL}).first()
+        old = {
+            "POST /generate_quiz (cache hit)": row_bytes(legacy_row("*")),
+            "PUT /generate_quiz": row_bytes(legacy_row("*")),
+            "GET /quiz/{id}": row_bytes(legacy_row("id, title, full_quiz_data")),
+        }
+
+    # New layout
+    db = SessionLocal()
+    entry = Quiz(url=URL, url_key=URL, title=article["title"], content=ArticleContent(data=pack_json(article)))
+    db.add(entry)
+    db.commit()
+    db.add(GeneratedQuiz(quiz_id=entry.id, data=pack_json(quiz)))
+    db.commit()
+    content = lambda: db.query(ArticleContent.data).join(Quiz, Quiz.id == ArticleContent.quiz_id).filter(Quiz.url_key == URL).first()
+    new = {
+        "POST /generate_quiz (cache hit)": row_bytes(content()),
+        "PUT /generate_quiz": row_bytes(content()) + row_bytes(db.query(Quiz.id).filter(Quiz.url_key == URL).first()),
+        "GET /quiz/{id}": row_bytes(db.query(Quiz.title, GeneratedQuiz.data).outerjoin(GeneratedQuiz, GeneratedQuiz.quiz_id == Quiz.id).filter(Quiz.id == entry.id).first()),
+    }
+    db.close()
+
+    print(f"{'request':34} {'before':>10} {'after':>10} {'ratio':>7}")
+    for name in old:
+        print(f"{name:34} {old[name]:>10,} {new[name]:>10,} {old[name] / max(new[name], 1):>6.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bytes read per request before/after the blob split")
+    parser.add_argument("--sections", type=int, default=120)
+    main(parser.parse_args().sections)
@@ -0,0 +1,111 @@
+# benchmarks/db_pool.py
+# Connection pool under concurrent quiz generation: N PUT /generate_quiz calls against a slow fake
+# Gemini while GET /history readers run alongside, with a deliberately small pool.
+# "held" keeps a session checked out for the whole LLM call (the old handler shape) for comparison.
+# Uses DATABASE_URL when set (e.g. a local MySQL), otherwise a temporary SQLite file.
+#
+#   cd backend && python benchmarks/db_pool.py --requests 20 --pool-size 2 --llm-seconds 1
+#   DATABASE_URL=mysql+pymysql://root:pw@localhost:3307/bench python benchmarks/db_pool.py
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+os.environ.setdefault("QUIZ_LLM_RPM", "100000")
+os.environ.setdefault("QUIZ_LLM_TPM", "100000000")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--pool-timeout", type=float, default=3)
+    parser.add_argument("--llm-seconds", type=float, default=1.0)
+    return parser.parse_args()
+
+
+args = parse_args()
+# The pool is built on import of database, so its size has to be in the environment first
+os.environ["DB_POOL_SIZE"] = str(args.pool_size)
+os.environ["DB_MAX_OVERFLOW"] = "0"
+os.environ["DB_POOL_TIMEOUT"] = str(args.pool_timeout)
+
+import httpx
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+import main
+import llm_quiz_generator
+from database import SessionLocal, engine, pool_metrics
+from scraper_service import save_scraped_content
+from batch_generation import synthetic_article, fake_question, shared_fields
+
+URL = "https://en.wikipedia.org/wiki/Pool_Benchmark"
+
+
+def fake_gemini(hold_session: bool):
+    async def call(prompt):
+        db = SessionLocal() if hold_session else None
+        try:
+            if db is not None:
+                await asyncio.to_thread(db.connection)     # Check out a connection like a handler holding its session
+            await asyncio.sleep(args.llm_seconds)
+            return AIMessage(content=json.dumps({"url": URL, **shared_fields(), "quiz": [fake_question(i, "easy") for i in range(5)]}))
+        finally:
+            if db is not None:
+                db.close()
+    return call
+
+
+async def readers(client, stop, latencies):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/history", params={"limit": 20})
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.05)
+
+
+async def scenario(client, name, hold_session):
+    llm_quiz_generator._model = RunnableLambda(fake_gemini(hold_session))
+    pool_metrics["checkouts"] = pool_metrics["timeouts"] = 0
+    pool_metrics["wait_ms"].clear()
+    for n in range(args.requests):
+        save_scraped_content(f"{URL}_{name}_{n}", synthetic_article(3, random.Random(n)))
+
+    stop, latencies = asyncio.Event(), []
+    reader_tasks = [asyncio.create_task(readers(client, stop, latencies)) for _ in range(args.readers)]
+    start = time.perf_counter()
+    results = await asyncio.gather(*[
+        client.put("/generate_quiz", json={"url": f"{URL}_{name}_{n}", "difficulty": "Easy"}) for n in range(args.requests)
+    ])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await asyncio.gather(*reader_tasks)
+
+    stats = (await client.get("/db_stats")).json()
+    ok = sum(r.status_code == 200 for r in results)
+    latencies.sort()
+    print(f"{name:9} {ok:>3}/{args.requests} ok {elapsed:7.2f}s  checkout wait p95 {stats.get('wait_p95_ms', 0):8.1f}ms "
+          f"max {stats.get('wait_max_ms', 0):8.1f}ms  timeouts {stats['timeouts']:3}  "
+          f"/history p95 {latencies[int(len(latencies) * 0.95)] if latencies else 0:7.1f}ms")
+
+
+async def run():
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)    # Pool timeouts become 500s, counted below
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        print(f"{engine.url.get_backend_name()}, pool {args.pool_size} (no overflow), {args.requests} quizzes, "
+              f"{args.readers} /history readers, {args.llm_seconds}s per LLM call")
+        await scenario(client, "held", hold_session=True)
+        await scenario(client, "released", hold_session=False)
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,151 @@
+# benchmarks/dedupe_corpus.py
+# Hit rate and false positives of the near-duplicate detection (fingerprint.py + scraper_service.find_duplicate_article)
+# on a generated corpus. Base articles are stored through save_scraped_content, then other "URLs" are looked up:
+#   should match      redirect (same text), reformatted (whitespace/case), revisions with 1-5% of sentences edited
+#   should not match  unrelated articles, sibling articles sharing 40% of their sentences (series/list pages),
+#                     heavy rewrites (30% of sentences edited, its stored quizzes would be stale)
+# Text is Zipf-distributed words plus per-article topic words, so common phrases overlap like in real articles.
+#
+#   cd backend && python benchmarks/dedupe_corpus.py --articles 300
+import argparse
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/dedupe.db")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from database import init_db
+from fingerprint import fingerprint, ARTICLE_DEDUPE_THRESHOLD
+from scraper_service import save_scraped_content, find_duplicate_article
+from timings import percentile
+
+THRESHOLDS = (0.6, 0.7, 0.8, 0.9, 0.95)
+SHOULD_MATCH = ("redirect", "reformatted", "revision 1%", "revision 3%", "revision 5%")
+SHOULD_NOT_MATCH = ("unrelated", "sibling 40%", "rewrite 30%")
+
+
+class Corpus:
+    def __init__(self, seed: int, vocabulary: int = 30000):
+        self.rng = random.Random(seed)
+        self.words = ["".join(self.rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(self.rng.randint(2, 9))) for _ in range(vocabulary)]
+        self.cum_weights = list(itertools.accumulate(1 / (rank + 1) ** 1.1 for rank in range(vocabulary)))   # Zipf, "the of and ..." dominate
+
+    def sentence(self, topic):
+        words = self.rng.choices(self.words, cum_weights=self.cum_weights, k=self.rng.randint(8, 25))
+        words = [self.rng.choice(topic) if self.rng.random() < 0.12 else w for w in words]
+        return " ".join(words).capitalize() + "."
+
+    def article(self, n):
+        topic = self.rng.sample(self.words, 40)
+        sections = []
+        for s in range(self.rng.randint(5, 9)):
+            paragraphs = [[self.sentence(topic) for _ in range(self.rng.randint(3, 6))] for _ in range(self.rng.randint(2, 5))]
+            sections.append({"heading": f"Section {s} {topic[s]}".title(), "paragraphs": paragraphs, "topic": topic})
+        return {"title": f"Article {n}", "sections": sections}
+
+    def edited(self, article, share):
+        """Copy with `share` of the sentences replaced, deleted, or preceded by an inserted sentence."""
+        sections = []
+        for s in article["sections"]:
+            paragraphs = []
+            for paragraph in s["paragraphs"]:
+                out = []
+                for sentence in paragraph:
+                    if self.rng.random() >= share:
+                        out.append(sentence)
+                        continue
+                    edit = self.rng.choice(("replace", "delete", "insert"))
+                    if edit != "delete":
+                        out.append(self.sentence(s["topic"]))
+                    if edit == "insert":
+                        out.append(sentence)
+                paragraphs.append(out)
+            sections.append({**s, "paragraphs": paragraphs})
+        return {**article, "sections": sections}
+
+    def sibling(self, article, shared):
+        """Different article reusing `shared` of the sentences of another (series and list pages)."""
+        other = self.article(-1)
+        donor = [sentence for s in article["sections"] for p in s["paragraphs"] for sentence in p]
+        for s in other["sections"]:
+            s["paragraphs"] = [[self.rng.choice(donor) if self.rng.random() < shared else x for x in p] for p in s["paragraphs"]]
+        return other
+
+
+def scraped(article, reformat=False):
+    """Article -> scraper output ({title, sections: [{heading, content, subsections}]})."""
+    sections = []
+    for s in article["sections"]:
+        joiner = "  " if reformat else " "
+        content = "".join(" " + joiner.join(p) for p in s["paragraphs"])
+        sections.append({"heading": s["heading"].upper() if reformat else s["heading"], "content": content, "subsections": []})
+    return {"title": article["title"], "sections": sections, "summary_points": []}
+
+
+def main(args):
+    init_db()
+    corpus = Corpus(args.seed)
+    bases = [corpus.article(n) for n in range(args.articles)]
+    start = time.perf_counter()
+    ids = {}
+    for n, article in enumerate(bases):
+        save_scraped_content(f"https://en.wikipedia.org/wiki/Article_{n}", scraped(article))
+        ids[n] = n + 1
+    print(f"{args.articles} articles stored with fingerprints in {time.perf_counter() - start:.1f}s")
+
+    queries = []    # (category, expected quiz id or None, scraped data)
+    for n in corpus.rng.sample(range(args.articles), min(args.queries, args.articles)):
+        base = bases[n]
+        queries += [
+            ("redirect", ids[n], scraped(base)),
+            ("reformatted", ids[n], scraped(base, reformat=True)),
+            ("revision 1%", ids[n], scraped(corpus.edited(base, 0.01))),
+            ("revision 3%", ids[n], scraped(corpus.edited(base, 0.03))),
+            ("revision 5%", ids[n], scraped(corpus.edited(base, 0.05))),
+            ("unrelated", None, scraped(corpus.article(-1))),
+            ("sibling 40%", None, scraped(corpus.sibling(base, 0.4))),
+            ("rewrite 30%", None, scraped(corpus.edited(base, 0.3))),
+        ]
+
+    results, fingerprint_ms, lookup_ms = [], [], []
+    for category, expected, data in queries:
+        t0 = time.perf_counter()
+        fingerprint(data)
+        t1 = time.perf_counter()
+        _, match = find_duplicate_article(data, threshold=1e-9)     # Best candidate and its score, thresholds applied below
+        t2 = time.perf_counter()
+        fingerprint_ms.append((t1 - t0) * 1000)
+        lookup_ms.append((t2 - t1) * 1000)
+        words = sum(len(s["content"].split()) for s in data["sections"])
+        wrong = match is not None and expected is not None and match["quiz_id"] != expected
+        results.append((category, expected, match["similarity"] if match and not wrong else 0.0, wrong, words))
+
+    print(f"{len(queries)} lookups, {percentile([r[4] for r in results], 50):.0f} words per article (p50). "
+          f"fingerprint p50 {percentile(fingerprint_ms, 50):.1f}ms, fingerprint + lookup p50 {percentile(lookup_ms, 50):.1f}ms "
+          f"p95 {percentile(lookup_ms, 95):.1f}ms")
+    print(f"\n{'category':14} {'score p5':>9} {'p50':>6} {'p95':>6}  " + "  ".join(f"@{t:<5}" for t in THRESHOLDS))
+    for category in SHOULD_MATCH + SHOULD_NOT_MATCH:
+        scores = [r[2] for r in results if r[0] == category]
+        rates = "  ".join(f"{sum(s >= t for s in scores) / len(scores):6.1%}" for t in THRESHOLDS)
+        print(f"{category:14} {percentile(scores, 5):9.3f} {percentile(scores, 50):6.3f} {percentile(scores, 95):6.3f}  {rates}")
+    wrong = sum(r[3] for r in results)
+    print(f"\nRows are the share reused at each threshold: hit rate for {', '.join(SHOULD_MATCH)};")
+    print(f"false positives for {', '.join(SHOULD_NOT_MATCH)}. Matches to the wrong article: {wrong}.")
+    positives = [r[2] for r in results if r[0] in SHOULD_MATCH]
+    negatives = [r[2] for r in results if r[0] in SHOULD_NOT_MATCH]
+    t = ARTICLE_DEDUPE_THRESHOLD
+    print(f"At ARTICLE_DEDUPE_THRESHOLD={t}: hit rate {sum(s >= t for s in positives) / len(positives):.1%}, "
+          f"false positive rate {sum(s >= t for s in negatives) / len(negatives):.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=300)
+    parser.add_argument("--queries", type=int, default=100, help="Stored articles each variant kind is derived from")
+    parser.add_argument("--seed", type=int, default=7)
+    main(parser.parse_args())
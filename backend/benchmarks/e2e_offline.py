@@ -0,0 +1,132 @@
+# benchmarks/e2e_offline.py
+# End-to-end load test of the whole FastAPI app with no network: Wikipedia is a stub serving Parsoid HTML
+# built from sample_data/, the quiz and summary models are the LLM_BACKEND offline backends (synthetic by
+# default, or replay of answers recorded with LLM_BACKEND=record). Every simulated user scrapes an article
+# (POST /generate_quiz), generates a quiz (PUT), reads it back and pages the history; a share submits
+# background jobs instead. Reports latency per endpoint and the per-stage timings.
+#
+#   cd backend && python benchmarks/e2e_offline.py --users 40 --articles 20
+#   LLM_BACKEND=replay LLM_REPLAY_SPEED=0.5 python benchmarks/e2e_offline.py
+import argparse
+import asyncio
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/e2e.db")
+os.environ.setdefault("GOOGLE_API_KEY", "offline")
+os.environ.setdefault("LLM_BACKEND", "synthetic")
+os.environ.setdefault("LLM_SYNTHETIC_LATENCY", "lognormal:0.5,0.4")
+os.environ.setdefault("QUIZ_LLM_RPM", "100000")     # Measure the app, not the Gemini quota
+os.environ.setdefault("QUIZ_LLM_TPM", "100000000")
+os.environ.setdefault("SUMMARY_LLM_RPM", "100000")
+os.environ.setdefault("SUMMARY_LLM_TPM", "100000000")
+os.environ.setdefault("WIKI_FETCH_BACKEND", "rest")
+os.environ.setdefault("WIKI_REST_BASE_URL", "http://wikipedia.offline")
+
+import httpx
+import main
+import scraper
+from llm_backends import sample_quiz, LLM_BACKEND
+from timings import stage_stats, percentile
+
+DIFFICULTIES = ["Easy", "Medium", "Hard"]
+
+
+def article_html(title: str, rng: random.Random):
+    """Parsoid-style page whose sentences come from the sample_data quiz (summary, questions, explanations)."""
+    sample = sample_quiz()
+    sentences = [sample["summary"]] + [q["explanation"] or q["question"] for q in sample["quiz"]] + [q["question"] for q in sample["quiz"]]
+    sections = []
+    for n, heading in enumerate(["Early life", "Career", "Research", "Legacy", "Recognition", "References"]):
+        paragraphs = "".join(f"<p>{' '.join(rng.choice(sentences) for _ in range(6))}</p>" for _ in range(4))
+        sections.append(f"<section><h2>{heading}</h2>{paragraphs}</section>")
+    return f"<html><head><title>{title}</title></head><body><p>{sample['summary']}</p>{''.join(sections)}</body></html>"
+
+
+def wikipedia_stub(fetches):
+    def handler(request: httpx.Request):
+        title = request.url.path.rsplit("/", 1)[-1]
+        fetches[title] += 1
+        html = article_html(title.replace("_", " "), random.Random(title))
+        return httpx.Response(200, text=html, headers={"etag": f'W/"{1000 + len(title)}/offline"', "content-type": "text/html"})
+    return handler
+
+
+async def timed(latencies, name, request):
+    start = time.perf_counter()
+    res = await request
+    latencies[name].append((time.perf_counter() - start) * 1000)
+    latencies[f"{name} status"].append(res.status_code)
+    return res
+
+
+async def user(client, n, articles, latencies, rng):
+    url = f"https://en.wikipedia.org/wiki/Offline_Article_{rng.randrange(articles)}"
+    await timed(latencies, "POST /generate_quiz", client.post("/generate_quiz", json={"url": url}))
+    difficulty = rng.choice(DIFFICULTIES)
+    if n % 5 == 4:
+        # Background job, polled until done
+        res = await timed(latencies, "POST /jobs/generate_quiz", client.post("/jobs/generate_quiz", json={"url": url, "difficulty": difficulty}))
+        job_id = res.json()["id"]
+        start = time.perf_counter()
+        while (await client.get(f"/jobs/{job_id}/result")).status_code == 202:
+            await asyncio.sleep(0.1)
+        latencies["job end to end"].append((time.perf_counter() - start) * 1000)
+        return
+    res = await timed(latencies, "PUT /generate_quiz", client.put("/generate_quiz", json={"url": url, "difficulty": difficulty}))
+    if res.status_code == 200:
+        quiz_id = res.json()["quiz_id"]
+        await timed(latencies, "GET /quiz/{id}", client.get(f"/quiz/{quiz_id}"))
+    await timed(latencies, "GET /history", client.get("/history", params={"limit": 20}))
+
+
+async def run(args):
+    fetches = defaultdict(int)
+    latencies = defaultdict(list)
+    rng = random.Random(args.seed)
+    async with main.lifespan(main.app):     # Job workers as in production
+        # The scraper's shared client, pointed at the stub for this event loop
+        scraper._client = httpx.AsyncClient(transport=httpx.MockTransport(wikipedia_stub(fetches)))
+        scraper._client_loop = asyncio.get_running_loop()
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://e2e", timeout=None) as client:
+            start = time.perf_counter()
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def one(n):
+                async with semaphore:
+                    await user(client, n, args.articles, latencies, random.Random(rng.random()))
+
+            await asyncio.gather(*(one(n) for n in range(args.users)))
+            elapsed = time.perf_counter() - start
+            metrics_text = (await client.get("/metrics")).text
+
+    print(f"\nLLM_BACKEND={LLM_BACKEND}, {args.users} users ({args.concurrency} at once), {args.articles} articles, "
+          f"{sum(fetches.values())} Wikipedia fetches, {elapsed:.1f}s")
+    print(f"{'endpoint':26} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}  statuses")
+    for name, values in sorted(latencies.items()):
+        if name.endswith(" status"):
+            continue
+        statuses = latencies.get(f"{name} status", [])
+        counts = ", ".join(f"{code} x{statuses.count(code)}" for code in sorted(set(statuses)))
+        print(f"{name:26} {len(values):6} {percentile(values, 50):8.0f} {percentile(values, 95):8.0f} {max(values):8.0f}  {counts}")
+    print(f"\n{'stage':26} {'count':>6} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, stats in sorted(stage_stats().items()):
+        print(f"{name:26} {stats['count']:6} {stats['p50_ms']:8.1f} {stats['p95_ms']:8.1f}")
+    tokens = re.findall(r'quiz_llm_tokens_total\{client="(\w+)",direction="(\w+)"\} (\d+)', metrics_text)
+    print("\nLLM tokens: " + ", ".join(f"{client} {direction} {value}" for client, direction, value in tokens))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--articles", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,66 @@
+# benchmarks/history_under_load.py
+# Measures /history latency while many quiz generations are in flight.
+# The LLM is replaced with a slow async stub so no API key is needed.
+#
+#   cd backend && python benchmarks/history_under_load.py --generations 50 --llm-delay 2
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+import httpx
+import main
+from scraper_service import save_scraped_content
+
+URL = "https://en.wikipedia.org/wiki/Alan_Turing"
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def run(generations: int, llm_delay: float, probes: int):
+    async def slow_generate_quiz(article_title, structured_content, difficulty="Medium", selected_sections=None):
+        await asyncio.sleep(llm_delay)  # Simulated Gemini latency
+        return {"title": article_title, "quiz": []}
+
+    main.generate_quiz = slow_generate_quiz
+    save_scraped_content(URL, {"title": "Alan Turing", "sections": [{"heading": "Early Life", "content": "text", "subsections": []}]})
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def probe_history():
+            latencies = []
+            for _ in range(probes):
+                start = time.perf_counter()
+                res = await client.get("/history")
+                res.raise_for_status()
+                latencies.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(llm_delay / probes)
+            return latencies
+
+        baseline = await probe_history()
+        jobs = [client.put("/generate_quiz", json={"url": URL, "difficulty": "Medium"}) for _ in range(generations)]
+        loaded, *responses = await asyncio.gather(probe_history(), *jobs)
+
+    failed = sum(1 for r in responses if r.status_code != 200)
+    for label, values in (("idle", baseline), (f"{generations} generations", loaded)):
+        print(f"/history [{label}] p50={statistics.median(values):.1f}ms p99={percentile(values, 99):.1f}ms max={max(values):.1f}ms")
+    print(f"generation failures: {failed}/{generations}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="/history latency under quiz generation load")
+    parser.add_argument("--generations", type=int, default=50)
+    parser.add_argument("--llm-delay", type=float, default=2.0)
+    parser.add_argument("--probes", type=int, default=40)
+    args = parser.parse_args()
+    asyncio.run(run(args.generations, args.llm_delay, args.probes))
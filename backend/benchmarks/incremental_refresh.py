@@ -0,0 +1,110 @@
+# benchmarks/incremental_refresh.py
+# Cost of refreshing an article that changed upstream: full regeneration (new summary + new quiz, what
+# _revalidate and PUT /generate_quiz did before) against incremental.py (keep the summary points and questions
+# about unchanged sections, regenerate the rest). Articles come from the dedupe_corpus generator, each gets a
+# summary and a quiz, then revisions with 1, 2 or 4 sections rewritten are refreshed both ways. The models are
+# the synthetic offline backend with a per-output-token cost, so wall time follows the tokens generated.
+#
+#   cd backend && python benchmarks/incremental_refresh.py --articles 20
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))   # dedupe_corpus
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/incremental.db")
+os.environ.setdefault("GOOGLE_API_KEY", "offline")
+os.environ["LLM_BACKEND"] = "synthetic"
+os.environ.setdefault("LLM_SYNTHETIC_LATENCY", "fixed:0.2")
+os.environ.setdefault("LLM_SYNTHETIC_MS_PER_OUTPUT_TOKEN", "2")
+os.environ.setdefault("QUIZ_LLM_RPM", "100000")
+os.environ.setdefault("QUIZ_LLM_TPM", "100000000")
+os.environ.setdefault("SUMMARY_LLM_RPM", "100000")
+os.environ.setdefault("SUMMARY_LLM_TPM", "100000000")
+
+from dedupe_corpus import Corpus, scraped
+from incremental import refresh_summary, refresh_quiz, section_hashes, refresh_stats
+from llm_client import llm_stats
+from llm_quiz_generator import generate_quiz
+from llm_summary_extractor import generate_summary_points
+from scraper_service import summary_source
+
+DIFFICULTY = "Medium"
+
+
+def rewrite_sections(corpus: Corpus, article: dict, count: int):
+    """Revision with `count` sections rewritten (half of their sentences edited), the others untouched."""
+    changed = set(corpus.rng.sample(range(len(article["sections"])), count))
+    edited = corpus.edited(article, 0.5)
+    return {**article, "sections": [edited["sections"][n] if n in changed else s for n, s in enumerate(article["sections"])]}
+
+
+def totals():
+    stats = llm_stats()
+    return {key: sum(s[key] for s in stats.values()) for key in ("calls", "tokens_in", "tokens_out")}
+
+
+async def measure(name, results, coroutines):
+    before, start = totals(), time.perf_counter()
+    outputs = await asyncio.gather(*coroutines)
+    after = totals()
+    results[name] = {**{key: after[key] - before[key] for key in after}, "seconds": time.perf_counter() - start}
+    return outputs
+
+
+async def full(data):
+    points = await generate_summary_points(data["title"], summary_source(data))
+    quiz = await generate_quiz(data["title"], data, DIFFICULTY)
+    return points, quiz
+
+
+async def incremental(old, new):
+    points = await refresh_summary(old, new)
+    if points is None:
+        points = await generate_summary_points(new["title"], summary_source(new))
+    quiz = await refresh_quiz(new, DIFFICULTY, None, {"quiz": old["quiz"], "section_hashes": old["section_hashes"]})
+    if quiz is None:
+        quiz = await generate_quiz(new["title"], new, DIFFICULTY)
+    return points, quiz
+
+
+async def run(args):
+    corpus = Corpus(args.seed)
+    articles = [corpus.article(n) for n in range(args.articles)]
+    base = [scraped(a) for a in articles]
+    for data, (points, quiz) in zip(base, await asyncio.gather(*(full(d) for d in base))):
+        data.update(summary_points=points, quiz=quiz, section_hashes=section_hashes(data))
+    sections = sum(len(a["sections"]) for a in articles) / len(articles)
+    print(f"{args.articles} articles, {sections:.1f} sections each (mean), "
+          f"{sum(len(d['quiz']['quiz']) for d in base) / len(base):.1f} questions and "
+          f"{sum(len(d['summary_points']) for d in base) / len(base):.1f} summary points each")
+
+    print(f"\n{'changed':>8} {'mode':12} {'LLM calls':>10} {'tokens in':>10} {'tokens out':>11} {'wall s':>7}  kept")
+    for count in args.changed:
+        revisions = [scraped(rewrite_sections(corpus, a, count)) for a in articles]
+        results = {}
+        await measure("full", results, [full(r) for r in revisions])
+        before = {kind: dict(s) for kind, s in refresh_stats.items()}
+        outputs = await measure("incremental", results, [incremental(old, new) for old, new in zip(base, revisions)])
+        kept = {kind: refresh_stats[kind]["kept"] - before[kind]["kept"] for kind in refresh_stats}
+        fallbacks = sum(refresh_stats[kind]["full"] - before[kind]["full"] for kind in refresh_stats)
+        for mode, r in results.items():
+            note = ""
+            if mode == "incremental":
+                questions = sum(len(q["quiz"]) for _, q in outputs)
+                note = (f"{kept['quiz']}/{questions} questions, {kept['summary']}/{sum(len(p) for p, _ in outputs)} points"
+                        + (f", {fallbacks} full fallbacks" if fallbacks else ""))
+            print(f"{count:>8} {mode:12} {r['calls']:10} {r['tokens_in']:10} {r['tokens_out']:11} {r['seconds']:7.1f}  {note}")
+        saved = 1 - results["incremental"]["tokens_out"] / max(results["full"]["tokens_out"], 1)
+        print(f"{'':>8} {'saved':12} {'':>10} {1 - results['incremental']['tokens_in'] / max(results['full']['tokens_in'], 1):10.0%} {saved:11.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--articles", type=int, default=20)
+    parser.add_argument("--changed", type=int, nargs="+", default=[1, 2, 4], help="Sections rewritten per revision")
+    parser.add_argument("--seed", type=int, default=11)
+    asyncio.run(run(parser.parse_args()))
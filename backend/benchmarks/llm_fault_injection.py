@@ -0,0 +1,144 @@
+# benchmarks/llm_fault_injection.py
+# Exercises llm_client.LLMClient against a fake chat model that injects latency, 429s, 503s,
+# a server-side quota and an outage window. No API key or network is needed.
+# Compares a bare ainvoke (what the app did before) with the client, with and without hedging.
+#
+#   cd backend && python benchmarks/llm_fault_injection.py --requests 300 --concurrency 30
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Scaled down timings so a run takes seconds, not minutes
+os.environ.setdefault("LLM_BACKOFF_BASE", "0.05")
+os.environ.setdefault("LLM_BACKOFF_MAX", "1")
+os.environ.setdefault("LLM_BREAKER_RESET_SECONDS", "0.5")
+os.environ.setdefault("LLM_BURST_SECONDS", "0.1")    # The fake quota is per second instead of per minute
+
+from langchain_core.runnables import RunnableLambda
+import llm_client
+from llm_client import LLMClient, LLMUnavailableError
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"{status_code} from fake model")
+        self.status_code = status_code
+
+
+class FakeChatModel:
+    """Lognormal latency with a slow tail, random 429/503s, a requests/second quota and an optional outage window."""
+
+    def __init__(self, median: float, tail: float, throttle_rate: float, error_rate: float, quota_per_second: float, outage=None):
+        self.median, self.tail = median, tail
+        self.throttle_rate, self.error_rate = throttle_rate, error_rate
+        self.quota_per_second = quota_per_second
+        self.outage = outage    # (start, end) seconds after the first call
+        self.recent = deque()
+        self.start = None
+        self.calls = 0
+
+    async def __call__(self, inputs):
+        now = time.monotonic()
+        self.start = self.start or now
+        self.calls += 1
+        while self.recent and now - self.recent[0] > 1:
+            self.recent.popleft()
+        self.recent.append(now)
+        if self.outage and self.outage[0] <= now - self.start < self.outage[1]:
+            await asyncio.sleep(0.01)
+            raise FakeAPIError(503)
+        if len(self.recent) > self.quota_per_second or random.random() < self.throttle_rate:
+            await asyncio.sleep(0.01)
+            raise FakeAPIError(429)
+        latency = self.median * random.lognormvariate(0, self.tail)
+        await asyncio.sleep(latency)
+        if random.random() < self.error_rate:
+            raise FakeAPIError(503)
+        return {"ok": True}
+
+    def runnable(self):
+        return RunnableLambda(self)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else float("nan")
+
+
+async def run_scenario(name, fake, client, requests, concurrency):
+    runnable = fake.runnable()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures, fast_fails = [], 0, 0
+
+    async def one(i):
+        nonlocal failures, fast_fails
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if client is None:
+                    await runnable.ainvoke({"i": i})
+                else:
+                    await client.ainvoke(runnable, {"i": i}, tokens=1)
+                latencies.append(time.perf_counter() - start)
+            except LLMUnavailableError as e:
+                failures += 1
+                fast_fails += "breaker open" in str(e)
+            except Exception:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    stats = client.get_stats() if client else {}
+    print(
+        f"{name:<22} ok {len(latencies):>4}/{requests:<4} fail {failures:>4} (breaker {fast_fails:>3}) | "
+        f"p50 {percentile(latencies, 50) * 1000:7.0f}ms p95 {percentile(latencies, 95) * 1000:7.0f}ms "
+        f"p99 {percentile(latencies, 99) * 1000:7.0f}ms | model calls {fake.calls:>4} | "
+        f"retries {stats.get('retries', 0):>4} throttled {stats.get('throttled', 0):>4} "
+        f"hedged {stats.get('hedged', 0):>3} wins {stats.get('hedge_wins', 0):>3} breaker opened {stats.get('breaker_opened', 0)} | {elapsed:.1f}s"
+    )
+
+
+async def main(args):
+    def fake(**overrides):
+        settings = dict(median=args.median, tail=args.tail, throttle_rate=args.throttle_rate,
+                        error_rate=args.error_rate, quota_per_second=args.quota)
+        settings.update(overrides)
+        return FakeChatModel(**settings)
+
+    rpm = args.quota * 60
+    print(f"{args.requests} requests, {args.concurrency} concurrent, model quota {args.quota}/s, "
+          f"{args.throttle_rate:.0%} random 429, {args.error_rate:.0%} random 503\n")
+    await run_scenario("bare ainvoke", fake(), None, args.requests, args.concurrency)
+    await run_scenario("client", fake(), LLMClient("bench", rpm, 1e9, hedge_percentile=0),
+                       args.requests, args.concurrency)
+
+    # Hedging needs a latency history, warm the client first
+    hedged = LLMClient("bench-hedged", rpm, 1e9, hedge_percentile=args.hedge_percentile)
+    await run_scenario("client warm-up", fake(), hedged, 40, args.concurrency)
+    await run_scenario(f"client + hedge p{args.hedge_percentile:g}", fake(), hedged, args.requests, args.concurrency)
+
+    # The model is down for a while in the middle of the run, the breaker should fail fast and recover
+    outage = fake(outage=(0.5, 1.0))
+    await run_scenario("outage, bare", outage, None, args.requests, args.concurrency)
+    outage = fake(outage=(0.5, 1.0))
+    await run_scenario("outage, client", outage, LLMClient("bench-outage", rpm, 1e9, hedge_percentile=0),
+                       args.requests, args.concurrency)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=30)
+    parser.add_argument("--median", type=float, default=0.1, help="Median model latency, seconds")
+    parser.add_argument("--tail", type=float, default=0.6, help="Lognormal sigma of the latency")
+    parser.add_argument("--throttle-rate", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.03)
+    parser.add_argument("--quota", type=float, default=100, help="Requests per second the fake model accepts")
+    parser.add_argument("--hedge-percentile", type=float, default=90)
+    asyncio.run(main(parser.parse_args()))
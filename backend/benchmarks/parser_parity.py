@@ -0,0 +1,112 @@
+# benchmarks/parser_parity.py
+# Checks that the lxml fast path (scraper.parse_wikipedia) returns exactly what the BeautifulSoup
+# implementation (scraper.parse_wikipedia_bs4) returns, then times both.
+# Runs on generated Wikipedia-like pages, or on saved article HTML passed with --html. A saved page with a
+# .json next to it (tests/fixtures/wikipedia/, see tests/test_parser_parity.py) must also match that golden output,
+# --write-golden rewrites it with the current parse_wikipedia output.
+#
+#   cd backend && python benchmarks/parser_parity.py --sections 80
+#   cd backend && python benchmarks/parser_parity.py --html tests/fixtures/wikipedia/*.html
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scraper import parse_wikipedia, parse_wikipedia_bs4
+
+WORDS = "Turing worked at Bletchley Park on the Enigma machine and later proposed a test for machine intelligence".split()
+
+
+def words(rng, n):
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def paragraph(rng):
+    # Inline markup, citations, entities, comments, hidden styles and non-breaking spaces
+    return (f"<p>{words(rng, 12)} <a href='/wiki/X'>{words(rng, 2)}</a><sup class='reference'><a>[{rng.randint(1, 99)}]</a></sup>"
+            f" &amp; {words(rng, 6)}<!-- editor note --> <b>{words(rng, 3)}</b>&nbsp;<i>{words(rng, 2)}</i>"
+            f"<style>.mw-parser-output .x{{color:red}}</style> <span class='texhtml'>x<sup>2</sup></span>.</p>\n")
+
+
+def heading(level, text, legacy):
+    if legacy:  # Pre-2024 markup, the [edit] link lives inside the heading
+        return (f"<h{level}><span class='mw-headline' id='{text}'>{text}</span><span class='mw-editsection'>"
+                f"<span class='mw-editsection-bracket'>[</span><a>edit</a><span class='mw-editsection-bracket'>]</span></span></h{level}>\n")
+    return (f"<div class='mw-heading mw-heading{level}'><h{level} id='{text}'>{text}</h{level}>"
+            f"<span class='mw-editsection'>[<a>edit</a>]</span></div>\n")
+
+
+def synthetic_page(n_sections, seed=0, legacy=False):
+    rng = random.Random(seed)
+    body = ["<table class='infobox'><tr><th>Born</th><td><p>in infobox</p><ul><li>hidden</li></ul></td></tr></table>",
+            paragraph(rng), paragraph(rng)]   # Lead, dropped by the parser since it has no h2 yet
+    for i in range(n_sections):
+        body.append(heading(2, f"Section {i} history", legacy))
+        body += [paragraph(rng) for _ in range(rng.randint(1, 4))]
+        body.append(f"<ul><li>{words(rng, 5)}<ul><li>{words(rng, 4)}</li></ul></li><li>{words(rng, 3)}</li></ul>\n")
+        for j in range(rng.randint(0, 3)):
+            body.append(heading(3, f"Part {i}.{j}", legacy))
+            body += [paragraph(rng) for _ in range(rng.randint(1, 3))]
+            body.append(f"<table class='wikitable'><tr><td>{words(rng, 4)}</td></tr></table>")
+        if i % 7 == 3:
+            body.append("<div class='thumb'><div class='thumbcaption'><p>Figure caption</p></div></div>")
+    for excluded in ("See also", "References", "External links"):
+        body.append(heading(2, excluded, legacy))
+        body.append(f"<ul><li>{words(rng, 4)}</li></ul><p>{words(rng, 5)}</p>")
+    return ("<!DOCTYPE html><html><head><title>T</title><script>var x = '<p>no</p>';</script></head><body>"
+            "<h1 id='firstHeading' class='firstHeading'><span class='mw-page-title-main'>Alan Turing</span></h1>"
+            "<div id='bodyContent'><div id='mw-content-text' class='mw-body-content'><div class='mw-parser-output'>"
+            + "".join(body) + "</div></div></div><div id='footer'><p>footer</p></div></body></html>")
+
+
+def timed(fn, html, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(html)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main(args):
+    pages = []
+    for path in args.html:
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        golden_path = os.path.splitext(path)[0] + ".json"
+        if args.write_golden:
+            with open(golden_path, "w", encoding="utf-8") as f:
+                json.dump(parse_wikipedia(html), f, indent=2, ensure_ascii=False)
+                f.write("\n")
+        golden = None
+        if os.path.exists(golden_path):
+            with open(golden_path, encoding="utf-8") as f:
+                golden = json.load(f)
+        pages.append((os.path.basename(path), html, golden))
+    if not pages:
+        pages = [(f"synthetic-{n}{'-legacy' if legacy else ''}", synthetic_page(n, seed=n, legacy=legacy), None)
+                 for n in (5, args.sections) for legacy in (False, True)]
+
+    failures = 0
+    print(f"{'page':28} {'KB':>7} {'parity':>7} {'bs4 ms':>8} {'lxml ms':>8} {'speedup':>8}")
+    for name, html, golden in pages:
+        parsed = parse_wikipedia(html)
+        same = parsed == parse_wikipedia_bs4(html) and (golden is None or parsed == golden)
+        failures += not same
+        bs4_ms, lxml_ms = timed(parse_wikipedia_bs4, html, args.repeat), timed(parse_wikipedia, html, args.repeat)
+        print(f"{name:28} {len(html) / 1024:>7.0f} {'ok' if same else 'DIFF':>7} {bs4_ms:>8.1f} {lxml_ms:>8.1f} {bs4_ms / lxml_ms:>7.1f}x")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parity check and microbenchmark of the Wikipedia parsers")
+    parser.add_argument("--html", nargs="*", default=[])
+    parser.add_argument("--write-golden", action="store_true", help="Rewrite the .json next to each --html page")
+    parser.add_argument("--sections", type=int, default=80)
+    parser.add_argument("--repeat", type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,115 @@
+# benchmarks/read_throughput.py
+# Requests per second of GET /quiz/{id}: the previous handler (decompress, json.loads, FastAPI re-encodes
+# the dict) against the current one (stored bytes spliced into the body) without and with the hot-quiz
+# LRU, plus the bytes sent with gzip. In-process over ASGI, so it measures the app's own CPU per request.
+#
+#   cd backend && python benchmarks/read_throughput.py --requests 2000 --concurrency 20
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+import httpx
+from fastapi import HTTPException
+import main
+from database import SessionLocal, Quiz, GeneratedQuiz
+from compression import unpack_json
+from response_cache import quiz_cache
+from scraper_service import save_scraped_content, save_quiz_data, quiz_variant_key, list_quiz_variants
+
+QUIZZES = 50
+WORDS = "turing machine cipher enigma computation theory logic proof bletchley park war codebreaking algorithm".split()
+
+
+@main.app.get("/bench/previous_quiz/{quiz_id}")
+def previous_get_quiz(quiz_id: int, variant_id: int | None = None):
+    """GET /quiz/{id} as it was before: the stored quiz is decoded and FastAPI serializes it again."""
+    db = SessionLocal()
+    try:
+        title = db.query(Quiz.title).filter(Quiz.id == quiz_id).scalar()
+        if title is None:
+            raise HTTPException(status_code=404, detail="Quiz not found.")
+        variants = list_quiz_variants(db, [quiz_id])[quiz_id]
+        if variant_id is None and variants:
+            variant_id = variants[-1]["id"]
+        data = db.query(GeneratedQuiz.data).filter(GeneratedQuiz.id == variant_id).scalar() if variant_id else None
+        quiz_data = unpack_json(data) if data else {}
+        return {'title': title, 'quiz_data': quiz_data, 'variant_id': variant_id, 'variants': variants}
+    finally:
+        db.close()
+
+
+def text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def seed():
+    rng = random.Random(3)
+    for n in range(QUIZZES):
+        url = f"https://en.wikipedia.org/wiki/Read_Benchmark_{n}"
+        article = {"title": f"Read Benchmark {n}", "sections": [{"heading": "Intro", "content": text(rng, 50), "subsections": []}], "summary_points": []}
+        save_scraped_content(url, article)
+        quiz = {
+            "url": url, "title": article["title"], "summary": text(rng, 60),
+            "key_entities": {"people": [text(rng, 2) for _ in range(5)], "organizations": [text(rng, 2) for _ in range(5)], "locations": [text(rng, 2) for _ in range(5)]},
+            "sections": [f"Section {i}" for i in range(10)], "related_topics": [text(rng, 3) for _ in range(6)],
+            "quiz": [{"question": text(rng, 20), "options": [text(rng, 8) for _ in range(4)], "answer": text(rng, 8),
+                      "difficulty": "medium", "explanation": text(rng, 40), "section": "Section 1"} for _ in range(10)],
+        }
+        for difficulty in ("Easy", "Medium", "Hard"):
+            save_quiz_data(url, quiz, quiz_variant_key(article, difficulty, None))
+
+
+async def measure(client, path, total, concurrency, headers):
+    ids = [random.randrange(1, QUIZZES + 1) for _ in range(total)]
+    sent = 0
+
+    async def worker(chunk):
+        nonlocal sent
+        for quiz_id in chunk:
+            res = await client.get(path.format(quiz_id), headers=headers)
+            res.raise_for_status()
+            sent += int(res.headers.get("content-length", len(res.content)))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(ids[n::concurrency]) for n in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return total / elapsed, sent / total
+
+
+async def run(args):
+    seed()
+    transport = httpx.ASGITransport(app=main.app)
+    identity = {"Accept-Encoding": "identity"}
+    scenarios = [
+        ("previous handler", "/bench/previous_quiz/{}", identity, 0),
+        ("stored bytes, no LRU", "/quiz/{}", identity, 0),
+        ("stored bytes + LRU", "/quiz/{}", identity, quiz_cache.max_bytes or 32 * 1024 * 1024),
+        ("stored bytes + LRU, gzip", "/quiz/{}", {"Accept-Encoding": "gzip"}, quiz_cache.max_bytes or 32 * 1024 * 1024),
+    ]
+    print(f"{QUIZZES} quizzes, {args.requests} requests, {args.concurrency} concurrent clients")
+    print(f"{'handler':28} {'req/s':>8} {'bytes/resp':>11}")
+    baseline = None
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, path, headers, cache_bytes in scenarios:
+            quiz_cache.max_bytes = cache_bytes
+            quiz_cache.entries.clear()
+            quiz_cache.resident_bytes = 0
+            await measure(client, path, min(200, args.requests), args.concurrency, headers)    # Warm up (and fill the LRU)
+            rps, size = await measure(client, path, args.requests, args.concurrency, headers)
+            baseline = baseline or rps
+            print(f"{name:28} {rps:8.0f} {size:11,.0f}   x{rps / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    asyncio.run(run(parser.parse_args()))
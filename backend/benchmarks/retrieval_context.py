@@ -0,0 +1,83 @@
+# benchmarks/retrieval_context.py
+# Full-text vs retrieval SOURCE_TEXT on a long synthetic article: prompt tokens, context build
+# time, simulated LLM latency and grounding (share of planted section facts the model gets to see).
+# Uses the local MiniLM embedding model and a stubbed LLM whose latency grows with prompt size.
+#
+#   cd backend && python benchmarks/retrieval_context.py --sections 60 --budget 6000
+#   (--fake-embeddings skips the model download, relevance is then meaningless)
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+import llm_quiz_generator
+import vector_service
+from database import init_db
+from tokens import estimate_tokens
+from prompt_budget import split_sentences
+
+WORDS = "the army moved across river valley while government leaders debated supply lines and treaty terms".split()
+LLM_BASE_MS, LLM_MS_PER_1K_TOKENS = 800, 350   # Rough flash-model latency shape
+
+
+def synthetic_article(n_sections, rng):
+    sections, facts = [], []
+    for i in range(n_sections):
+        fact = f"The Accord of Section {i} was signed in {1800 + i} by delegate number {i * 7}."
+        filler = [" ".join(rng.choice(WORDS) for _ in range(18)).capitalize() + "." for _ in range(40)]
+        filler.insert(rng.randrange(len(filler)), fact)
+        sections.append({"heading": f"Section {i}", "content": " ".join(filler), "subsections": []})
+        facts.append(fact)
+    return {"title": "Long War", "sections": sections}, facts
+
+
+async def stub_llm(prompt_tokens):
+    latency = (LLM_BASE_MS + LLM_MS_PER_1K_TOKENS * prompt_tokens / 1000) / 1000
+    await asyncio.sleep(latency / 20)   # Scaled down, the modelled value is what gets reported
+    return latency * 1000
+
+
+async def run_mode(mode, article, facts, budget):
+    llm_quiz_generator.CONTEXT_MODE = mode
+    llm_quiz_generator.RETRIEVAL_TOKEN_BUDGET = budget
+    timings = []
+    for _ in range(2):  # First call builds the index, second call reuses the stored one
+        start = time.perf_counter()
+        context, _ = await llm_quiz_generator.build_context(article["title"], article)
+        timings.append((time.perf_counter() - start) * 1000)
+    prompt = llm_quiz_generator.quiz_prompt.format(title=article["title"], content=context, difficulty="Medium")
+    prompt_tokens = estimate_tokens(prompt)
+    llm_ms = await stub_llm(prompt_tokens)
+    grounded = sum(1 for f in facts if f in context) / len(facts)
+    # A section counts as covered when any of its sentences made it into the context
+    covered = {s["heading"] for s in article["sections"] if any(x in context for x in split_sentences(s["content"]))}
+    sections = len(covered) / len(article["sections"])
+    return prompt_tokens, timings, llm_ms, grounded, sections
+
+
+async def main(args):
+    if args.fake_embeddings:
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        vector_service._embeddings = lambda: DeterministicFakeEmbedding(size=384)
+    init_db()
+    article, facts = synthetic_article(args.sections, random.Random(1))
+
+    print(f"{'mode':10} {'prompt tok':>10} {'ctx 1st ms':>10} {'ctx 2nd ms':>10} {'llm ms':>8} {'facts':>6} {'sections':>8}")
+    for mode in ("full", "retrieval"):
+        tokens, (first, second), llm_ms, grounded, sections = await run_mode(mode, article, facts, args.budget)
+        print(f"{mode:10} {tokens:>10,} {first:>10.1f} {second:>10.1f} {llm_ms:>8.0f} {grounded:>6.0%} {sections:>8.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Full-text vs retrieval context for quiz prompts")
+    parser.add_argument("--sections", type=int, default=60)
+    parser.add_argument("--budget", type=int, default=6000)
+    parser.add_argument("--fake-embeddings", action="store_true")
+    asyncio.run(main(parser.parse_args()))
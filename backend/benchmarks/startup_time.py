@@ -0,0 +1,68 @@
+# benchmarks/startup_time.py
+# Cold start of the API: time to import main (what an autoscaled instance pays before serving),
+# time of the first GET / and the deferred cost of creating the Gemini clients on first quiz.
+# Each run is a fresh interpreter.
+#
+#   cd backend && python benchmarks/startup_time.py --runs 5 --top 10
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    client.get("/")
+served = time.perf_counter()
+import llm_quiz_generator, llm_summary_extractor
+llm_quiz_generator.get_model()
+llm_summary_extractor.get_summary_model()
+clients = time.perf_counter()
+print(imported - start, served - start, clients - served)
+"""
+
+
+def run_probe(env):
+    out = subprocess.run([sys.executable, "-c", PROBE], cwd=BACKEND, env=env, capture_output=True, text=True, check=True)
+    return [float(x) for x in out.stdout.strip().splitlines()[-1].split()]
+
+
+def import_profile(env, top):
+    """Slowest modules by cumulative import time, from python -X importtime."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=BACKEND, env=env, capture_output=True, text=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main(args):
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tempfile.mkdtemp()}/startup.db", "GOOGLE_API_KEY": "benchmark"}
+    runs = [run_probe(env) for _ in range(args.runs)]
+    imports, served, clients = zip(*runs)
+    print(f"{args.runs} cold starts (median / min)")
+    print(f"  import main        {statistics.median(imports) * 1000:8.0f}ms / {min(imports) * 1000:.0f}ms")
+    print(f"  first GET /        {statistics.median(served) * 1000:8.0f}ms / {min(served) * 1000:.0f}ms")
+    print(f"  Gemini clients     {statistics.median(clients) * 1000:8.0f}ms / {min(clients) * 1000:.0f}ms  (paid by the first quiz/summary)")
+    if args.top:
+        print(f"\nSlowest imports of `import main` (cumulative):")
+        for cumulative, name in import_profile(env, args.top):
+            print(f"  {cumulative / 1000:8.0f}ms  {name}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Show the N slowest imports, 0 to skip")
+    main(parser.parse_args())
@@ -0,0 +1,34 @@
+# compression.py
+# Compressed JSON blobs for the article_contents / generated_quizzes tables.
+# zstd is used when the zstandard package is installed, zlib otherwise.
+# Both formats are recognised on read, so blobs stay readable if the package goes away.
+import json
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency
+    zstandard = None
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"   # Every zstd frame starts with these bytes
+ZSTD_LEVEL = 6
+
+
+def pack_json(data) -> bytes:
+    raw = json.dumps(data, ensure_ascii=False).encode("utf-8")
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return zlib.compress(raw, 6)
+
+
+def unpack_raw(blob: bytes) -> bytes:
+    """The stored JSON as UTF-8 bytes, for callers that pass it on without decoding it."""
+    if blob.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read this blob")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    return zlib.decompress(blob)
+
+
+def unpack_json(blob: bytes):
+    return json.loads(unpack_raw(blob))
@@ -0,0 +1,136 @@
+# fingerprint.py
+# Content fingerprints of scraped articles, to spot the same article behind another URL (redirects, title
+# variants, a slightly older revision) before paying for its summary and quizzes again:
+#   text_hash  sha256 of the normalized section text (lowercase words only), equal text = exact duplicate
+#   minhash    MINHASH_PERMUTATIONS minimums over word shingles, the share of equal values estimates the
+#              Jaccard similarity of two articles. Cut into LSH_BANDS bands whose hashes are stored in
+#              article_fingerprint_bands, so candidates come from one indexed IN query
+#   simhash    64-bit SimHash of the same shingles, a second opinion that filters MinHash estimation noise
+# All hashing is vectorized with numpy, a long article (~10k words) takes a few ms.
+import hashlib
+import os
+import re
+import numpy as np
+
+SHINGLE_WORDS = 4
+MINHASH_PERMUTATIONS = 128
+LSH_BANDS = 32              # 4 rows per band: pairs above ~0.7 Jaccard share a band with >99% probability
+MIN_SHINGLES = 50           # Shorter texts (stubs, disambiguation pages) only ever match exactly
+MAX_SIMHASH_DISTANCE = 18   # Out of 64 bits, near duplicates are far below it, unrelated articles around 32
+
+# Estimated Jaccard similarity from which a stored article is reused for a new URL, 0 turns deduplication off
+ARTICLE_DEDUPE_THRESHOLD = float(os.getenv("ARTICLE_DEDUPE_THRESHOLD", "0.8"))
+
+_words = re.compile(r"\w+")
+_MASK64 = (1 << 64) - 1
+
+# Fixed seed: stored signatures are only comparable with the same permutations
+_rng = np.random.default_rng(0x5EED_F1A6)
+_MUL = _rng.integers(1, 2 ** 63, MINHASH_PERMUTATIONS, dtype=np.uint64) * np.uint64(2) + np.uint64(1)   # Odd multipliers
+_ADD = _rng.integers(0, 2 ** 63, MINHASH_PERMUTATIONS, dtype=np.uint64)
+_BIT = np.arange(64, dtype=np.uint64)
+_CHUNK = 4096   # Shingles per step, bounds the (permutations x chunk) temporary
+
+
+def article_words(scraped_data: dict):
+    """Lowercase words of every section heading and text, in order."""
+    parts = []
+    for s in scraped_data.get("sections", []):
+        parts += [s.get("heading", ""), s.get("content", "")]
+        for sub in s.get("subsections", []):
+            parts += [sub.get("subheading", ""), sub.get("content", "")]
+    return _words.findall(" ".join(parts).lower())
+
+
+def _mix(x):
+    # splitmix64 finalizer, spreads the shingle hashes over all 64 bits (uint64 arithmetic wraps around)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def shingle_hashes(words):
+    """Unique 64-bit hashes of the SHINGLE_WORDS-word windows. Each distinct word is hashed once."""
+    vocab = {}
+    ids = np.fromiter((vocab.setdefault(w, len(vocab)) for w in words), dtype=np.int64, count=len(words))
+    word_hashes = np.frombuffer(
+        b"".join(hashlib.blake2b(w.encode("utf-8"), digest_size=8).digest() for w in vocab), dtype="<u8"
+    )[ids] if vocab else np.zeros(0, dtype=np.uint64)
+    if len(word_hashes) < SHINGLE_WORDS:
+        return np.unique(_mix(word_hashes))
+    n = len(word_hashes) - SHINGLE_WORDS + 1
+    combined = np.zeros(n, dtype=np.uint64)
+    for offset in range(SHINGLE_WORDS):
+        combined = _mix(combined ^ word_hashes[offset:offset + n])
+    return np.unique(combined)
+
+
+def minhash(shingles):
+    signature = np.full(MINHASH_PERMUTATIONS, np.iinfo(np.uint32).max, dtype=np.uint32)
+    for start in range(0, len(shingles), _CHUNK):
+        chunk = shingles[start:start + _CHUNK]
+        # Multiply-shift hashing: the top 32 bits of a*x+b mod 2^64 act as one random permutation
+        permuted = ((_MUL[:, None] * chunk[None, :] + _ADD[:, None]) >> np.uint64(32)).astype(np.uint32)
+        np.minimum(signature, permuted.min(axis=1), out=signature)
+    return signature
+
+
+def simhash(shingles):
+    votes = np.zeros(64, dtype=np.int64)
+    for start in range(0, len(shingles), _CHUNK):
+        bits = (shingles[start:start + _CHUNK, None] >> _BIT) & np.uint64(1)
+        votes += 2 * bits.sum(axis=0, dtype=np.int64) - len(bits)
+    value = sum(1 << i for i in range(64) if votes[i] > 0)
+    return value - (1 << 64) if value >= 1 << 63 else value    # Signed, fits a BIGINT column
+
+
+def band_keys(signature):
+    """One signed 64-bit key per LSH band, the band number is part of the hash."""
+    rows = MINHASH_PERMUTATIONS // LSH_BANDS
+    keys = []
+    for band in range(LSH_BANDS):
+        digest = hashlib.blake2b(bytes([band]) + signature[band * rows:(band + 1) * rows].tobytes(), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "little", signed=True))
+    return keys
+
+
+def fingerprint(scraped_data: dict):
+    """{text_hash, shingles, simhash, minhash (uint32 array), bands} of an article."""
+    words = article_words(scraped_data)
+    shingles = shingle_hashes(words)
+    signature = minhash(shingles)
+    return {
+        "text_hash": hashlib.sha256(" ".join(words).encode("utf-8")).hexdigest(),
+        "shingles": len(shingles),
+        "simhash": simhash(shingles),
+        "minhash": signature,
+        "bands": band_keys(signature),
+    }
+
+
+def minhash_from_bytes(data: bytes):
+    return np.frombuffer(data, dtype="<u4")
+
+
+def jaccard_estimate(a, b):
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+def simhash_distance(a: int, b: int):
+    return bin((a ^ b) & _MASK64).count("1")
+
+
+def near_duplicate_score(new: dict, stored: dict, threshold: float = ARTICLE_DEDUPE_THRESHOLD):
+    """
+    Estimated Jaccard similarity when `stored` (same keys as fingerprint(), minhash may be bytes) is a near duplicate
+    of `new`, else None. Both texts need MIN_SHINGLES shingles and the SimHashes must agree as well.
+    """
+    if min(new["shingles"], stored["shingles"]) < MIN_SHINGLES:
+        return None
+    if simhash_distance(new["simhash"], stored["simhash"]) > MAX_SIMHASH_DISTANCE:
+        return None
+    stored_minhash = stored["minhash"]
+    if isinstance(stored_minhash, (bytes, bytearray, memoryview)):
+        stored_minhash = minhash_from_bytes(bytes(stored_minhash))
+    score = jaccard_estimate(new["minhash"], stored_minhash)
+    return score if score >= threshold else None
@@ -0,0 +1,82 @@
+# history_service.py
+import base64
+import hashlib
+from datetime import datetime
+from sqlalchemy import func, or_, and_
+from database import Quiz, GeneratedQuiz
+from scraper_service import list_quiz_variants
+
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(date_generated: datetime, quiz_id: int):
+    raw = f"{date_generated.isoformat()}|{quiz_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str):
+    try:
+        date_text, quiz_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(date_text), int(quiz_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def _escape_like(text: str):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _filtered(query, title_prefix=None, search=None):
+    if title_prefix:    # Prefix match can use ix_quizzes_title
+        query = query.filter(Quiz.title.like(_escape_like(title_prefix) + "%", escape="\\"))
+    if search:          # Substring match, scans the (already narrowed) rows
+        query = query.filter(Quiz.title.like("%" + _escape_like(search) + "%", escape="\\"))
+    return query
+
+
+def history_etag(db, **params):
+    """
+    Version stamp for the history listing. Articles and quiz variants are added (the max ids change),
+    and a refresh of a changed article rewrites its title in place (the max updated_at changes).
+    All three are single index lookups.
+    """
+    max_quiz = db.query(func.max(Quiz.id)).scalar()
+    max_variant = db.query(func.max(GeneratedQuiz.id)).scalar()
+    last_update = db.query(func.max(Quiz.updated_at)).scalar()
+    raw = f"{max_quiz}|{max_variant}|{last_update}|{sorted(params.items())}"
+    return '"' + hashlib.sha1(raw.encode("utf-8")).hexdigest() + '"'
+
+
+def get_history_page(db, limit=50, cursor=None, title_prefix=None, search=None, count=False):
+    """
+    Newest-first keyset page over (date_generated, id), served by ix_quizzes_date_generated_id.
+    Returns (rows, next_cursor, total). total is only computed when count=True.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    query = _filtered(db.query(Quiz.id, Quiz.url, Quiz.title, Quiz.date_generated), title_prefix, search)
+
+    if cursor:
+        last_date, last_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Quiz.date_generated < last_date,
+            and_(Quiz.date_generated == last_date, Quiz.id < last_id),
+        ))
+
+    records = query.order_by(Quiz.date_generated.desc(), Quiz.id.desc()).limit(limit + 1).all()
+    has_more = len(records) > limit
+    records = records[:limit]
+    next_cursor = encode_cursor(records[-1].date_generated, records[-1].id) if has_more else None
+
+    total = None
+    if count:
+        total = _filtered(db.query(func.count(Quiz.id)), title_prefix, search).scalar()
+
+    variants = list_quiz_variants(db, [r.id for r in records])
+    rows = [
+        {
+            "id": r.id,
+            "url": r.url,
+            "title": r.title,
+            "date_generated": r.date_generated,
+            "variants": variants[r.id]
+        }
+        for r in records
+    ]
+    return rows, next_cursor, total
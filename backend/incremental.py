@@ -0,0 +1,162 @@
+# incremental.py
+# Refreshing an article that changed upstream without regenerating everything. Per-section content hashes
+# (stored with the scraped data and with every generated quiz) tell which sections an edit touched:
+# summary points and quiz questions about untouched sections are kept, only the others are regenerated,
+# from a prompt holding just the changed sections and asking for just the missing items.
+import hashlib
+import json
+import math
+import os
+import re
+from collections import Counter
+from llm_quiz_generator import generate_section_questions
+from llm_summary_extractor import generate_summary_points
+from prompt_budget import compact_sections, SUMMARY_TOKEN_BUDGET
+
+# Share of summary points / questions that may be stale before the whole summary or quiz is regenerated
+# instead (one coherent call for a mostly rewritten article). 0 turns incremental refresh off
+INCREMENTAL_MAX_CHANGED = float(os.getenv("INCREMENTAL_MAX_CHANGED", "0.6"))
+
+# Refreshes of changed articles, reported by /cache_stats and /metrics.
+#   incremental  kept what was still current, regenerated the rest ("skipped_calls": nothing was stale, no LLM call)
+#   full         too much changed, regenerated from scratch
+refresh_stats = {
+    kind: {"incremental": 0, "full": 0, "skipped_calls": 0, "kept": 0, "regenerated": 0}
+    for kind in ("summary", "quiz")
+}
+
+_word = re.compile(r"[a-z0-9]{4,}")
+_GENERIC_SECTIONS = {"", "general", "n/a", "none", "introduction", "overview"}
+
+
+def section_hash(section: dict):
+    body = json.dumps({"content": section.get("content", ""), "subsections": section.get("subsections", [])},
+                      sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()[:16]
+
+
+def section_hashes(scraped_data: dict):
+    """{heading: hash of its text and subsections} of every top-level section."""
+    return {s["heading"]: section_hash(s) for s in scraped_data.get("sections", [])}
+
+
+def unchanged_sections(old_hashes: dict, new_hashes: dict):
+    return {heading for heading, value in new_hashes.items() if old_hashes.get(heading) == value}
+
+
+class SectionIndex:
+    """Top-level heading of a question's `section` field, or of a piece of text by IDF-weighted word overlap."""
+
+    def __init__(self, sections: list[dict]):
+        self.names = {}
+        self.words = {}
+        for s in sections:
+            self.names[s["heading"].strip().lower()] = s["heading"]
+            for sub in s.get("subsections", []):
+                self.names.setdefault(sub.get("subheading", "").strip().lower(), s["heading"])
+            text = s.get("content", "") + " " + " ".join(sub.get("content", "") for sub in s.get("subsections", []))
+            self.words[s["heading"]] = set(_word.findall(text.lower()))
+        df = Counter(w for words in self.words.values() for w in words)
+        self.idf = {w: math.log((len(self.words) + 1) / n) for w, n in df.items()}    # Words found everywhere weigh ~0
+
+    def heading_of(self, text: str):
+        words = set(_word.findall(text.lower()))
+        best, best_score = None, 0.0
+        for heading, section_words in self.words.items():
+            score = sum(self.idf[w] for w in words & section_words)
+            if score > best_score:
+                best, best_score = heading, score
+        return best
+
+    def section_of_question(self, question: dict):
+        name = (question.get("section") or "").strip().lower()
+        if name in self.names:
+            return self.names[name]
+        if name in _GENERIC_SECTIONS:
+            text = " ".join(str(question.get(k) or "") for k in ("question", "answer", "explanation"))
+            return self.heading_of(text)
+        return None     # Named a section this revision doesn't have (removed or renamed)
+
+
+def _merge(items: list, stale: list[int], fresh: list):
+    """items with the stale positions filled by fresh ones in order (callers check there are enough)."""
+    replacements = dict(zip(stale, fresh))
+    return [replacements.get(i, item) for i, item in enumerate(items)]
+
+
+def _too_stale(kind: str, stale: int, total: int):
+    if INCREMENTAL_MAX_CHANGED <= 0 or not total or stale > INCREMENTAL_MAX_CHANGED * total:
+        refresh_stats[kind]["full"] += 1
+        return True
+    return False
+
+
+def _count(kind: str, kept: int, regenerated: int):
+    stats = refresh_stats[kind]
+    stats["incremental"] += 1
+    stats["kept"] += kept
+    stats["regenerated"] += regenerated
+    if not regenerated:
+        stats["skipped_calls"] += 1
+
+
+async def refresh_summary(old_data: dict, new_data: dict):
+    """
+    Summary points for the new revision of an article: old points whose section is unchanged are kept, the
+    others are replaced by points drawn from the changed sections. None when it should be summarized from scratch.
+    """
+    points = old_data.get("summary_points") or []
+    unchanged = unchanged_sections(old_data.get("section_hashes") or section_hashes(old_data), section_hashes(new_data))
+    index = SectionIndex(old_data.get("sections", []))
+    stale = [i for i, point in enumerate(points) if index.heading_of(str(point)) not in unchanged]
+    if _too_stale("summary", len(stale), len(points)):
+        return None
+    print(f"[REFRESH] summary '{new_data['title']}': kept {len(points) - len(stale)}/{len(points)} points, regenerating {len(stale)}")
+    if not stale:
+        _count("summary", len(points), 0)
+        return list(points)
+
+    # Stale points about removed sections only: draw the replacements from the whole article
+    changed = [s for s in new_data["sections"] if s["heading"] not in unchanged] or new_data["sections"]
+    text, _ = compact_sections(changed, SUMMARY_TOKEN_BUDGET)
+    fresh = await generate_summary_points(new_data["title"], text, count=len(stale))
+    if len(fresh) < len(stale):
+        print(f"[REFRESH] summary '{new_data['title']}': got {len(fresh)} of {len(stale)} points, summarizing from scratch")
+        refresh_stats["summary"]["full"] += 1
+        return None
+    _count("summary", len(points) - len(stale), len(stale))
+    return _merge(points, stale, fresh[:len(stale)])
+
+
+async def refresh_quiz(scraped_data: dict, difficulty: str, selected_sections, previous: dict):
+    """
+    Quiz for the current revision built from `previous` ({"quiz", "section_hashes"}, the same request generated
+    from an earlier revision): questions about unchanged sections are kept, the others are regenerated from the
+    changed sections with the same difficulties. None when it should be generated from scratch (too much changed,
+    or an unusable answer such as too few questions), {"error": ...} like generate_quiz when the LLM is unavailable.
+    """
+    quiz = previous["quiz"]
+    questions = quiz.get("quiz") or []
+    unchanged = unchanged_sections(previous["section_hashes"], section_hashes(scraped_data))
+    index = SectionIndex(scraped_data.get("sections", []))
+    stale = [i for i, q in enumerate(questions) if index.section_of_question(q) not in unchanged]
+    if _too_stale("quiz", len(stale), len(questions)):
+        return None
+
+    scope = [s["heading"] for s in scraped_data["sections"] if not selected_sections or s["heading"] in selected_sections]
+    changed = [heading for heading in scope if heading not in unchanged] or scope
+    print(f"[REFRESH] quiz '{scraped_data['title']}' ({difficulty}): kept {len(questions) - len(stale)}/{len(questions)} questions, "
+          f"regenerating {len(stale)}" + (f" from {', '.join(changed)}" if stale else ""))
+    if stale:
+        fresh = await generate_section_questions(
+            scraped_data["title"], scraped_data, difficulty, changed, [questions[i].get("difficulty") or difficulty.lower() for i in stale]
+        )
+        if isinstance(fresh, dict):
+            if "retry_after" in fresh:
+                return fresh    # Throttled or down, a full generation would fail the same way
+            print(f"[REFRESH] quiz '{scraped_data['title']}': {fresh['error']}, generating from scratch")
+            refresh_stats["quiz"]["full"] += 1
+            return None
+        questions = _merge(questions, stale, fresh)
+    _count("quiz", len(quiz.get("quiz") or []) - len(stale), len(stale))
+    return {**quiz, "title": scraped_data["title"], "quiz": questions}
@@ -0,0 +1,63 @@
+# index_cache.py
+# In-memory LRU of article retrieval indexes, bounded by resident bytes.
+# Kept free of the embedding stack so /index_cache_stats can report without importing torch.
+import os
+import threading
+from collections import OrderedDict
+
+INDEX_CACHE_MAX_BYTES = int(os.getenv("INDEX_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))  # 64MB fits the 512MB instances
+
+
+class IndexCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()    # key -> (chunks, vectors, size)
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()    # Used from worker threads
+
+    @staticmethod
+    def entry_size(chunks, vectors):
+        return vectors.nbytes + sum(len(c["text"]) + len(c["section"]) for c in chunks)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)   # Most recently used
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, key, chunks, vectors):
+        size = self.entry_size(chunks, vectors)
+        if size > self.max_bytes:
+            return  # Would evict everything else, serve it from the DB instead
+        with self.lock:
+            if key in self.entries:
+                self.resident_bytes -= self.entries.pop(key)[2]
+            self.entries[key] = (chunks, vectors, size)
+            self.resident_bytes += size
+            while self.resident_bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self.entries.popitem(last=False)    # Least recently used
+                self.resident_bytes -= evicted_size
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "resident_bytes": self.resident_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+index_cache = IndexCache(INDEX_CACHE_MAX_BYTES)
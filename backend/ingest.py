@@ -0,0 +1,194 @@
+# ingest.py
+# Bulk article ingestion, used to pre-warm the scrape cache before a course launch.
+# Fetches with bounded concurrency and per-host rate limiting, parses in a process pool,
+# batches the summary LLM calls and bulk-inserts into the quizzes tables.
+# Progress is checkpointed after every batch, re-running the same command resumes.
+#
+#   python ingest.py --urls urls.txt
+#   python ingest.py --category "Category:Computer scientists" --limit 500 --concurrency 8
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+from database import init_db
+from scraper import fetch_raw, parse_fetched, get_client, close_client, api_headers, REST_BASE_URL
+from scraper_service import existing_url_keys, bulk_save_scraped_content, summary_source
+from llm_summary_extractor import generate_summary_points_batch
+from url_normalizer import normalize_url
+
+
+class HostRateLimiter:
+    """Spaces out request starts per host to at most `rate` per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self.next_slot = {}
+        self.lock = asyncio.Lock()
+
+    async def wait(self, host: str):
+        async with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            self.next_slot[host] = slot + self.interval
+        await asyncio.sleep(slot - now)
+
+
+class Checkpoint:
+    """Canonical URLs already ingested (done) or failed, saved as JSON after every batch."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done, self.failed = set(), {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                saved = json.load(f)
+            self.done, self.failed = set(saved.get("done", [])), saved.get("failed", {})
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"done": sorted(self.done), "failed": self.failed}, f)
+        os.replace(tmp, self.path)  # Atomic, a crash never leaves a half-written checkpoint
+
+
+async def category_urls(category: str, lang: str, limit: int):
+    """Article URLs of a category through the MediaWiki Action API (list=categorymembers)."""
+    title = category if category.startswith("Category:") else f"Category:{category}"
+    host = f"https://{lang}.wikipedia.org"
+    params = {"action": "query", "list": "categorymembers", "cmtitle": title, "cmtype": "page",
+              "cmnamespace": 0, "cmlimit": 500, "format": "json", "formatversion": 2}
+    urls = []
+    while len(urls) < limit:
+        res = await get_client().get(f"{REST_BASE_URL or host}/w/api.php", params=params, headers=api_headers)
+        res.raise_for_status()
+        body = res.json()
+        urls += [f"{host}/wiki/{m['title'].replace(' ', '_')}" for m in body["query"]["categorymembers"]]
+        if "continue" not in body:
+            break
+        params.update(body["continue"])
+    return urls[:limit]
+
+
+async def ingest(urls, args):
+    checkpoint = Checkpoint(args.checkpoint)
+
+    # Dedupe on the canonical URL, then drop what was ingested before or is already stored
+    pending = {}
+    for url in urls:
+        pending.setdefault(normalize_url(url), url)
+    for key in list(pending):
+        if key in checkpoint.done:
+            del pending[key]
+    keys = list(pending)
+    for i in range(0, len(keys), 500):
+        for key in await asyncio.to_thread(existing_url_keys, keys[i:i + 500]):
+            checkpoint.done.add(key)
+            del pending[key]
+    checkpoint.save()
+    total = len(pending)
+    print(f"[INGEST] {len(urls)} URLs, {total} to ingest, {len(checkpoint.done)} already done")
+
+    url_queue = asyncio.Queue()
+    for key, url in pending.items():
+        url_queue.put_nowait((key, url))
+    parsed_queue = asyncio.Queue(maxsize=args.batch_size * 2)   # Backpressure when summaries fall behind
+    limiter = HostRateLimiter(args.rate)
+    loop = asyncio.get_running_loop()
+    stored, failed, start = 0, 0, time.monotonic()
+
+    async def fetch_worker(pool):
+        while True:
+            try:
+                key, url = url_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                await limiter.wait(urlsplit(url).hostname)
+                raw = await fetch_raw(url)
+                data = await loop.run_in_executor(pool, parse_fetched, raw)
+                raw.pop("html")     # Parsed now, don't keep the page in memory
+                await parsed_queue.put((key, url, data, raw))
+            except Exception as e:
+                await parsed_queue.put((key, url, None, e))
+
+    async def store_batch(batch):
+        nonlocal stored, failed
+        ok = [(key, url, data, meta) for key, url, data, meta in batch if data is not None]
+        for key, url, data, error in batch:
+            if data is None:
+                print(f"[INGEST] Failed {url}: {error}")
+                checkpoint.failed[key] = str(error)
+                failed += 1
+        if ok:
+            summaries = await generate_summary_points_batch(
+                [{"title": data["title"], "content": summary_source(data)} for _, _, data, _ in ok],
+                max_concurrency=args.llm_concurrency,
+            )
+            summarized = []
+            for (key, url, data, meta), points in zip(ok, summaries):
+                if isinstance(points, Exception):
+                    # Not stored and not done, a resumed run retries it instead of keeping a placeholder summary
+                    print(f"[INGEST] Failed {url}: summary: {points}")
+                    checkpoint.failed[key] = f"summary: {points}"
+                    failed += 1
+                    continue
+                data["summary_points"] = points
+                summarized.append((key, url, data, meta))
+            if summarized:
+                await asyncio.to_thread(bulk_save_scraped_content, [(url, data, meta) for _, url, data, meta in summarized])
+            for key, *_ in summarized:
+                checkpoint.done.add(key)
+                checkpoint.failed.pop(key, None)
+            stored += len(summarized)
+        checkpoint.save()
+        per_minute = stored / max(time.monotonic() - start, 1e-9) * 60
+        print(f"[INGEST] {stored + failed}/{total} processed | {stored} stored | {failed} failed | {per_minute:.1f} articles/min")
+
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        workers = [asyncio.create_task(fetch_worker(pool)) for _ in range(args.concurrency)]
+        batch = []
+        for _ in range(total):
+            batch.append(await parsed_queue.get())
+            if len(batch) >= args.batch_size:
+                await store_batch(batch)
+                batch = []
+        if batch:
+            await store_batch(batch)
+        await asyncio.gather(*workers)
+
+    elapsed = time.monotonic() - start
+    print(f"[INGEST] Done: {stored} stored, {failed} failed in {elapsed:.1f}s "
+          f"({stored / max(elapsed, 1e-9) * 60:.1f} articles/min). Checkpoint: {args.checkpoint}")
+
+
+async def main(args):
+    init_db()
+    try:
+        if args.urls:
+            with open(args.urls, encoding="utf-8") as f:
+                urls = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        else:
+            urls = await category_urls(args.category, args.lang, args.limit)
+        await ingest(urls, args)
+    finally:
+        await close_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk Wikipedia article ingestion / cache pre-warming")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--urls", help="File with one article URL per line")
+    source.add_argument("--category", help='Wikipedia category, e.g. "Category:Physicists"')
+    parser.add_argument("--lang", default="en", help="Wikipedia language for --category")
+    parser.add_argument("--limit", type=int, default=1000, help="Max articles taken from --category")
+    parser.add_argument("--concurrency", type=int, default=8, help="Parallel downloads")
+    parser.add_argument("--rate", type=float, default=10, help="Max requests per second per host")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Parser processes")
+    parser.add_argument("--batch-size", type=int, default=20, help="Articles per summary batch and bulk insert")
+    parser.add_argument("--llm-concurrency", type=int, default=5, help="Parallel summary calls within a batch")
+    parser.add_argument("--checkpoint", default="ingest_checkpoint.json")
+    asyncio.run(main(parser.parse_args()))
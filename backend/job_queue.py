@@ -0,0 +1,298 @@
+# job_queue.py
+# Background jobs for long LLM work. A request submits a job and gets its id at once,
+# a bounded pool of worker tasks runs it and clients poll /jobs/{id} for the result.
+#
+# The storage backend is pluggable (JOB_QUEUE_BACKEND):
+#   database - jobs table of the app DB (SQLite/MySQL), survives restarts. Default.
+#   memory   - in-process heap, lost on restart. Handy for local runs.
+#   module:Class - any class with the same methods as MemoryJobBackend.
+import asyncio
+import functools
+import heapq
+import importlib
+import itertools
+import os
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import or_, and_
+from database import SessionLocal, Job
+from llm_client import LLMUnavailableError
+from metrics import jobs_running, span
+
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "database")
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))            # Jobs running at once in this process
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "120"))      # Renewed while running, expires if the worker dies
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))          # Claims of one job before it is given up
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))        # Idle workers also look for jobs from other processes
+JOB_RETRY_MIN_SECONDS = float(os.getenv("JOB_RETRY_MIN_SECONDS", "5"))  # Shortest wait before a throttled job runs again
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def _job_dict(job):
+    return {
+        "id": job.id, "kind": job.kind, "status": job.status, "priority": job.priority,
+        "payload": job.payload, "result": job.result, "error": job.error, "attempts": job.attempts,
+        "created_at": job.created_at, "started_at": job.started_at, "finished_at": job.finished_at,
+    }
+
+
+class DatabaseJobBackend:
+    """Jobs in the jobs table. Claims are a conditional UPDATE, so several app processes can share one queue."""
+
+    def enqueue(self, kind: str, payload: dict, priority: int = 0, dedupe_key: str | None = None):
+        db = SessionLocal()
+        try:
+            if dedupe_key:
+                # Same work already waiting or running, hand out that job instead of paying for it twice
+                existing = db.query(Job).filter(Job.dedupe_key == dedupe_key, Job.status.in_(ACTIVE_STATUSES)).first()
+                if existing:
+                    return _job_dict(existing)
+            job = Job(id=uuid.uuid4().hex, kind=kind, status="queued", priority=priority,
+                      dedupe_key=dedupe_key, payload=payload, attempts=0, created_at=datetime.utcnow())
+            db.add(job)
+            db.commit()
+            return _job_dict(job)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def claim(self, worker: str):
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            claimable = or_(
+                and_(Job.status == "queued", or_(Job.not_before.is_(None), Job.not_before <= now)),
+                and_(Job.status == "running", Job.lease_until < now),
+            )
+            candidates = (
+                db.query(Job.id, Job.attempts)
+                .filter(claimable)
+                .order_by(Job.priority.desc(), Job.created_at)
+                .limit(5)
+                .all()
+            )
+            for candidate in candidates:
+                if candidate.attempts >= JOB_MAX_ATTEMPTS:
+                    db.query(Job).filter(Job.id == candidate.id, claimable).update(
+                        {"status": "failed", "error": f"Gave up after {candidate.attempts} attempts", "finished_at": now},
+                        synchronize_session=False,
+                    )
+                    db.commit()
+                    continue
+                # Only one worker wins the row, the others see rowcount 0 and try the next candidate
+                claimed = db.query(Job).filter(Job.id == candidate.id, claimable).update(
+                    {"status": "running", "worker": worker, "attempts": Job.attempts + 1,
+                     "started_at": now, "lease_until": now + timedelta(seconds=JOB_LEASE_SECONDS)},
+                    synchronize_session=False,
+                )
+                db.commit()
+                if claimed:
+                    return _job_dict(db.get(Job, candidate.id))
+            return None
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _update(self, job_id: str, worker: str, values: dict):
+        db = SessionLocal()
+        try:
+            # Scoped to the claiming worker, a job taken over after an expired lease is left alone
+            db.query(Job).filter(Job.id == job_id, Job.worker == worker, Job.status == "running").update(
+                values, synchronize_session=False
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def renew(self, job_id: str, worker: str):
+        self._update(job_id, worker, {"lease_until": datetime.utcnow() + timedelta(seconds=JOB_LEASE_SECONDS)})
+
+    def complete(self, job_id: str, worker: str, result: dict):
+        self._update(job_id, worker, {"status": "succeeded", "result": result, "finished_at": datetime.utcnow()})
+
+    def fail(self, job_id: str, worker: str, error: str):
+        self._update(job_id, worker, {"status": "failed", "error": error, "finished_at": datetime.utcnow()})
+
+    def release(self, job_id: str, worker: str):
+        # Interrupted by shutdown, not the job's fault, so the attempt is not counted
+        self._update(job_id, worker, {"status": "queued", "worker": None, "lease_until": None, "attempts": Job.attempts - 1})
+
+    def retry(self, job_id: str, worker: str, error: str, delay: float):
+        # Transient failure, queued again but not claimed for `delay` seconds. The attempt counts
+        self._update(job_id, worker, {"status": "queued", "worker": None, "lease_until": None, "error": error,
+                                      "not_before": datetime.utcnow() + timedelta(seconds=delay)})
+
+    def get(self, job_id: str):
+        db = SessionLocal()
+        try:
+            job = db.get(Job, job_id)
+            return _job_dict(job) if job else None
+        finally:
+            db.close()
+
+
+class MemoryJobBackend:
+    """Jobs in a dict + priority heap of this process. Nothing survives a restart."""
+
+    def __init__(self):
+        self.jobs = {}
+        self.heap = []
+        self.order = itertools.count()
+
+    def enqueue(self, kind: str, payload: dict, priority: int = 0, dedupe_key: str | None = None):
+        if dedupe_key:
+            for job in self.jobs.values():
+                if job["dedupe_key"] == dedupe_key and job["status"] in ACTIVE_STATUSES:
+                    return dict(job)
+        job = {"id": uuid.uuid4().hex, "kind": kind, "status": "queued", "priority": priority, "dedupe_key": dedupe_key,
+               "payload": payload, "result": None, "error": None, "attempts": 0, "not_before": None,
+               "created_at": datetime.utcnow(), "started_at": None, "finished_at": None}
+        self.jobs[job["id"]] = job
+        heapq.heappush(self.heap, (-priority, next(self.order), job["id"]))
+        return dict(job)
+
+    def claim(self, worker: str):
+        now, waiting, claimed = datetime.utcnow(), [], None
+        while self.heap:
+            entry = heapq.heappop(self.heap)
+            job = self.jobs[entry[2]]
+            if job["status"] != "queued":
+                continue
+            if job["not_before"] is not None and job["not_before"] > now:
+                waiting.append(entry)   # Retried job still backing off, keeps its place
+                continue
+            job.update(status="running", attempts=job["attempts"] + 1, started_at=now)
+            claimed = dict(job)
+            break
+        for entry in waiting:
+            heapq.heappush(self.heap, entry)
+        return claimed
+
+    def renew(self, job_id: str, worker: str):
+        pass
+
+    def complete(self, job_id: str, worker: str, result: dict):
+        self.jobs[job_id].update(status="succeeded", result=result, finished_at=datetime.utcnow())
+
+    def fail(self, job_id: str, worker: str, error: str):
+        self.jobs[job_id].update(status="failed", error=error, finished_at=datetime.utcnow())
+
+    def release(self, job_id: str, worker: str):
+        job = self.jobs[job_id]
+        job.update(status="queued", attempts=job["attempts"] - 1)
+        heapq.heappush(self.heap, (-job["priority"], next(self.order), job_id))
+
+    def retry(self, job_id: str, worker: str, error: str, delay: float):
+        job = self.jobs[job_id]
+        job.update(status="queued", error=error, not_before=datetime.utcnow() + timedelta(seconds=delay))
+        heapq.heappush(self.heap, (-job["priority"], next(self.order), job_id))
+
+    def get(self, job_id: str):
+        job = self.jobs.get(job_id)
+        return dict(job) if job else None
+
+
+BACKENDS = {"database": DatabaseJobBackend, "memory": MemoryJobBackend}
+
+def load_backend(name: str):
+    if ":" in name:
+        module, cls = name.split(":", 1)
+        return getattr(importlib.import_module(module), cls)()
+    return BACKENDS[name]()
+
+
+class JobQueue:
+    def __init__(self, backend, concurrency: int):
+        self.backend = backend
+        self.concurrency = concurrency
+        self.handlers = {}
+        self.workers = []
+        self.wakeup = None
+
+    def handler(self, kind: str):
+        """Registers `async def fn(payload) -> result dict` for a job kind."""
+        def register(fn):
+            self.handlers[kind] = fn
+            return fn
+        return register
+
+    async def submit(self, kind: str, payload: dict, priority: int = 0, dedupe_key: str | None = None):
+        job = await asyncio.to_thread(self.backend.enqueue, kind, payload, priority, dedupe_key)
+        if self.wakeup is not None:
+            self.wakeup.set()
+        return job
+
+    async def get(self, job_id: str):
+        return await asyncio.to_thread(self.backend.get, job_id)
+
+    async def start(self):
+        self.wakeup = asyncio.Event()
+        self.workers = [asyncio.create_task(self._worker(f"{os.getpid()}-{n}")) for n in range(self.concurrency)]
+        print(f"[JOBS] {self.concurrency} workers started ({type(self.backend).__name__})")
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    async def _heartbeat(self, job_id: str, worker: str):
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            await asyncio.to_thread(self.backend.renew, job_id, worker)
+
+    async def _worker(self, worker: str):
+        while True:
+            self.wakeup.clear()     # Cleared before claiming, so a submit that lands meanwhile is not missed
+            try:
+                job = await asyncio.to_thread(self.backend.claim, worker)
+            except Exception as e:
+                print(f"[JOBS] Claim failed: {e}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            handler = self.handlers.get(job["kind"])
+            heartbeat = asyncio.create_task(self._heartbeat(job["id"], worker))
+            try:
+                if handler is None:
+                    raise LookupError(f"No handler for job kind {job['kind']}")
+                with jobs_running.track(job["kind"]), span("job", kind=job["kind"], job_id=job["id"]):
+                    finish, outcome = self.backend.complete, await handler(job["payload"])
+            except asyncio.CancelledError:
+                await asyncio.to_thread(self.backend.release, job["id"], worker)
+                raise
+            except LLMUnavailableError as e:
+                # Gemini throttling or an open breaker: try again once it should be over, within the attempt limit
+                if job["attempts"] < JOB_MAX_ATTEMPTS:
+                    delay = max(e.retry_after or 0, JOB_RETRY_MIN_SECONDS)
+                    print(f"[JOBS] Job {job['id']} hit an unavailable LLM, retrying in {delay:.0f}s: {e}")
+                    finish, outcome = functools.partial(self.backend.retry, delay=delay), str(e)
+                else:
+                    print(f"[JOBS] Job {job['id']} failed after {job['attempts']} attempts: {e}")
+                    finish, outcome = self.backend.fail, str(e)
+            except Exception as e:
+                print(f"[JOBS] Job {job['id']} failed: {e}")
+                finish, outcome = self.backend.fail, str(e)
+            finally:
+                heartbeat.cancel()
+            try:
+                await asyncio.to_thread(finish, job["id"], worker, outcome)
+            except Exception as e:
+                # The lease runs out and the job is claimed again
+                print(f"[JOBS] Could not store the outcome of job {job['id']}: {e}")
+
+
+job_queue = JobQueue(load_backend(JOB_QUEUE_BACKEND), JOB_CONCURRENCY)
@@ -0,0 +1,307 @@
+# llm_backends.py
+# Which model answers the quiz and summary chains, picked with LLM_BACKEND:
+#   gemini     the real Gemini models (default)
+#   record     Gemini, and every answer is also written to LLM_FIXTURES_DIR under a hash of its prompt
+#   replay     answers are read back from LLM_FIXTURES_DIR and arrive after their recorded latency
+#              (times LLM_REPLAY_SPEED); a prompt that was never recorded gets a synthetic answer
+#              or, with LLM_REPLAY_ON_MISS=error, fails
+#   synthetic  schema-valid answers built from the prompt and sample_data/testing.txt, latency drawn
+#              from LLM_SYNTHETIC_LATENCY, optional injected 429/503s
+# Every backend is a LangChain runnable, so LLMClient's limits, retries, metrics and parsers apply unchanged.
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from datetime import datetime
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.runnables import Runnable
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_DATA_DIR = os.path.join(BACKEND_DIR, "..", "sample_data")
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+LLM_FIXTURES_DIR = os.getenv("LLM_FIXTURES_DIR", os.path.join(SAMPLE_DATA_DIR, "llm_fixtures"))
+LLM_REPLAY_SPEED = float(os.getenv("LLM_REPLAY_SPEED", "1"))        # 0 = answer at once, 0.5 = twice as fast
+LLM_REPLAY_ON_MISS = os.getenv("LLM_REPLAY_ON_MISS", "synthetic")   # synthetic | error
+# fixed:<s> | uniform:<low>,<high> | lognormal:<median>,<sigma>, seconds
+LLM_SYNTHETIC_LATENCY = os.getenv("LLM_SYNTHETIC_LATENCY", "lognormal:2.0,0.5")
+LLM_SYNTHETIC_MS_PER_OUTPUT_TOKEN = float(os.getenv("LLM_SYNTHETIC_MS_PER_OUTPUT_TOKEN", "0"))
+LLM_SYNTHETIC_THROTTLE_RATE = float(os.getenv("LLM_SYNTHETIC_THROTTLE_RATE", "0"))    # Share of calls answered with a 429
+LLM_SYNTHETIC_ERROR_RATE = float(os.getenv("LLM_SYNTHETIC_ERROR_RATE", "0"))          # Share of calls answered with a 503
+LLM_SYNTHETIC_SEED = os.getenv("LLM_SYNTHETIC_SEED", "0")
+
+STREAM_CHUNKS = 20
+FIRST_CHUNK_SHARE = 0.3     # Share of the latency before the first streamed chunk
+
+
+def is_live():
+    """True when answers come from Gemini, stored quizzes are only shared with live backends."""
+    return LLM_BACKEND in ("gemini", "record")
+
+
+def prompt_text(inputs):
+    return inputs.to_string() if hasattr(inputs, "to_string") else str(inputs)
+
+
+def prompt_key(text: str):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SyntheticAPIError(Exception):
+    """Injected failure, carries the HTTP status like the Google API errors do."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"{status_code} from the synthetic LLM backend")
+        self.status_code = status_code
+
+
+class OfflineModel(Runnable):
+    """Base of the offline backends: subclasses return (AIMessage, latency seconds) from _answer."""
+
+    def __init__(self, role: str):
+        self.role = role
+
+    def _answer(self, text: str):
+        raise NotImplementedError
+
+    def invoke(self, input, config=None, **kwargs):
+        message, latency = self._answer(prompt_text(input))
+        time.sleep(latency)
+        return message
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        message, latency = self._answer(prompt_text(input))
+        await asyncio.sleep(latency)
+        return message
+
+    async def astream(self, input, config=None, **kwargs):
+        message, latency = self._answer(prompt_text(input))
+        content = message.content
+        size = max(1, -(-len(content) // STREAM_CHUNKS))
+        await asyncio.sleep(latency * FIRST_CHUNK_SHARE)
+        for start in range(0, len(content), size):
+            yield AIMessageChunk(content=content[start:start + size])
+            await asyncio.sleep(latency * (1 - FIRST_CHUNK_SHARE) / STREAM_CHUNKS)
+
+
+# Synthetic answers
+
+def parse_latency(spec: str):
+    """LLM_SYNTHETIC_LATENCY -> function(rng) returning seconds."""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v.strip()]
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        return lambda rng: values[0] * rng.lognormvariate(0, values[1])
+    raise ValueError(f"Unknown LLM_SYNTHETIC_LATENCY {spec!r}, use fixed:, uniform: or lognormal:")
+
+
+_sample_quiz = None
+
+def sample_quiz():
+    """
+    The recorded quiz in sample_data/testing.txt (its "sections" list is unquoted, fixed on load),
+    or a small built-in one when the file is not shipped (e.g. in the backend Docker image).
+    """
+    global _sample_quiz
+    if _sample_quiz is None:
+        try:
+            with open(os.path.join(SAMPLE_DATA_DIR, "testing.txt"), encoding="utf-8") as f:
+                raw = f.read()
+            raw = raw[raw.index("{"):]
+            raw = re.sub(r'\[\s*([A-Za-z][^\]"]*?)\s*\]', lambda m: json.dumps([s.strip() for s in m.group(1).split(",")]), raw)
+            _sample_quiz = json.loads(raw)
+        except (OSError, ValueError) as e:
+            print(f"[WARN] sample_data/testing.txt not usable ({e}), synthetic quizzes use a built-in question")
+            _sample_quiz = {
+                "summary": "A synthetic summary of the article.",
+                "key_entities": {"people": [], "organizations": [], "locations": []},
+                "quiz": [{"question": "Which statement is supported by the article?",
+                          "options": ["The first option", "The second option", "The third option", "The fourth option"],
+                          "answer": "The first option", "difficulty": "easy",
+                          "explanation": "The article states the first option.", "section": None}],
+                "related_topics": [],
+            }
+    return _sample_quiz
+
+
+def _tag(text: str, name: str):
+    match = re.search(rf"<{name}>\s*(.*?)\s*</{name}>", text, re.DOTALL)
+    return match.group(1) if match else ""
+
+
+def _questions(difficulty: str, headings: list[str], rng: random.Random, count: int | None = None):
+    questions = [dict(q) for q in sample_quiz()["quiz"]]
+    rng.shuffle(questions)
+    if count is not None:
+        questions = [dict(questions[n % len(questions)]) for n in range(count)]
+    for n, q in enumerate(questions):
+        q["difficulty"] = difficulty.lower()
+        q["section"] = headings[n % len(headings)] if headings else None
+    return questions
+
+
+def synthetic_quiz(text: str, rng: random.Random):
+    """QuizOutput or QuizBatchOutput JSON for a rendered quiz prompt (see llm_quiz_generator.quiz_prompt)."""
+    sample = sample_quiz()
+    title = _tag(text, "ARTICLE_TITLE") or "Untitled"
+    source = _tag(text, "SOURCE_TEXT")
+    headings = re.findall(r"^\s*\[([^\]]+)\]", source, re.MULTILINE)[:10]
+    shared = {
+        "title": title,
+        "summary": sample["summary"],
+        "key_entities": sample.get("key_entities") or {},
+        "sections": headings or ["Introduction"],
+        "related_topics": sample.get("related_topics") or [],
+    }
+    variants = re.findall(r"^\s*\d+\. difficulty: (.+?) \| scope: (.*)$", _tag(text, "VARIANTS"), re.MULTILINE)
+    if variants:
+        return {**shared, "variants": [
+            {"difficulty": difficulty, "scope": scope or "All", "quiz": _questions(difficulty, headings, rng)}
+            for difficulty, scope in variants
+        ]}
+    difficulty = (re.search(r"Difficulty Mode: (\w+)", text) or re.search(r"(easy|medium|hard)", text, re.I))
+    difficulty = difficulty.group(1) if difficulty else "medium"
+    count = re.search(r"exactly (\d+) multiple-choice", text)    # The refresh prompt asks for a few questions only
+    url = "https://en.wikipedia.org/wiki/" + title.replace(" ", "_")
+    return {"url": url, **shared, "quiz": _questions(difficulty, headings, rng, int(count.group(1)) if count else None)}
+
+
+def synthetic_summary(text: str):
+    """As many sentences of the article content as the summary prompt asks for, as a JSON list."""
+    count = re.search(r"extract \*\*(\d+) ", text)
+    content = text.split("Article Content:", 1)[-1]
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", content) if len(s.strip()) > 20]
+    return sentences[:int(count.group(1)) if count else 10] or [f"The article is about {text.split('Article Title:', 1)[-1].splitlines()[0].strip()}."]
+
+
+class SyntheticModel(OfflineModel):
+    def __init__(self, role: str, latency_spec: str = LLM_SYNTHETIC_LATENCY):
+        super().__init__(role)
+        self.latency = parse_latency(latency_spec)
+        self.attempts = {}  # prompt key -> calls so far, so a retried prompt gets a fresh draw
+
+    def _answer(self, text: str):
+        key = prompt_key(text)
+        attempt = self.attempts[key] = self.attempts.get(key, 0) + 1
+        # Seeded per prompt and attempt: the same run gives the same latencies and failures at any concurrency
+        rng = random.Random(f"{LLM_SYNTHETIC_SEED}:{self.role}:{key}:{attempt}")
+        roll = rng.random()
+        if roll < LLM_SYNTHETIC_THROTTLE_RATE:
+            raise SyntheticAPIError(429)
+        if roll < LLM_SYNTHETIC_THROTTLE_RATE + LLM_SYNTHETIC_ERROR_RATE:
+            raise SyntheticAPIError(503)
+        body = synthetic_summary(text) if self.role == "summary" else synthetic_quiz(text, rng)
+        content = json.dumps(body, ensure_ascii=False)
+        latency = self.latency(rng) + LLM_SYNTHETIC_MS_PER_OUTPUT_TOKEN * len(content) / 4 / 1000
+        return AIMessage(content=content), latency
+
+
+# Record / replay
+
+class FixtureStore:
+    """One JSON file per answer: <dir>/<role>/<sha256 of the prompt>.json"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def path(self, role: str, key: str):
+        return os.path.join(self.directory, role, f"{key}.json")
+
+    def save(self, role: str, text: str, content: str, usage, latency: float, model: str):
+        path = self.path(role, prompt_key(text))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        record = {
+            "role": role,
+            "model": model,
+            "recorded_at": datetime.utcnow().isoformat(),
+            "latency_ms": round(latency * 1000, 1),
+            "prompt_preview": text[:300],
+            "content": content,
+            "usage_metadata": usage,
+        }
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)   # Readers never see half a file
+
+    def load(self, role: str, text: str):
+        try:
+            with open(self.path(role, prompt_key(text)), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+
+class RecordingModel(Runnable):
+    """Passes calls to the live model and writes every complete answer to the fixture store."""
+
+    def __init__(self, role: str, model, store: FixtureStore):
+        self.role, self.model, self.store = role, model, store
+
+    def _save(self, inputs, content: str, usage, latency: float):
+        try:
+            self.store.save(self.role, prompt_text(inputs), content, usage, latency, getattr(self.model, "model", type(self.model).__name__))
+        except OSError as e:
+            print(f"[WARN] Could not record {self.role} answer: {e}")
+
+    def invoke(self, input, config=None, **kwargs):
+        start = time.perf_counter()
+        message = self.model.invoke(input, config, **kwargs)
+        self._save(input, message.content, getattr(message, "usage_metadata", None), time.perf_counter() - start)
+        return message
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        start = time.perf_counter()
+        message = await self.model.ainvoke(input, config, **kwargs)
+        self._save(input, message.content, getattr(message, "usage_metadata", None), time.perf_counter() - start)
+        return message
+
+    async def astream(self, input, config=None, **kwargs):
+        start, parts = time.perf_counter(), []
+        async for chunk in self.model.astream(input, config, **kwargs):
+            parts.append(chunk.content if isinstance(chunk.content, str) else "")
+            yield chunk
+        self._save(input, "".join(parts), None, time.perf_counter() - start)
+
+
+class ReplayModel(OfflineModel):
+    def __init__(self, role: str, store: FixtureStore, speed: float = LLM_REPLAY_SPEED, on_miss: str = LLM_REPLAY_ON_MISS):
+        super().__init__(role)
+        self.store, self.speed, self.on_miss = store, speed, on_miss
+        self.fallback = SyntheticModel(role)
+        self.hits = self.misses = 0
+
+    def _answer(self, text: str):
+        record = self.store.load(self.role, text)
+        if record is None:
+            self.misses += 1
+            if self.on_miss == "error":
+                raise LookupError(f"No recorded {self.role} answer for this prompt in {self.store.directory}")
+            return self.fallback._answer(text)
+        self.hits += 1
+        message = AIMessage(content=record["content"], usage_metadata=record.get("usage_metadata") or None)
+        return message, record.get("latency_ms", 0) / 1000 * self.speed
+
+
+def make_model(role: str, live_factory):
+    """The model of one chain for LLM_BACKEND. live_factory builds the Gemini model, it is only called when needed."""
+    if LLM_BACKEND == "gemini":
+        return live_factory()
+    store = FixtureStore(LLM_FIXTURES_DIR)
+    if LLM_BACKEND == "record":
+        print(f"[INFO] Recording {role} LLM answers to {LLM_FIXTURES_DIR}")
+        return RecordingModel(role, live_factory(), store)
+    if LLM_BACKEND == "replay":
+        print(f"[INFO] Replaying {role} LLM answers from {LLM_FIXTURES_DIR}")
+        return ReplayModel(role, store)
+    if LLM_BACKEND == "synthetic":
+        print(f"[INFO] Synthetic {role} LLM answers, latency {LLM_SYNTHETIC_LATENCY}")
+        return SyntheticModel(role)
+    raise ValueError(f"Unknown LLM_BACKEND {LLM_BACKEND!r}, use gemini, record, replay or synthetic")
@@ -0,0 +1,334 @@
+# llm_client.py
+# Shared call layer for every Gemini request (quiz and summary chains).
+#   - token buckets sized to the model's RPM/TPM quota, slowed down on 429s and sped up again on success
+#   - exponential backoff with full jitter on retryable errors (429, 5xx, timeouts)
+#   - a circuit breaker, so an outage fails fast instead of queueing minutes of retries
+#   - optional hedging: a second request when the first one is slower than the recent pXX latency
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from tokens import estimate_tokens
+from metrics import llm_in_flight
+
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1"))            # Seconds, doubled per retry
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "30"))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))    # Consecutive failures that open the breaker
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+LLM_BURST_SECONDS = float(os.getenv("LLM_BURST_SECONDS", "10"))       # Bucket size, in seconds of quota
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0"))    # e.g. 95, 0 = no hedging
+HEDGE_MIN_SAMPLES = 20
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Every client created, reported by /llm_stats
+clients = {}
+
+
+class LLMUnavailableError(Exception):
+    """Gemini is throttling or down (breaker open or retries exhausted). retry_after is a hint in seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def status_code(error: Exception):
+    # google.api_core exceptions carry the HTTP status in .code, httpx/fake errors in .status_code
+    for attr in ("code", "status_code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+def is_retryable(error: Exception):
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    code = status_code(error)
+    if code is not None:
+        return code in RETRYABLE_STATUS
+    message = str(error)
+    return any(s in message for s in ("429", "RESOURCE_EXHAUSTED", "503", "UNAVAILABLE", "DEADLINE_EXCEEDED"))
+
+def is_throttled(error: Exception):
+    return status_code(error) == 429 or "429" in str(error) or "RESOURCE_EXHAUSTED" in str(error)
+
+
+def disable_library_retries():
+    """
+    langchain-google-genai 1.0.x retries any Google API error up to 10 times, without jitter, inside each call.
+    Stacked under LLMClient that multiplies the attempts, so it is cut to a single attempt and LLMClient owns the policy.
+    """
+    try:
+        from langchain_google_genai import chat_models
+        from tenacity import retry, stop_after_attempt
+    except ImportError:
+        return
+    chat_models._create_retry_decorator = lambda: retry(reraise=True, stop=stop_after_attempt(1))
+
+
+def _prompt_text(inputs):
+    if hasattr(inputs, "to_string"):
+        return inputs.to_string()
+    if isinstance(inputs, dict):
+        return " ".join(str(v) for v in inputs.values())
+    return str(inputs)
+
+def count_usage(inputs, output):
+    """(tokens in, tokens out) of one call: the model's usage_metadata when it reports it, else the local estimate."""
+    usage = getattr(output, "usage_metadata", None)
+    if usage and usage.get("input_tokens"):
+        return usage["input_tokens"], usage.get("output_tokens", 0)
+    text = output if isinstance(output, str) else getattr(output, "content", "")
+    return estimate_tokens(_prompt_text(inputs)), estimate_tokens(text if isinstance(text, str) else str(text))
+
+def token_usage(inputs, output):
+    """Log fragment with the tokens in and out of one call."""
+    tokens_in, tokens_out = count_usage(inputs, output)
+    return f"prompt {tokens_in} tokens, output {tokens_out} tokens"
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float, burst_seconds: float = LLM_BURST_SECONDS):
+        self.max_rate = per_minute / 60
+        self.rate = self.max_rate
+        self.capacity = max(1.0, self.max_rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1):
+        amount = min(amount, self.capacity)   # A single oversized request still goes through, alone
+        async with self.lock:   # FIFO, a big request is not starved by small ones
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def scale(self, factor: float):
+        self._refill()
+        self.rate = self.max_rate * factor
+
+
+class CircuitBreaker:
+    """closed -> open after `threshold` consecutive failures -> one half-open probe after `reset_seconds`."""
+
+    def __init__(self, threshold: int, reset_seconds: float):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+        self.opened = 0
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_seconds else "open"
+
+    def check(self, name: str):
+        state = self.state
+        if state == "closed":
+            return
+        now = time.monotonic()
+        # One probe at a time. A probe that never reported back (cancelled) is replaced after reset_seconds
+        if state == "half_open" and (self.probe_started is None or now - self.probe_started >= self.reset_seconds):
+            self.probe_started = now
+            return
+        retry_after = max(1.0, self.reset_seconds - (now - self.opened_at))
+        raise LLMUnavailableError(f"{name} model is unavailable, circuit breaker open", retry_after)
+
+    def record_success(self):
+        self.failures, self.opened_at, self.probe_started = 0, None, None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.probe_started is not None or (self.opened_at is None and self.failures >= self.threshold):
+            self.opened += 1
+            self.opened_at, self.probe_started = time.monotonic(), None
+
+
+class LLMClient:
+    def __init__(self, name: str, rpm: float, tpm: float, overhead_tokens: int = 0,
+                 max_retries: int = LLM_MAX_RETRIES, hedge_percentile: float = LLM_HEDGE_PERCENTILE):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.token_bucket = TokenBucket(tpm)
+        self.overhead_tokens = overhead_tokens   # Prompt template + expected output, on top of the inputs
+        self.max_retries = max_retries
+        self.hedge_percentile = hedge_percentile
+        self.breaker = CircuitBreaker(LLM_BREAKER_THRESHOLD, LLM_BREAKER_RESET_SECONDS)
+        self.rate_factor = 1.0
+        self.latencies = deque(maxlen=200)
+        self.stats = {"calls": 0, "attempts": 0, "retries": 0, "throttled": 0, "failures": 0,
+                      "hedged": 0, "hedge_wins": 0, "rejected": 0,
+                      "tokens_in": 0, "tokens_out": 0}
+        clients[name] = self
+
+    def estimate(self, inputs):
+        """Tokens one call uses: the prompt (a rendered PromptValue or the chain's input dict) plus overhead_tokens."""
+        return estimate_tokens(_prompt_text(inputs)) + self.overhead_tokens
+
+    # Adaptive rate: halve on 429, creep back up 5% per success (AIMD)
+    def _throttle(self):
+        self.rate_factor = max(0.1, self.rate_factor / 2)
+        self.requests.scale(self.rate_factor)
+        self.token_bucket.scale(self.rate_factor)
+
+    def _recover(self):
+        if self.rate_factor < 1.0:
+            self.rate_factor = min(1.0, self.rate_factor + 0.05)
+            self.requests.scale(self.rate_factor)
+            self.token_bucket.scale(self.rate_factor)
+
+    def _backoff(self, attempt: int):
+        return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))   # Full jitter
+
+    def _hedge_delay(self):
+        if not self.hedge_percentile or len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile / 100))]
+
+    async def _acquire(self, tokens: int):
+        await self.requests.acquire()
+        await self.token_bucket.acquire(tokens)
+
+    async def _once(self, runnable, inputs, tokens: int, acquired: bool = False):
+        if not acquired:
+            await self._acquire(tokens)
+        self.stats["attempts"] += 1
+        start = time.monotonic()
+        with llm_in_flight.track(self.name):
+            result = await runnable.ainvoke(inputs)
+        self.latencies.append(time.monotonic() - start)
+        self._count(inputs, result)
+        return result
+
+    def _count(self, inputs, output):
+        tokens_in, tokens_out = count_usage(inputs, output)
+        self.stats["tokens_in"] += tokens_in
+        self.stats["tokens_out"] += tokens_out
+
+    async def _hedged(self, runnable, inputs, tokens: int):
+        delay = self._hedge_delay()
+        await self._acquire(tokens)     # Before the hedge timer starts, waiting for quota is not a slow model
+        first = asyncio.create_task(self._once(runnable, inputs, tokens, acquired=True))
+        tasks = {first}
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    # Slower than the recent pXX, race a second request and keep whichever answers first
+                    self.stats["hedged"] += 1
+                    tasks.add(asyncio.create_task(self._once(runnable, inputs, tokens)))
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _on_error(self, error: Exception, attempt: int):
+        """Records a failed attempt, returns the backoff delay or raises when the call should give up."""
+        if not is_retryable(error):
+            self.breaker.record_success()   # The model answered, e.g. with output the parser rejected
+            raise error
+        if is_throttled(error):
+            # Over quota, not an outage: slow down instead of counting towards the breaker
+            self.stats["throttled"] += 1
+            self._throttle()
+        else:
+            self.breaker.record_failure()
+        if attempt >= self.max_retries:
+            self.stats["failures"] += 1
+            raise LLMUnavailableError(f"{self.name} model failed after {attempt + 1} attempts: {error}", LLM_BACKOFF_MAX) from error
+        self.stats["retries"] += 1
+        delay = self._backoff(attempt)
+        print(f"[LLM] {self.name} attempt {attempt + 1} failed ({error}), retrying in {delay:.1f}s")
+        return delay
+
+    def _check_breaker(self):
+        try:
+            self.breaker.check(self.name)
+        except LLMUnavailableError:
+            self.stats["rejected"] += 1
+            raise
+
+    async def ainvoke(self, runnable, inputs, tokens: int | None = None):
+        """runnable.ainvoke(inputs) under the rate limits, retries, breaker and hedging."""
+        tokens = tokens if tokens is not None else self.estimate(inputs)
+        self.stats["calls"] += 1
+        for attempt in range(self.max_retries + 1):
+            self._check_breaker()
+            try:
+                result = await self._hedged(runnable, inputs, tokens)
+            except Exception as e:
+                await asyncio.sleep(self._on_error(e, attempt))
+            else:
+                self.breaker.record_success()
+                self._recover()
+                return result
+
+    async def astream(self, runnable, inputs, tokens: int | None = None):
+        """runnable.astream(inputs). Retried only until the first chunk arrives, never hedged."""
+        tokens = tokens if tokens is not None else self.estimate(inputs)
+        self.stats["calls"] += 1
+        for attempt in range(self.max_retries + 1):
+            self._check_breaker()
+            await self._acquire(tokens)
+            self.stats["attempts"] += 1
+            started, text = False, []
+            try:
+                with llm_in_flight.track(self.name):
+                    async for chunk in runnable.astream(inputs):
+                        started = True
+                        text.append(chunk.content if isinstance(getattr(chunk, "content", None), str) else "")
+                        yield chunk
+            except Exception as e:
+                if started:     # Part of the answer is already out, a retry would duplicate it
+                    if is_retryable(e) and not is_throttled(e):
+                        self.breaker.record_failure()
+                    raise
+                await asyncio.sleep(self._on_error(e, attempt))
+            else:
+                self.breaker.record_success()
+                self._recover()
+                self._count(inputs, "".join(text))
+                return
+
+    async def abatch(self, runnable, inputs: list, max_concurrency: int = 5, return_exceptions: bool = False):
+        """ainvoke for every input, at most max_concurrency at once, results in input order."""
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def one(item):
+            async with semaphore:
+                return await self.ainvoke(runnable, item)
+
+        return await asyncio.gather(*(one(item) for item in inputs), return_exceptions=return_exceptions)
+
+    def get_stats(self):
+        return {**self.stats, "breaker": self.breaker.state, "breaker_opened": self.breaker.opened,
+                "rate_factor": round(self.rate_factor, 3), "hedge_delay": self._hedge_delay()}
+
+
+def llm_stats():
+    return {name: client.get_stats() for name, client in clients.items()}
@@ -1,27 +1,66 @@
 # llm_quiz_generator.py
+import asyncio
 import os
+import time
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import PydanticOutputParser
-from models import QuizOutput
-from langchain_core.runnables import RunnableSequence
+from models import QuizOutput, QuizBatchOutput
+from stream_parser import QuizStreamParser
+from tokens import estimate_tokens
+from prompt_budget import compact_sections, quiz_token_budget, describe
+from llm_client import LLMClient, LLMUnavailableError, disable_library_retries, token_usage
+from timings import StageTimer
+import llm_backends
 
 load_dotenv()
 
+# Bump whenever the prompt or schema changes, so quizzes cached under the old prompt are regenerated
+PROMPT_VERSION = "v3"  # v2: SOURCE_TEXT compacted to a per-difficulty token budget (prompt_budget.py)
+                       # v3: SOURCE_TEXT lines marked with their [Section] heading, so `section` names a real heading
+
+# SOURCE_TEXT selection: "full" sends every selected section, "retrieval" sends a token-budgeted,
+# section-diverse subset of embedded chunks once the article is longer than the budget
+CONTEXT_MODE = os.getenv("QUIZ_CONTEXT_MODE", "full")
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "6000"))
+
 # Initialize Output Parser
 parser = PydanticOutputParser(pydantic_object=QuizOutput)
+batch_parser = PydanticOutputParser(pydantic_object=QuizBatchOutput)
 api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
-# Initialize Gemini Model (Stable, Fast)
-model = ChatGoogleGenerativeAI(
-    model="models/gemini-2.5-flash",
-    google_api_key=api_key,
-    temperature=0.5
+
+_model = None
+
+def _gemini_model():
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    disable_library_retries()   # Retries are done by quiz_llm below
+    # Initialize Gemini Model (Stable, Fast)
+    return ChatGoogleGenerativeAI(
+        model="models/gemini-2.5-flash",
+        google_api_key=api_key,
+        temperature=0.5
+    )
+
+def get_model():
+    """
+    Quiz model, created on first use. Importing langchain_google_genai alone takes ~1.8s, so app startup skips it.
+    Gemini unless LLM_BACKEND picks a recording, replay or synthetic backend (llm_backends.py).
+    """
+    global _model
+    if _model is None:
+        _model = llm_backends.make_model("quiz", _gemini_model)
+    return _model
+
+# Rate limits / retries / breaker for this model, sized to the Gemini quota
+quiz_llm = LLMClient(
+    "quiz",
+    rpm=float(os.getenv("QUIZ_LLM_RPM", "10")),
+    tpm=float(os.getenv("QUIZ_LLM_TPM", "250000")),
+    overhead_tokens=2500,   # Expected quiz output, the rendered prompt is counted exactly
 )
 
-def generate_quiz(article_title: str, structured_content: dict, difficulty="Medium", selected_sections=None):
-    """Generate a factual, structured quiz from Wikipedia article content."""
-    
+def build_article_text(structured_content: dict, selected_sections=None):
+    """Merge the selected sections (all when none are selected) into the SOURCE_TEXT."""
     # Step 1: Extract relevant sections
     sections = structured_content.get("sections", [])
     if selected_sections:
@@ -32,17 +71,45 @@ def generate_quiz(article_title: str, structured_content: dict, difficulty="Medi
         (s.get("content", "")) + " " + " ".join(sub.get("content", "") for sub in s.get("subsections", []))
         for s in sections
     )
-    # Directly use article text (skip embeddings + FAISS)
-    relevant_text = article_text
+    return article_text
 
 
-    # Creating the prompt
-    prompt = PromptTemplate(
-        input_variables=["title", "content", "difficulty"],
-        partial_variables={
-            "format_instructions": parser.get_format_instructions()
-        },
-        template="""
+def quiz_prompt_version():
+    """PROMPT_VERSION plus the context mode, both change what the model sees. Offline backends get their own variants."""
+    version = PROMPT_VERSION if CONTEXT_MODE == "full" else f"{PROMPT_VERSION}-{CONTEXT_MODE}"
+    return version if llm_backends.is_live() else f"{version}-{llm_backends.LLM_BACKEND}"
+
+
+async def build_context(article_title: str, structured_content: dict, selected_sections=None, difficulty="Medium"):
+    """SOURCE_TEXT for the quiz prompt and a log note on its size, see CONTEXT_MODE and prompt_budget.py."""
+    sections = structured_content.get("sections", [])
+    if selected_sections:
+        sections = [s for s in sections if s["heading"] in selected_sections]
+
+    if CONTEXT_MODE == "retrieval":
+        article_text = build_article_text(structured_content, selected_sections)
+        article_tokens = estimate_tokens(article_text)
+        if article_tokens > RETRIEVAL_TOKEN_BUDGET:
+            from vector_service import select_context   # Embedding stack is only imported when retrieval is enabled
+            headings = selected_sections or [s["heading"] for s in structured_content.get("sections", [])]
+            query = f"{article_title}: " + ", ".join(headings)
+            # Embedding is CPU bound, keep it off the event loop
+            text = await asyncio.to_thread(select_context, structured_content, query, RETRIEVAL_TOKEN_BUDGET, selected_sections, True)
+            return text, f"article {article_tokens} -> {estimate_tokens(text)} tokens (retrieval budget {RETRIEVAL_TOKEN_BUDGET})"
+
+    # Deduplicated, boilerplate-free and cut to the difficulty's budget in proportion to section sizes.
+    # The [Heading] markers let the model fill `section` with a real heading, which incremental refresh relies on
+    text, stats = compact_sections(sections, quiz_token_budget(difficulty), headings=True)
+    return text, describe(stats)
+
+
+# Creating the prompt once, the format instructions (QuizOutput JSON schema) are serialized here and not per request
+quiz_prompt = PromptTemplate(
+    input_variables=["title", "content", "difficulty"],
+    partial_variables={
+        "format_instructions": parser.get_format_instructions()
+    },
+    template="""
     You are an expert Educational Content Designer and meticulous Fact-Checker.
     Your sole goal is to transform the given Wikipedia article content into a **structured, factual, and complete JSON quiz**.
 
@@ -95,7 +162,7 @@ def generate_quiz(article_title: str, structured_content: dict, difficulty="Medi
     - **Answer:** One correct factual answer.
     - **Difficulty:** easy, medium, or hard (as per config).
     - **Explanation:** One factual sentence supporting the answer.
-    - **Section:** Add the relevant section name or "General".
+    - **Section:** The [Section] heading of the text the question comes from, or "General".
     </QUESTION_GUIDELINES>
     <QUESTION_GENERATION_PROCESS>
         For *every single question*, you MUST follow this internal process:
@@ -115,23 +182,244 @@ def generate_quiz(article_title: str, structured_content: dict, difficulty="Medi
     - Do not prefix or suffix your output with commentary, code blocks, or markdown.
     </OUTPUT_CONSTRAINTS>
     """
-    )
+)
+
+
+# Batch prompt: the quiz prompt with its CONFIG and TASK blocks swapped, so the rules stay in one place
+_BATCH_CONFIG = """    <VARIANTS>
+    {variants}
+    </VARIANTS>
+
+"""
+_BATCH_TASK = """    <TASK_DESCRIPTION>
+    Based on the provided <SOURCE_TEXT> and <ARTICLE_TITLE>, generate one factual quiz per line of <VARIANTS>, all in a single JSON object that matches the <JSON_SCHEMA>.
+    Your response will include:
+    - A 2–3 line summary, thematic sections and key entities, written once for the whole article.
+    - In `variants`, one entry per line of <VARIANTS>, in the same order, with its `difficulty` and `scope` copied from that line and exactly 8 multiple-choice questions (MCQs).
+    - A variant whose scope lists sections uses only the text marked with those [Section] headings in <SOURCE_TEXT>.
+    - No question is repeated across variants.
+    </TASK_DESCRIPTION>
+
+    <DIFFICULTY_DISTRIBUTION>
+    - Easy variant: 6 Easy, 2 Medium
+    - Medium variant: 2 Easy, 5 Medium, 1 Hard
+    - Hard variant: 1 Easy, 2 Medium, 5 Hard
+    </DIFFICULTY_DISTRIBUTION>
+
+"""
 
-    # Building the LangChain runnable chain
-    chain: RunnableSequence = prompt | model | parser
+def _swap_block(template: str, start: str, end: str, replacement: str):
+    return template[:template.index(start)] + replacement + template[template.index(end):]
+
+batch_quiz_prompt = PromptTemplate(
+    input_variables=["title", "content", "variants"],
+    partial_variables={
+        "format_instructions": batch_parser.get_format_instructions()
+    },
+    template=_swap_block(
+        _swap_block(quiz_prompt.template, "    <CONFIG>", "    <CORE_RULES>", _BATCH_CONFIG),
+        "    <TASK_DESCRIPTION>", "    <QUESTION_GUIDELINES>", _BATCH_TASK,
+    ),
+)
+
+# Refresh prompt: the quiz prompt asking only for replacements of the questions about sections an edit changed
+_REFRESH_TASK = """    <TASK_DESCRIPTION>
+    The article was edited and the questions of an existing quiz about the changed sections must be replaced.
+    <SOURCE_TEXT> holds only those changed sections. Based on it and <ARTICLE_TITLE>, generate a quiz that matches the <JSON_SCHEMA>, where:
+    - `quiz` has exactly {count} multiple-choice questions (MCQs), with these difficulties in this order: {question_difficulties}.
+    - `summary`, `sections` and `key_entities` are kept short, they are not used.
+    </TASK_DESCRIPTION>
+
+"""
+
+refresh_quiz_prompt = PromptTemplate(
+    input_variables=["title", "content", "difficulty", "count", "question_difficulties"],
+    partial_variables={
+        "format_instructions": parser.get_format_instructions()
+    },
+    template=_swap_block(quiz_prompt.template, "    <TASK_DESCRIPTION>", "    <QUESTION_GUIDELINES>", _REFRESH_TASK),
+)
+
+
+async def generate_quiz(article_title: str, structured_content: dict, difficulty="Medium", selected_sections=None):
+    """Generate a factual, structured quiz from Wikipedia article content."""
+    timer = StageTimer("quiz")
+    with timer.stage("context"):
+        relevant_text, context_note = await build_context(article_title, structured_content, selected_sections, difficulty)
 
+    # The stages of quiz_prompt | model | parser, run one by one so each is timed
     try:
-        result = chain.invoke({
-            "title": article_title,
-            "content": relevant_text,
-            "difficulty": difficulty
-        })
+        with timer.stage("render"):
+            prompt = quiz_prompt.format_prompt(title=article_title, content=relevant_text, difficulty=difficulty)
+        with timer.stage("model"):
+            message = await quiz_llm.ainvoke(get_model(), prompt)
+        print(f"[TOKENS] quiz '{article_title}' ({difficulty}): {context_note} | {token_usage(prompt, message)}")
+        with timer.stage("parse"):
+            result = parser.parse(message.content)
         print(result)
         quiz_json = result.dict() if hasattr(result, "dict") else result.model_dump()
         return quiz_json
 
+    except LLMUnavailableError as e:
+        print(f"[Error] Quiz generation failed: {e}")
+        return {"error": str(e), "title": article_title, "retry_after": e.retry_after}
+
     except Exception as e:
         print(f"[Error] Quiz generation failed: {e}")
         return {"error": str(e), "title": article_title}
 
+    finally:
+        print(f"[TIMING] quiz '{article_title}': {timer.summary()}")
+
+
+async def stream_quiz(article_title: str, structured_content: dict, difficulty="Medium", selected_sections=None):
+    """
+    Streaming variant of generate_quiz. Yields ("question", dict) as soon as each question
+    is complete and valid, then ("quiz", dict) with the fully parsed quiz, or ("error", str).
+    """
+    timer = StageTimer("quiz_stream")
+    with timer.stage("context"):
+        relevant_text, context_note = await build_context(article_title, structured_content, selected_sections, difficulty)
+    stream_parser = QuizStreamParser()
+    chunks = []
+
+    try:
+        with timer.stage("render"):
+            prompt = quiz_prompt.format_prompt(title=article_title, content=relevant_text, difficulty=difficulty)
+        # Raw text chunks, parsed incrementally below. The model stage only counts the waits for the next chunk,
+        # not the time the consumer holds each yielded question
+        model_seconds, waiting_since = 0.0, time.perf_counter()
+        try:
+            async for chunk in quiz_llm.astream(get_model(), prompt):
+                model_seconds += time.perf_counter() - waiting_since
+                chunks.append(chunk.content)
+                for question in stream_parser.feed(chunk.content):
+                    yield "question", question
+                waiting_since = time.perf_counter()
+            model_seconds += time.perf_counter() - waiting_since
+        finally:
+            timer.record("model", model_seconds * 1000)
+
+        print(f"[TOKENS] quiz stream '{article_title}' ({difficulty}): {context_note} | {token_usage(prompt, ''.join(chunks))}")
+        # Full validation of the assembled output, same as the non-streaming path
+        with timer.stage("parse"):
+            result = parser.parse("".join(chunks))
+        yield "quiz", result.model_dump()
+
+    except Exception as e:
+        print(f"[Error] Quiz streaming failed: {e}")
+        yield "error", str(e)
+
+    finally:
+        print(f"[TIMING] quiz stream '{article_title}': {timer.summary()}")
+
+
+def variant_scope(selected_sections):
+    return "; ".join(selected_sections) if selected_sections else "All"
+
+
+def _variant_label(difficulty: str, scope: str):
+    # Case, spacing and section order of the model's copy don't matter
+    return difficulty.strip().lower(), frozenset(part.strip().lower() for part in scope.split(";") if part.strip())
+
+
+def match_variants(requested: list[dict], answered: list):
+    """The answered QuizVariantOutput of every requested variant, matched on difficulty and scope, not position."""
+    remaining = list(answered)
+    matched = []
+    for v in requested:
+        label = _variant_label(v["difficulty"], variant_scope(v["sections"]))
+        found = next((a for a in remaining if _variant_label(a.difficulty, a.scope) == label), None)
+        if found is None:
+            raise ValueError(f"Quiz variant {v['difficulty']} / {variant_scope(v['sections'])} missing from the batch answer")
+        remaining.remove(found)
+        matched.append(found)
+    return matched
+
+
+async def generate_quiz_batch(article_title: str, structured_content: dict, variants: list[dict], url: str = ""):
+    """
+    Several quizzes of one article from a single prompt, the SOURCE_TEXT is sent once.
+    variants: [{"difficulty", "sections"}]. Returns one QuizOutput-shaped dict per variant, in order,
+    or {"error": ...} like generate_quiz.
+    """
+    timer = StageTimer("quiz_batch")
+    with timer.stage("context"):
+        # Union of the variants' sections at the largest of their budgets, built like a single quiz's
+        # context (CONTEXT_MODE included), so the variants are keyed with the same prompt version
+        wanted = None
+        if all(v["sections"] for v in variants):
+            wanted = sorted({heading for v in variants for heading in v["sections"]})
+        widest = max(variants, key=lambda v: quiz_token_budget(v["difficulty"]))
+        relevant_text, context_note = await build_context(article_title, structured_content, wanted, widest["difficulty"])
+
+    try:
+        with timer.stage("render"):
+            prompt = batch_quiz_prompt.format_prompt(
+                title=article_title,
+                content=relevant_text,
+                variants="\n    ".join(
+                    f"{n}. difficulty: {v['difficulty']} | scope: {variant_scope(v['sections'])}"
+                    for n, v in enumerate(variants, 1)
+                ),
+            )
+        with timer.stage("model"):
+            message = await quiz_llm.ainvoke(get_model(), prompt, tokens=quiz_llm.estimate(prompt) + 2000 * len(variants))
+        print(f"[TOKENS] quiz batch '{article_title}' ({len(variants)} variants): {context_note} | {token_usage(prompt, message)}")
+        with timer.stage("parse"):
+            result = batch_parser.parse(message.content)
+        # Each quiz is stored under its request's variant key, a reordered answer must not swap difficulties
+        answered = match_variants(variants, result.variants)
+
+        shared = result.model_dump(exclude={"variants"})
+        # Stored like single quizzes, so /quiz/{id} and the variant cache don't see a difference
+        return [{"id": None, "url": url, **shared, "quiz": [q.model_dump() for q in v.quiz]} for v in answered]
+
+    except LLMUnavailableError as e:
+        print(f"[Error] Batch quiz generation failed: {e}")
+        return {"error": str(e), "title": article_title, "retry_after": e.retry_after}
+
+    except Exception as e:
+        print(f"[Error] Batch quiz generation failed: {e}")
+        return {"error": str(e), "title": article_title}
+
+    finally:
+        print(f"[TIMING] quiz batch '{article_title}': {timer.summary()}")
+
+
+async def generate_section_questions(article_title: str, structured_content: dict, difficulty: str, sections: list[str], question_difficulties: list[str]):
+    """
+    Replacement questions drawn from the given sections only, one per entry of question_difficulties
+    (used by incremental.refresh_quiz). Returns a list of question dicts, or {"error": ...} like generate_quiz.
+    """
+    timer = StageTimer("quiz_refresh")
+    with timer.stage("context"):
+        chosen = [s for s in structured_content.get("sections", []) if s["heading"] in sections]
+        relevant_text, stats = compact_sections(chosen, quiz_token_budget(difficulty), headings=True)
+
+    try:
+        with timer.stage("render"):
+            prompt = refresh_quiz_prompt.format_prompt(
+                title=article_title, content=relevant_text, difficulty=difficulty,
+                count=len(question_difficulties), question_difficulties=", ".join(question_difficulties),
+            )
+        with timer.stage("model"):
+            message = await quiz_llm.ainvoke(get_model(), prompt, tokens=quiz_llm.estimate(prompt) + 300 * len(question_difficulties))
+        print(f"[TOKENS] quiz refresh '{article_title}' ({len(question_difficulties)} questions): {describe(stats)} | {token_usage(prompt, message)}")
+        with timer.stage("parse"):
+            result = parser.parse(message.content)
+        if len(result.quiz) < len(question_difficulties):
+            # Merging a short answer would silently shrink the stored quiz
+            raise ValueError(f"Expected {len(question_difficulties)} replacement questions, got {len(result.quiz)}")
+        return [q.model_dump() for q in result.quiz[:len(question_difficulties)]]
+
+    except LLMUnavailableError as e:
+        print(f"[Error] Quiz refresh failed: {e}")
+        return {"error": str(e), "title": article_title, "retry_after": e.retry_after}
+
+    except Exception as e:
+        print(f"[Error] Quiz refresh failed: {e}")
+        return {"error": str(e), "title": article_title}
 
+    finally:
+        print(f"[TIMING] quiz refresh '{article_title}': {timer.summary()}")
@@ -1,22 +1,44 @@
 # llm_summary_extractor.py
 import os
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import PromptTemplate
+from llm_client import LLMClient, disable_library_retries, token_usage
+from timings import StageTimer
+import llm_backends
 
 load_dotenv() # Loading API keys from .env
 api_key = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
-# Initialize model (fast and stable)
-summary_model = ChatGoogleGenerativeAI(
-    model="models/gemini-2.5-flash-lite",  # For Fast & efficient summaries
-    google_api_key=api_key,
-    temperature=0.25,
+_summary_model = None
+
+def _gemini_summary_model():
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    disable_library_retries()   # Retries are done by summary_llm below
+    # Initialize model (fast and stable)
+    return ChatGoogleGenerativeAI(
+        model="models/gemini-2.5-flash-lite",  # For Fast & efficient summaries
+        google_api_key=api_key,
+        temperature=0.25,
+    )
+
+def get_summary_model():
+    """Summary model, created on first use like llm_quiz_generator.get_model (same LLM_BACKEND)."""
+    global _summary_model
+    if _summary_model is None:
+        _summary_model = llm_backends.make_model("summary", _gemini_summary_model)
+    return _summary_model
+
+# Separate quota from the quiz model
+summary_llm = LLMClient(
+    "summary",
+    rpm=float(os.getenv("SUMMARY_LLM_RPM", "15")),
+    tpm=float(os.getenv("SUMMARY_LLM_TPM", "250000")),
+    overhead_tokens=400,    # Expected output, the rendered prompt is counted exactly
 )
 
 # Define structured summarization prompt
 summary_prompt = PromptTemplate.from_template("""
 You are an expert summarizer and educator.
-Read the following article carefully and extract **10 concise, factual, and insightful key summary points** and return as a JSON list of strings.
+Read the following article carefully and extract **{count} concise, factual, and insightful key summary points** and return as a JSON list of strings.
 
 Guidelines:
 - Do NOT repeat trivial info already in the title.
@@ -37,11 +59,44 @@ Article Content:
 import json
 import re
 
-def generate_summary_points(title: str, content: str):
-    """Generate 10 key factual summaries."""
-    chain = summary_prompt | summary_model
-    response = chain.invoke({"title": title, "content": content})
-    text = response.content.strip()
+async def generate_summary_points(title: str, content: str, count: int = 10):
+    """Generate `count` key factual summaries (fewer when refreshing only the changed sections, see incremental.py)."""
+    timer = StageTimer("summary")
+    try:
+        with timer.stage("render"):
+            prompt = summary_prompt.format_prompt(title=title, content=content, count=count)
+        with timer.stage("model"):
+            response = await summary_llm.ainvoke(get_summary_model(), prompt)
+        print(f"[TOKENS] summary '{title}': {token_usage(prompt, response)}")
+        with timer.stage("parse"):
+            return parse_summary_points(response.content)
+    finally:
+        print(f"[TIMING] summary '{title}': {timer.summary()}")
+
+
+async def generate_summary_points_batch(articles: list[dict], max_concurrency: int = 5):
+    """
+    Summaries for many {title, content} articles, max_concurrency calls at a time under the summary quota, in input order.
+    A failed article gets its exception instead of points, so the caller can retry it rather than store a placeholder.
+    """
+    responses = await summary_llm.abatch(
+        get_summary_model(),
+        [summary_prompt.format_prompt(title=a["title"], content=a["content"], count=10) for a in articles],
+        max_concurrency=max_concurrency,
+        return_exceptions=True,     # One failed article must not drop the whole batch
+    )
+    points = []
+    for response in responses:
+        if isinstance(response, Exception):
+            print(f"[Error] Summary generation failed: {response}")
+            points.append(response)
+        else:
+            points.append(parse_summary_points(response.content))
+    return points
+
+
+def parse_summary_points(text: str):
+    text = text.strip()
 
     # Remove markdown wrappers like ```json ... ```
     text = re.sub(r"^```json|```$", "", text, flags=re.MULTILINE).strip()
@@ -58,5 +113,3 @@ def generate_summary_points(title: str, content: str):
     # Fallback: Extract lines manually
     lines = [line.strip(" -•\"\',") for line in text.splitlines() if line.strip()]
     return [l for l in lines if len(l) > 5][:]
-
-    
@@ -1,16 +1,46 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, HttpUrl
-from scraper_service import get_or_create_scraped_data
-from database import SessionLocal, Quiz, init_db
-from llm_quiz_generator import generate_quiz
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, HttpUrl, Field
+from scraper_service import (
+    get_or_create_scraped_data, load_scraped_content, save_quiz_data, get_cache_stats, variant_cache_stats,
+    quiz_variant_key, load_quiz_variant, list_quiz_variants, load_variant_quiz, load_previous_variant,
+)
+from index_cache import index_cache
+from scraper import close_client
+from history_service import get_history_page, history_etag, MAX_PAGE_SIZE
+from database import Quiz, GeneratedQuiz, init_db, get_db, pool_stats
+from sqlalchemy.orm import Session
+from compression import unpack_raw
+from response_cache import quiz_cache, CachedBody, etag_matches, json_bytes
+from llm_quiz_generator import generate_quiz, stream_quiz, generate_quiz_batch
+from incremental import refresh_quiz
+from job_queue import job_queue
+from llm_client import LLMUnavailableError, llm_stats
+from timings import stage_stats
+from metrics import MetricsMiddleware, family, render as render_metrics
+from url_normalizer import normalize_url
+import asyncio
+import hashlib
 import json
+import time
+from contextlib import asynccontextmanager
 
 # Initialize DB
 init_db()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await job_queue.start()     # Background quiz generation workers, see job_queue.py
+    yield
+    await job_queue.stop()
+    await asyncio.gather(*_stream_tasks)    # Streamed quizzes whose client left are saved before exiting
+    await close_client()  # Closing the pooled Wikipedia connections on shutdown
+
 # FastAPI App
-app = FastAPI(title="AI Wiki Quiz Generator")
+app = FastAPI(title="AI Wiki Quiz Generator", lifespan=lifespan)
 
 # CORS Middleware
 app.add_middleware(
@@ -22,7 +52,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Total-Count"],   # Paging headers of /history
 )
+app.add_middleware(MetricsMiddleware)   # Request latency, in-flight requests and tracing spans, see metrics.py
 
 
 # Model to scrape the Wikipedia
@@ -35,6 +67,24 @@ class QuizRequest(BaseModel):
     difficulty: str
     sections: list[str] | None = None
 
+# Model to submit a quiz generation job
+class QuizJobRequest(QuizRequest):
+    priority: int = Field(0, ge=-10, le=10)   # Higher runs first
+
+# Models to generate several quiz variants of one article with a single LLM call
+MAX_BATCH_VARIANTS = 6
+
+class QuizVariantRequest(BaseModel):
+    difficulty: str
+    sections: list[str] | None = None
+
+class QuizBatchRequest(BaseModel):
+    url: HttpUrl
+    variants: list[QuizVariantRequest] = Field(..., min_length=1, max_length=MAX_BATCH_VARIANTS)
+
+class QuizBatchJobRequest(QuizBatchRequest):
+    priority: int = Field(0, ge=-10, le=10)
+
 
 # Health route
 @app.get("/")
@@ -52,10 +102,61 @@ def debug_env():
         "GEMINI_API_KEY_SET": bool(os.getenv("GEMINI_API_KEY"))
     }
 
+@app.get("/cache_stats")
+def cache_stats():
+    return get_cache_stats()  # Returning {hits, misses, coalesced, revalidated, refreshed, deduplicated, revalidate_errors, hit_rate, incremental_refresh}
+
+@app.get("/index_cache_stats")
+def index_cache_stats():
+    return index_cache.stats()  # Returning {hits, misses, hit_rate, evictions, entries, resident_bytes, max_bytes}
+
+@app.get("/quiz_cache_stats")
+def quiz_cache_stats():
+    return quiz_cache.stats()   # Returning {hits, misses, hit_rate, evictions, invalidations, entries, resident_bytes, max_bytes}
+
+@app.get("/llm_stats")
+def get_llm_stats():
+    # Returning {clients: {name: {calls, retries, throttled, hedged, breaker, ...}}, stages: {"quiz.model": {count, p50_ms, p95_ms, max_ms}, ...}}
+    return {"clients": llm_stats(), "stages": stage_stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    # Prometheus text format: stage/DB/request histograms and in-flight gauges from metrics.py, plus the counters behind the *_stats routes
+    scrape, index, llm, pool = get_cache_stats(), index_cache.stats(), llm_stats(), pool_stats()
+    refresh = scrape["incremental_refresh"]
+    caches = {"scrape": scrape, "quiz_variant": variant_cache_stats, "retrieval_index": index, "quiz_response": quiz_cache.stats()}
+    text = render_metrics(
+        family("quiz_cache_hits_total", "counter", "Cache hits", ("cache",), [((name,), c["hits"]) for name, c in caches.items()]),
+        family("quiz_cache_misses_total", "counter", "Cache misses", ("cache",), [((name,), c["misses"]) for name, c in caches.items()]),
+        family("quiz_scrape_coalesced_total", "counter", "Requests that waited on a scrape already in progress", (), [((), scrape["coalesced"])]),
+        family("quiz_scrape_revalidate_errors_total", "counter", "Stale articles served from the DB because the re-fetch failed", (), [((), scrape["revalidate_errors"])]),
+        family("quiz_scrape_deduplicated_total", "counter", "Scrapes whose content was already stored under another URL", (), [((), scrape["deduplicated"])]),
+        family("quiz_refresh_total", "counter", "Refreshes of changed articles, incremental or full", ("kind", "mode"),
+               [((kind, mode), r[mode]) for kind, r in refresh.items() for mode in ("incremental", "full")]),
+        family("quiz_refresh_items_total", "counter", "Summary points / questions kept or regenerated by incremental refreshes", ("kind", "outcome"),
+               [((kind, outcome), r[outcome]) for kind, r in refresh.items() for outcome in ("kept", "regenerated")]),
+        family("quiz_llm_tokens_total", "counter", "Gemini tokens (usage metadata, estimated when missing)", ("client", "direction"),
+               [((name, d), s[f"tokens_{d}"]) for name, s in llm.items() for d in ("in", "out")]),
+        *(family(f"quiz_llm_{key}_total", "counter", f"Gemini {key} per client", ("client",), [((name,), s[key]) for name, s in llm.items()])
+          for key in ("calls", "attempts", "retries", "throttled", "failures", "hedged", "rejected")),
+        family("quiz_llm_breaker_open", "gauge", "1 while the circuit breaker rejects calls", ("client",),
+               [((name,), int(s["breaker"] == "open")) for name, s in llm.items()]),
+        family("quiz_db_pool_connections", "gauge", "Pooled DB connections by state", ("state",),
+               [((state,), pool[state]) for state in ("size", "checked_out", "checked_in", "overflow") if state in pool]),
+        family("quiz_db_pool_checkouts_total", "counter", "Connections handed out by the pool", (), [((), pool["checkouts"])]),
+        family("quiz_db_pool_timeouts_total", "counter", "Checkouts that gave up waiting for a connection", (), [((), pool["timeouts"])]),
+    )
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+@app.get("/db_stats")
+def get_db_stats():
+    # Returning {pool, size, checked_out, checked_in, overflow, max_overflow, timeout_s, checkouts, timeouts, wait_p50_ms, wait_p95_ms, wait_max_ms}
+    return pool_stats()
+
 @app.post("/generate_quiz",description='Getting data from wikipedia',tags=['Quiz']) #Srape and stores data in DB
 async def preview_article(payload: URLPreview):
     try:
-        scraped = get_or_create_scraped_data(str(payload.url))
+        scraped = await get_or_create_scraped_data(str(payload.url))
         sections = [s["heading"] for s in scraped["sections"]]
         print(f"Got {scraped['title']}'s data!")
         return {"status":True,"title": scraped["title"], "available_sections": sections,"summary_points":scraped.get("summary_points", [])} # Returning {title, sections, summary_points}
@@ -63,75 +164,342 @@ async def preview_article(payload: URLPreview):
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@app.put("/generate_quiz", description="Update quiz record with generated AI quiz", tags=["Quiz"])
-async def generate_quiz_endpoint(payload: QuizRequest):
-    db = SessionLocal()
-    try:
-        print(f"[REQUEST] Generating quiz for {payload.url} | Difficulty: {payload.difficulty}")
+async def refresh_quiz_variant(url: str, scraped_data: dict, variant: dict, difficulty: str, sections: list[str] | None):
+    """
+    The same quiz generated from an earlier revision of the article with the questions about changed sections
+    regenerated, see incremental.py. None when there is no such quiz or too much changed.
+    """
+    previous = await run_in_threadpool(load_previous_variant, url, variant)
+    if previous is None:
+        return None
+    return await refresh_quiz(scraped_data, difficulty, sections, previous)
 
-        existing = db.query(Quiz).filter(Quiz.url == str(payload.url)).first()
-        if not existing:
-            raise HTTPException(status_code=404, detail="Scraped data not found. Please run /generate_quiz (POST) first.")
 
-        scraped_data = json.loads(existing.scraped_content)
-        print("[INFO] Scraped data loaded successfully.")
+async def build_quiz_variant(url: str, difficulty: str, sections: list[str] | None):
+    """Stored quiz variant for the request, generated and saved first if there is none. Shared by PUT /generate_quiz and the job workers."""
+    # DB work runs in the threadpool, no session is held open during the LLM call
+    scraped_data = await run_in_threadpool(load_scraped_content, url)
+    if scraped_data is None:
+        raise LookupError("Scraped data not found. Please run /generate_quiz (POST) first.")
 
-        quiz = generate_quiz(
+    print("[INFO] Scraped data loaded successfully.")
+
+    # Each (content, difficulty, sections, prompt version) combination is generated only once
+    variant = quiz_variant_key(scraped_data, difficulty, sections)
+    quiz_id, variant_id, cached_quiz = await run_in_threadpool(load_quiz_variant, url, variant["variant_key"])
+    if cached_quiz is not None:
+        print("[INFO] Returning stored quiz variant.")
+        return {"quiz": cached_quiz, "quiz_id": quiz_id, "variant_id": variant_id, "cached": True}
+
+    # Article changed since this quiz was last generated: only the questions about changed sections are redone
+    quiz = await refresh_quiz_variant(url, scraped_data, variant, difficulty, sections)
+    if quiz is None:
+        quiz = await generate_quiz(
             article_title=scraped_data["title"],
             structured_content=scraped_data,
-            difficulty=payload.difficulty,
-            selected_sections=payload.sections
+            difficulty=difficulty,
+            selected_sections=sections
         )
 
-        if "error" in quiz:
-            print(f"[LLM ERROR] {quiz['error']}")
-            raise HTTPException(status_code=500, detail=quiz["error"])
+    if "error" in quiz:
+        print(f"[LLM ERROR] {quiz['error']}")
+        if quiz.get("retry_after") is not None:
+            raise LLMUnavailableError(quiz["error"], quiz["retry_after"])
+        raise RuntimeError(quiz["error"])
+
+    print("[INFO] Quiz generation successful.")
+    variant_id = await run_in_threadpool(save_quiz_data, url, quiz, variant)
+    return {"quiz": quiz, "quiz_id": quiz_id, "variant_id": variant_id, "cached": False}
+
+
+async def build_quiz_batch(url: str, variants: list[dict]):
+    """
+    Stored or newly generated quiz for every {difficulty, sections} variant. The missing ones are
+    generated together from one prompt (one alone goes through generate_quiz) and stored as separate variants.
+    """
+    scraped_data = await run_in_threadpool(load_scraped_content, url)
+    if scraped_data is None:
+        raise LookupError("Scraped data not found. Please run /generate_quiz (POST) first.")
+
+    keys = [quiz_variant_key(scraped_data, v["difficulty"], v["sections"]) for v in variants]
+    results, missing = {}, {}
+    quiz_id = None
+    for v, key in zip(variants, keys):
+        if key["variant_key"] in results or key["variant_key"] in missing:
+            continue    # Same variant asked twice
+        quiz_id, variant_id, cached_quiz = await run_in_threadpool(load_quiz_variant, url, key["variant_key"])
+        if cached_quiz is not None:
+            results[key["variant_key"]] = {"quiz": cached_quiz, "variant_id": variant_id, "cached": True}
+        else:
+            missing[key["variant_key"]] = (v, key)
+
+    # Variants generated from an earlier revision are refreshed concurrently, the rest share one batch call below
+    refreshed = await asyncio.gather(*(
+        refresh_quiz_variant(url, scraped_data, key, v["difficulty"], v["sections"]) for v, key in missing.values()
+    ))
+    for (variant_key, (v, key)), quiz in zip(list(missing.items()), refreshed):
+        if quiz is not None and "error" not in quiz:
+            variant_id = await run_in_threadpool(save_quiz_data, url, quiz, key)
+            results[variant_key] = {"quiz": quiz, "variant_id": variant_id, "cached": False}
+            del missing[variant_key]
+
+    if len(missing) == 1:
+        [(v, key)] = missing.values()
+        quizzes = [await generate_quiz(scraped_data["title"], scraped_data, v["difficulty"], v["sections"])]
+        quizzes = quizzes[0] if "error" in quizzes[0] else quizzes
+    elif missing:
+        print(f"[INFO] Generating {len(missing)} quiz variants in one call.")
+        quizzes = await generate_quiz_batch(scraped_data["title"], scraped_data, [v for v, _ in missing.values()], url)
+    else:
+        quizzes = []
 
-        print("[INFO] Quiz generation successful.")
-        existing.full_quiz_data = json.dumps(quiz, ensure_ascii=False)
-        db.commit()
+    if isinstance(quizzes, dict):   # {"error": ...}
+        print(f"[LLM ERROR] {quizzes['error']}")
+        if quizzes.get("retry_after") is not None:
+            raise LLMUnavailableError(quizzes["error"], quizzes["retry_after"])
+        raise RuntimeError(quizzes["error"])
 
-        return {"status": True, "quiz": quiz}
+    for (v, key), quiz in zip(missing.values(), quizzes):
+        variant_id = await run_in_threadpool(save_quiz_data, url, quiz, key)
+        results[key["variant_key"]] = {"quiz": quiz, "variant_id": variant_id, "cached": False}
 
+    return {
+        "quiz_id": quiz_id,
+        "variants": [
+            {"difficulty": v["difficulty"], "sections": v["sections"], **results[key["variant_key"]]}
+            for v, key in zip(variants, keys)
+        ],
+    }
+
+
+@app.put("/generate_quiz", description="Update quiz record with generated AI quiz", tags=["Quiz"])
+async def generate_quiz_endpoint(payload: QuizRequest):
+    try:
+        print(f"[REQUEST] Generating quiz for {payload.url} | Difficulty: {payload.difficulty}")
+        return {"status": True, **await build_quiz_variant(str(payload.url), payload.difficulty, payload.sections)}
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except LLMUnavailableError as e:
+        # Throttled or breaker open: tell the client when to come back instead of a plain 500
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(int(e.retry_after))})
     except Exception as e:
-        db.rollback()
         import traceback
         traceback.print_exc()
         print(f"[EXCEPTION] {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error generating quiz: {str(e)}")
 
-    finally:
-        db.close()
 
+@app.put("/generate_quiz/batch", description="Generate several difficulty/section variants of a quiz with one LLM call", tags=["Quiz"])
+async def generate_quiz_batch_endpoint(payload: QuizBatchRequest):
+    variants = [v.model_dump() for v in payload.variants]
+    try:
+        print(f"[REQUEST] Generating {len(variants)} quiz variants for {payload.url}")
+        return {"status": True, **await build_quiz_batch(str(payload.url), variants)}
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except LLMUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(int(e.retry_after))})
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        print(f"[EXCEPTION] {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error generating quiz: {str(e)}")
+
+
+@job_queue.handler("generate_quiz")
+async def generate_quiz_job(payload: dict):
+    result = await build_quiz_variant(payload["url"], payload["difficulty"], payload["sections"])
+    return {"quiz_id": result["quiz_id"], "variant_id": result["variant_id"], "cached": result["cached"]}  # The quiz itself stays in generated_quizzes
+
+@job_queue.handler("generate_quiz_batch")
+async def generate_quiz_batch_job(payload: dict):
+    result = await build_quiz_batch(payload["url"], payload["variants"])
+    for variant in result["variants"]:
+        del variant["quiz"]     # Stays in generated_quizzes, loaded again by /jobs/{id}/result
+    return result
+
+def job_status(job: dict):
+    return {key: job[key] for key in ("id", "kind", "status", "priority", "attempts", "error", "created_at", "started_at", "finished_at")}
 
+@app.post("/jobs/generate_quiz", status_code=202, description="Queue quiz generation and return the job id at once", tags=["Jobs"])
+async def submit_quiz_job(payload: QuizJobRequest):
+    url = str(payload.url)
+    params = {"url": url, "difficulty": payload.difficulty, "sections": payload.sections}
+    # A retried submit of the same quiz joins the queued/running job instead of paying for a second LLM call
+    dedupe = json.dumps([normalize_url(url), payload.difficulty.strip().lower(), sorted(set(payload.sections or []))])
+    job = await job_queue.submit("generate_quiz", params, payload.priority, hashlib.sha256(dedupe.encode("utf-8")).hexdigest())
+    print(f"[REQUEST] Queued quiz job {job['id']} for {url} | Difficulty: {payload.difficulty}")
+    return job_status(job)  # Returning {id, status, ...}, poll /jobs/{id}
 
-@app.get("/history", description='Getting the list of all saved quizzes.', tags=['Quiz']) # Getting all store records from DB
-def get_history():
-    db = SessionLocal()
+@app.post("/jobs/generate_quiz/batch", status_code=202, description="Queue generation of several quiz variants with one LLM call", tags=["Jobs"])
+async def submit_quiz_batch_job(payload: QuizBatchJobRequest):
+    url = str(payload.url)
+    variants = [v.model_dump() for v in payload.variants]
+    dedupe = json.dumps([normalize_url(url)] + sorted(
+        json.dumps([v["difficulty"].strip().lower(), sorted(set(v["sections"] or []))]) for v in variants
+    ))
+    job = await job_queue.submit("generate_quiz_batch", {"url": url, "variants": variants}, payload.priority,
+                                 hashlib.sha256(dedupe.encode("utf-8")).hexdigest())
+    print(f"[REQUEST] Queued batch quiz job {job['id']} for {url} | {len(variants)} variants")
+    return job_status(job)
+
+@app.get("/jobs/{job_id}", description="Status of a background job", tags=["Jobs"])
+async def get_job(job_id: str):
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job_status(job)
+
+@app.get("/jobs/{job_id}/result", description="Result of a finished quiz job, 202 while it is still queued or running", tags=["Jobs"])
+async def get_job_result(job_id: str):
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    if job["status"] in ("queued", "running"):
+        return JSONResponse(status_code=202, content=jsonable_encoder(job_status(job)))
+    if job["status"] == "failed":
+        raise HTTPException(status_code=500, detail=f"Error generating quiz: {job['error']}")
+
+    result = job["result"]
+    if job["kind"] == "generate_quiz_batch":
+        variants = [{**v, "quiz": await run_in_threadpool(load_variant_quiz, v["variant_id"])} for v in result["variants"]]
+        return {"status": True, "quiz_id": result["quiz_id"], "variants": variants}  # Same body as PUT /generate_quiz/batch
+    quiz = await run_in_threadpool(load_variant_quiz, result["variant_id"])
+    return {"status": True, "quiz": quiz, **result}  # Same body as PUT /generate_quiz
+
+
+
+def sse_event(event: str, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+# Streamed generations still running, referenced here so a task whose client left isn't garbage collected
+_stream_tasks = set()
+
+async def _stream_and_save(url: str, scraped_data: dict, payload: QuizRequest, variant: dict, quiz_id, events: asyncio.Queue):
+    """
+    stream_quiz plus the save, run as a task that feeds SSE strings into `events` (None at the end).
+    A client that disconnects mid-stream only stops reading, the quiz is still saved like PUT /generate_quiz does.
+    """
+    start = time.perf_counter()
+    first_question_ms = None
     try:
-        records = db.query(Quiz.id, Quiz.url, Quiz.title, Quiz.date_generated).all()
-        history = [
-            {
-                "id": r.id,
-                "url": r.url,
-                "title": r.title,
-                "date_generated": r.date_generated
-            }
-            for r in records
-        ]
-        return history  # Returning {id, url, title, date_generated}
+        async for kind, data in stream_quiz(
+            article_title=scraped_data["title"],
+            structured_content=scraped_data,
+            difficulty=payload.difficulty,
+            selected_sections=payload.sections
+        ):
+            if kind == "question":
+                if first_question_ms is None:
+                    first_question_ms = round((time.perf_counter() - start) * 1000, 1)
+                events.put_nowait(sse_event("question", data))
+            elif kind == "quiz":
+                saved_variant_id = await run_in_threadpool(save_quiz_data, url, data, variant)
+                total_ms = round((time.perf_counter() - start) * 1000, 1)
+                print(f"[INFO] Streamed quiz for {url} | first question: {first_question_ms}ms | total: {total_ms}ms")
+                events.put_nowait(sse_event("done", {
+                    "quiz": data, "quiz_id": quiz_id, "variant_id": saved_variant_id, "cached": False,
+                    "timings": {"first_question_ms": first_question_ms, "total_ms": total_ms}
+                }))
+            else:
+                print(f"[LLM ERROR] {data}")
+                events.put_nowait(sse_event("error", {"detail": data}))
+    except Exception as e:
+        print(f"[Error] Saving streamed quiz for {url} failed: {e}")
+        events.put_nowait(sse_event("error", {"detail": str(e)}))
     finally:
-        db.close()
+        events.put_nowait(None)
+
+@app.put("/generate_quiz/stream", description="Generate a quiz and stream each question as a Server-Sent Event", tags=["Quiz"])
+async def generate_quiz_stream(payload: QuizRequest):
+    url = str(payload.url)
+    scraped_data = await run_in_threadpool(load_scraped_content, url)
+    if scraped_data is None:
+        raise HTTPException(status_code=404, detail="Scraped data not found. Please run /generate_quiz (POST) first.")
+
+    variant = quiz_variant_key(scraped_data, payload.difficulty, payload.sections)
+    quiz_id, variant_id, cached_quiz = await run_in_threadpool(load_quiz_variant, url, variant["variant_key"])
+
+    queue = None
+    if cached_quiz is None:
+        # Generated outside the response, so the finished quiz is saved even when nobody is reading any more
+        queue = asyncio.Queue()
+        task = asyncio.create_task(_stream_and_save(url, scraped_data, payload, variant, quiz_id, queue))
+        _stream_tasks.add(task)
+        task.add_done_callback(_stream_tasks.discard)
+
+    async def events():
+        if cached_quiz is not None:     # Stored variant, replay it at once
+            for question in cached_quiz.get("quiz", []):
+                yield sse_event("question", question)
+            yield sse_event("done", {"quiz": cached_quiz, "quiz_id": quiz_id, "variant_id": variant_id, "cached": True})
+            return
+        while (event := await queue.get()) is not None:
+            yield event
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}   # Don't let proxies buffer the events
+    )
+
+
+@app.get("/history", description='Getting a page of saved quizzes, newest first.', tags=['Quiz']) # Getting stored records from DB
+def get_history(
+    request: Request,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    title_prefix: str | None = None,
+    search: str | None = None,
+    count: bool = False,
+    db: Session = Depends(get_db),
+):
+    params = {"limit": limit, "cursor": cursor, "title_prefix": title_prefix, "search": search, "count": count}
+    etag = history_etag(db, **params)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})   # Unchanged page, skip the query and the body
 
-@app.get('/quiz/{quiz_id}',description="Getting the specific quiz based on the id", tags=['Quiz']) #For displaying each quiz using its id.
-def get_quiz(quiz_id:int):
-    db=SessionLocal()
     try:
-        record = db.query(Quiz.id, Quiz.title, Quiz.full_quiz_data).filter(Quiz.id == quiz_id).first()
+        history, next_cursor, total = get_history_page(db, **params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        if not record:
-            raise HTTPException(status_code=404, detail="Quiz not found.")
-        quiz_data = json.loads(record.full_quiz_data) # Deserialize JSON string into a Python dictionary
-        return {'title':record.title,'quiz_data':quiz_data}
-    finally:
-        db.close()
+    # The body stays a plain list [{id, url, title, date_generated, variants}], paging info travels in headers
+    headers = {}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if total is not None:
+        headers["X-Total-Count"] = str(total)
+    body = CachedBody(json_bytes(jsonable_encoder(history)), etag)
+    return body.respond(request, "no-cache", headers=headers)   # no-cache: stored by the browser, revalidated with the ETag
+
+@app.get('/quiz/{quiz_id}',description="Getting the specific quiz based on the id", tags=['Quiz']) #For displaying each quiz using its id.
+def get_quiz(request: Request, quiz_id:int, variant_id: int | None = None, db: Session = Depends(get_db)):
+    # no-cache even for a given variant: its title changes on an article refresh and its variant list whenever
+    # another variant is generated, so browsers revalidate with the ETag (a 304 when nothing changed)
+    cached = quiz_cache.get((quiz_id, variant_id))
+    if cached is not None:
+        return cached.respond(request, "no-cache")
+
+    title = db.query(Quiz.title).filter(Quiz.id == quiz_id).scalar()
+    if title is None:
+        raise HTTPException(status_code=404, detail="Quiz not found.")
+
+    variants = list_quiz_variants(db, [quiz_id])[quiz_id]
+    requested = variant_id
+    if variant_id is None and variants:
+        variant_id = variants[-1]["id"]     # Latest generated variant by default
+    elif variant_id is not None and variant_id not in {v["id"] for v in variants}:
+        raise HTTPException(status_code=404, detail="Quiz variant not found.")
+
+    data = db.query(GeneratedQuiz.data).filter(GeneratedQuiz.id == variant_id).scalar() if variant_id else None
+    # The stored quiz is already JSON: decompress and splice its bytes in, no decode/re-encode
+    body = CachedBody(b"".join([
+        b'{"title":', json_bytes(title),
+        b',"quiz_data":', unpack_raw(data) if data else b"{}",
+        b',"variant_id":', json_bytes(variant_id),
+        b',"variants":', json_bytes(jsonable_encoder(variants)),
+        b"}",
+    ]))
+    quiz_cache.put((quiz_id, requested), body)
+    return body.respond(request, "no-cache")   # {title, quiz_data, variant_id, variants}
@@ -0,0 +1,185 @@
+# metrics.py
+# Prometheus text-format metrics for GET /metrics and optional OpenTelemetry spans, without a client library.
+# Latency histograms are observed where the work happens (timings.StageTimer stages, DB statements, HTTP requests);
+# counters that already live elsewhere (cache stats, LLM tokens, pool) are turned into families when /metrics is read.
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+# Seconds, from a DB statement up to a slow Gemini call
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+OTEL_TRACING = os.getenv("OTEL_TRACING", "false").lower() in ("1", "true", "yes")
+
+registry = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = (f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + ",".join(pairs) + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self.series = {}    # label values -> [bucket counts..., sum, count]
+        self.lock = threading.Lock()
+        registry.append(self)
+
+    def observe(self, value: float, *label_values):
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [0] * (len(self.buckets) + 2)
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for values, series in sorted(self.series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), values + (bound,))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), values + ('+Inf',))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, values)} {series[-2]:.6f}")
+                lines.append(f"{self.name}_count{_labels(self.labels, values)} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """Up/down value, e.g. requests in flight. Use `with gauge.track(*labels):` around the work."""
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name, self.help, self.labels = name, help, labels
+        self.values = {}
+        self.lock = threading.Lock()
+        registry.append(self)
+
+    def add(self, amount: float, *label_values):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def track(self, *label_values):
+        return _Tracked(self, label_values)
+
+    def render(self):
+        return family(self.name, "gauge", self.help, self.labels, sorted(self.values.items()))
+
+
+class _Tracked:
+    __slots__ = ("gauge", "label_values")
+
+    def __init__(self, gauge, label_values):
+        self.gauge, self.label_values = gauge, label_values
+
+    def __enter__(self):
+        self.gauge.add(1, *self.label_values)
+
+    def __exit__(self, *exc):
+        self.gauge.add(-1, *self.label_values)
+
+
+def family(name: str, kind: str, help: str, labels: tuple, samples):
+    """Lines of one counter/gauge family from [(label values, value)], for stats kept outside this module."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    lines.extend(f"{name}{_labels(labels, values)} {value}" for values, value in samples)
+    return lines
+
+
+def render(*families):
+    """Text exposition of every registered metric plus the given families."""
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    for lines_of_family in families:
+        lines.extend(lines_of_family)
+    return "\n".join(lines) + "\n"
+
+
+stage_seconds = Histogram("quiz_stage_seconds", "Latency of one pipeline stage (scrape.fetch, scrape.parse, summary.model, quiz.model, quiz.parse, ...)", ("pipeline", "stage"))
+db_seconds = Histogram("quiz_db_statement_seconds", "Latency of one DB statement", ("operation",))
+http_seconds = Histogram("quiz_http_request_seconds", "Latency of one API request", ("method", "route", "status"))
+http_in_flight = Gauge("quiz_http_requests_in_flight", "API requests being served", ("method",))
+llm_in_flight = Gauge("quiz_llm_calls_in_flight", "Gemini requests waiting for an answer", ("client",))
+jobs_running = Gauge("quiz_jobs_running", "Background jobs being worked on in this process", ("kind",))
+
+
+# Tracing. Off unless OTEL_TRACING is set and opentelemetry-api is installed, then every stage is a span
+# under the request span. Spans follow contextvars, so they cross awaits, tasks and threadpool calls.
+_tracer = None
+
+def _setup_tracing():
+    global _tracer
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        print("[WARN] OTEL_TRACING is set but opentelemetry-api is not installed, tracing disabled")
+        return
+    try:
+        # Export with the SDK when nothing (e.g. opentelemetry-instrument) has set a provider already.
+        # The batch processor exports off the request path, sampling follows OTEL_TRACES_SAMPLER(_ARG).
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        if not isinstance(trace.get_tracer_provider(), TracerProvider):
+            provider = TracerProvider()
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+            trace.set_tracer_provider(provider)
+    except ImportError:
+        pass
+    _tracer = trace.get_tracer("ai-wiki-quiz")
+    print("[INFO] OpenTelemetry tracing enabled")
+
+if OTEL_TRACING:
+    _setup_tracing()
+
+
+def span(name: str, **attributes):
+    """Context manager for an OpenTelemetry span, a no-op when tracing is off."""
+    if _tracer is None:
+        return nullcontext()
+    return _tracer.start_as_current_span(name, attributes=attributes or None)
+
+
+class MetricsMiddleware:
+    """ASGI middleware: latency per route (streamed bodies included), requests in flight and the root span of each request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        method, status = scope["method"], 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        with http_in_flight.track(method), span(f"HTTP {method}") as current:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                # Route template, not the raw path, so /quiz/{quiz_id} stays one series
+                route = getattr(scope.get("route"), "path", "unmatched")
+                http_seconds.observe(time.perf_counter() - start, method, route, status)
+                if current is not None:
+                    current.update_name(f"{method} {route}")
+                    current.set_attribute("http.route", route)
+                    current.set_attribute("http.status_code", status)
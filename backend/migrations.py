@@ -0,0 +1,185 @@
+# migrations.py
+# Small, idempotent schema upgrades for databases created by older versions.
+# Base.metadata.create_all() only creates missing tables, it never alters existing ones,
+# so every change to an existing table needs a step here. Each step checks whether it
+# is still needed, which makes running them on every startup safe.
+import json
+from datetime import datetime
+from sqlalchemy import inspect, text
+from url_normalizer import normalize_url
+from compression import pack_json, unpack_json
+from fingerprint import fingerprint, MIN_SHINGLES
+
+BATCH_SIZE = 200    # Rows copied per round trip, keeps memory flat on large tables
+
+
+def _index_names(conn, table):
+    inspector = inspect(conn)
+    names = {ix["name"] for ix in inspector.get_indexes(table)}
+    names |= {uq["name"] for uq in inspector.get_unique_constraints(table)}
+    return names
+
+
+def _column_names(conn, table):
+    return {col["name"] for col in inspect(conn).get_columns(table)}
+
+
+def unique_quiz_url(conn):
+    if "uq_quizzes_url" in _index_names(conn, "quizzes"):
+        return False
+    # Drop duplicate rows left behind by concurrent scrapes, keeping the oldest one
+    conn.execute(text(
+        "DELETE FROM quizzes WHERE id NOT IN "
+        "(SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM quizzes GROUP BY url) AS keep)"
+    ))
+    conn.execute(text("CREATE UNIQUE INDEX uq_quizzes_url ON quizzes (url)"))
+    return True
+
+
+def quiz_url_key(conn):
+    if "uq_quizzes_url_key" in _index_names(conn, "quizzes"):
+        return False
+    if "url_key" not in _column_names(conn, "quizzes"):
+        conn.execute(text("ALTER TABLE quizzes ADD COLUMN url_key VARCHAR(500) NULL"))
+    # Backfill canonical keys, the oldest row wins when several raw URLs share one key.
+    # Rows that lose keep a NULL key, they stay readable by id but no longer serve cache hits.
+    seen, updates = set(), []
+    for row in conn.execute(text("SELECT id, url FROM quizzes ORDER BY id")).all():
+        key = normalize_url(row.url)
+        updates.append({"key": None if key in seen else key, "id": row.id})
+        seen.add(key)
+    if updates:
+        conn.execute(text("UPDATE quizzes SET url_key = :key WHERE id = :id"), updates)  # executemany
+    conn.execute(text("CREATE UNIQUE INDEX uq_quizzes_url_key ON quizzes (url_key)"))
+    return True
+
+
+def split_quiz_blobs(conn):
+    if "scraped_content" not in _column_names(conn, "quizzes"):
+        return False
+    # Move the LONGTEXT columns into compressed rows of article_contents / generated_quizzes
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            text("SELECT id, date_generated, scraped_content, full_quiz_data FROM quizzes "
+                 "WHERE id > :last_id ORDER BY id LIMIT :limit"),
+            {"last_id": last_id, "limit": BATCH_SIZE},
+        ).all()
+        if not rows:
+            break
+        contents = [{"id": r.id, "data": pack_json(json.loads(r.scraped_content))} for r in rows if r.scraped_content]
+        quizzes = [
+            {"id": r.id, "date": r.date_generated, "data": pack_json(json.loads(r.full_quiz_data))}
+            for r in rows if r.full_quiz_data and r.full_quiz_data != "{}"   # "{}" was the not-generated-yet placeholder
+        ]
+        if contents:
+            conn.execute(text("INSERT INTO article_contents (quiz_id, data) VALUES (:id, :data)"), contents)
+        if quizzes:
+            conn.execute(text("INSERT INTO generated_quizzes (quiz_id, date_generated, data) VALUES (:id, :date, :data)"), quizzes)
+        last_id = rows[-1].id
+    conn.execute(text("ALTER TABLE quizzes DROP COLUMN scraped_content"))
+    conn.execute(text("ALTER TABLE quizzes DROP COLUMN full_quiz_data"))
+    return True
+
+
+def quiz_variant_columns(conn):
+    if "variant_key" in _column_names(conn, "generated_quizzes"):
+        return False
+    # Quizzes stored before this step keep NULL keys, they stay visible but never count as cache hits
+    for column in ("variant_key VARCHAR(64)", "content_hash VARCHAR(64)", "difficulty VARCHAR(20)",
+                   "sections JSON", "prompt_version VARCHAR(20)"):
+        conn.execute(text(f"ALTER TABLE generated_quizzes ADD COLUMN {column} NULL"))
+    conn.execute(text("CREATE UNIQUE INDEX uq_generated_quizzes_variant ON generated_quizzes (quiz_id, variant_key)"))
+    return True
+
+
+def history_indexes(conn):
+    indexes = _index_names(conn, "quizzes")
+    if "ix_quizzes_date_generated_id" in indexes:
+        return False
+    # Keyset pagination needs a value on every row
+    conn.execute(text("UPDATE quizzes SET date_generated = :epoch WHERE date_generated IS NULL"), {"epoch": datetime(1970, 1, 1)})
+    conn.execute(text("CREATE INDEX ix_quizzes_date_generated_id ON quizzes (date_generated, id)"))
+    if "ix_quizzes_title" not in indexes:
+        conn.execute(text("CREATE INDEX ix_quizzes_title ON quizzes (title)"))
+    return True
+
+
+def article_validators(conn):
+    if "etag" in _column_names(conn, "quizzes"):
+        return False
+    for column in ("revision_id BIGINT", "etag VARCHAR(255)", "last_modified VARCHAR(64)", "checked_at DATETIME"):
+        conn.execute(text(f"ALTER TABLE quizzes ADD COLUMN {column} NULL"))
+    return True
+
+
+def article_fingerprints(conn):
+    # Near-duplicate index for articles stored before fingerprints existed (or by an older process meanwhile).
+    # Only rows without a fingerprint are read, so after the first run this is one empty anti-join.
+    applied, last_id = False, 0
+    while True:
+        rows = conn.execute(
+            text("SELECT c.quiz_id, c.data FROM article_contents c "
+                 "LEFT JOIN article_fingerprints f ON f.quiz_id = c.quiz_id "
+                 "WHERE f.quiz_id IS NULL AND c.quiz_id > :last_id ORDER BY c.quiz_id LIMIT :limit"),
+            {"last_id": last_id, "limit": BATCH_SIZE},
+        ).all()
+        if not rows:
+            return applied
+        fingerprints = [(r.quiz_id, fingerprint(unpack_json(r.data))) for r in rows]
+        conn.execute(
+            text("INSERT INTO article_fingerprints (quiz_id, text_hash, shingles, simhash, minhash) "
+                 "VALUES (:quiz_id, :text_hash, :shingles, :simhash, :minhash)"),
+            [{"quiz_id": quiz_id, "text_hash": fp["text_hash"], "shingles": fp["shingles"], "simhash": fp["simhash"],
+              "minhash": fp["minhash"].tobytes()} for quiz_id, fp in fingerprints],
+        )
+        bands = [{"band_key": key, "quiz_id": quiz_id} for quiz_id, fp in fingerprints
+                 if fp["shingles"] >= MIN_SHINGLES for key in set(fp["bands"])]
+        if bands:
+            conn.execute(text("INSERT INTO article_fingerprint_bands (band_key, quiz_id) VALUES (:band_key, :quiz_id)"), bands)
+        applied, last_id = True, rows[-1].quiz_id
+
+
+def quiz_section_hashes(conn):
+    if "section_hashes" in _column_names(conn, "generated_quizzes"):
+        return False
+    # Quizzes stored before keep NULL, an article refresh regenerates them in full instead of incrementally
+    conn.execute(text("ALTER TABLE generated_quizzes ADD COLUMN section_hashes JSON NULL"))
+    return True
+
+
+def quiz_updated_at(conn):
+    if "updated_at" in _column_names(conn, "quizzes"):
+        return False
+    conn.execute(text("ALTER TABLE quizzes ADD COLUMN updated_at DATETIME NULL"))
+    conn.execute(text("CREATE INDEX ix_quizzes_updated_at ON quizzes (updated_at)"))
+    return True
+
+
+def job_not_before(conn):
+    if "not_before" in _column_names(conn, "jobs"):
+        return False
+    conn.execute(text("ALTER TABLE jobs ADD COLUMN not_before DATETIME NULL"))
+    return True
+
+
+# Ordered list of upgrade steps
+MIGRATIONS = [
+    unique_quiz_url,
+    quiz_url_key,
+    split_quiz_blobs,
+    quiz_variant_columns,
+    history_indexes,
+    article_validators,
+    article_fingerprints,
+    quiz_section_hashes,
+    quiz_updated_at,
+    job_not_before,
+]
+
+
+def run_migrations(engine):
+    with engine.begin() as conn:
+        for step in MIGRATIONS:
+            if step(conn):
+                print(f"[MIGRATION] Applied {step.__name__}")
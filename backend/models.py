@@ -27,3 +27,18 @@ class QuizOutput(BaseModel):
     sections: List[str] = Field(..., description="Main section titles")
     quiz: List[Question] = Field(..., description="List of quiz questions") # Contains all ques and ans
     related_topics: Optional[List[str]] = []
+
+# One quiz of a batch, see QuizBatchOutput
+class QuizVariantOutput(BaseModel):
+    difficulty: str = Field(..., description="Difficulty of this variant, as listed in VARIANTS")
+    scope: str = Field(..., description="Sections of this variant, copied from VARIANTS")
+    quiz: List[Question] = Field(..., description="List of quiz questions of this variant")
+
+# Several quizzes of one article from a single prompt, the article-level fields are written once
+class QuizBatchOutput(BaseModel):
+    title: str = Field(..., description="Article title")
+    summary: str = Field(..., description="Article summary")
+    key_entities: Optional[KeyEntities] = None
+    sections: List[str] = Field(..., description="Main section titles")
+    related_topics: Optional[List[str]] = []
+    variants: List[QuizVariantOutput] = Field(..., description="One entry per line of VARIANTS, same order")
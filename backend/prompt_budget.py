@@ -0,0 +1,125 @@
+# prompt_budget.py
+# Fits article text into a token budget before it goes into a prompt:
+#   1. boilerplate sentences (hatnotes, "Main article: ...", citation leftovers) are dropped
+#   2. sentences repeated across the article are kept once
+#   3. if still over budget, each section gets an equal floor plus a share in proportion to its size
+#      (sections smaller than their share keep everything, the rest is redistributed) and is
+#      cut at a sentence boundary
+import os
+import re
+from tokens import estimate_tokens
+
+# Quiz SOURCE_TEXT budget per difficulty, harder quizzes get more detail to draw from
+QUIZ_TOKEN_BUDGETS = {
+    "easy": int(os.getenv("QUIZ_TOKEN_BUDGET_EASY", "6000")),
+    "medium": int(os.getenv("QUIZ_TOKEN_BUDGET_MEDIUM", "8000")),
+    "hard": int(os.getenv("QUIZ_TOKEN_BUDGET_HARD", "10000")),
+}
+QUIZ_TOKEN_BUDGET = int(os.getenv("QUIZ_TOKEN_BUDGET", "8000"))     # Any other difficulty
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "3000"))
+
+FLOOR_SHARE = 0.25
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"'“(\[]?[A-Z0-9])")
+_BOILERPLATE = re.compile(
+    r"^(main articles?|see also|further information|for other uses|this article is about|"
+    r"not to be confused with|for the .{1,80}?, see|coordinates)\b"
+    r"|\bcitation needed\b|\bretrieved \d{1,2} \w+ \d{4}\b|^\W*$",
+    re.IGNORECASE,
+)
+_NORMALIZE = re.compile(r"[\W_]+")
+
+
+def quiz_token_budget(difficulty: str):
+    return QUIZ_TOKEN_BUDGETS.get((difficulty or "").strip().lower(), QUIZ_TOKEN_BUDGET)
+
+
+def split_sentences(text: str):
+    return [s.strip() for s in _SENTENCE_END.split(text) if s.strip()]
+
+
+def _water_fill(sizes: list[int], budget: float):
+    """Max-min fair split of budget proportional to sizes, no section gets more than it has."""
+    allocation = [0.0] * len(sizes)
+    remaining = {i for i, size in enumerate(sizes) if size}
+    left = budget
+    while remaining and left > 0:
+        total = sum(sizes[i] for i in remaining)
+        share = {i: left * sizes[i] / total for i in remaining}
+        fits = {i for i in remaining if sizes[i] <= share[i]}
+        if not fits:
+            for i in remaining:
+                allocation[i] = share[i]
+            break
+        for i in fits:
+            allocation[i] = sizes[i]
+            left -= sizes[i]
+        remaining -= fits
+    return allocation
+
+
+def _allocate(sizes: list[int], budget: int):
+    """
+    Token allocation per section. A quarter of the budget is an equal floor, so a short lead
+    section is not starved by one huge section, the rest is split in proportion to size.
+    """
+    floor = budget * FLOOR_SHARE / max(1, sum(1 for size in sizes if size))
+    base = [min(size, floor) for size in sizes]
+    extra = _water_fill([size - b for size, b in zip(sizes, base)], budget - sum(base))
+    return [int(b + e) for b, e in zip(base, extra)]
+
+
+def compact_sections(sections: list[dict], budget: int, headings: bool = False):
+    """
+    Text of the given sections (with subsections) in at most ~budget tokens, one line per section like
+    llm_quiz_generator.build_article_text, prefixed with "[Heading] " when headings=True.
+    Returns (text, stats) with the token counts for logging.
+    """
+    seen = set()
+    stats = {"tokens_in": 0, "tokens_out": 0, "boilerplate": 0, "duplicates": 0, "truncated_sections": 0, "budget": budget}
+    kept = []   # Per section: [(sentence, tokens)]
+    for s in sections:
+        text = (s.get("content", "")) + " " + " ".join(sub.get("content", "") for sub in s.get("subsections", []))
+        sentences = []
+        for sentence in split_sentences(text):
+            tokens = estimate_tokens(sentence)
+            stats["tokens_in"] += tokens
+            if _BOILERPLATE.search(sentence):
+                stats["boilerplate"] += tokens
+                continue
+            key = _NORMALIZE.sub(" ", sentence.lower()).strip()
+            if key in seen:
+                stats["duplicates"] += tokens
+                continue
+            seen.add(key)
+            sentences.append((sentence, tokens))
+        kept.append(sentences)
+
+    sizes = [sum(tokens for _, tokens in sentences) for sentences in kept]
+    if sum(sizes) > budget:
+        allocation = _allocate(sizes, budget)
+        for n, sentences in enumerate(kept):
+            used, cut = 0, []
+            for sentence, tokens in sentences:
+                if used + tokens > allocation[n]:
+                    break
+                cut.append((sentence, tokens))
+                used += tokens
+            if len(cut) < len(sentences):
+                stats["truncated_sections"] += 1
+            kept[n] = cut
+
+    lines = []
+    for s, sentences in zip(sections, kept):
+        if sentences:
+            text = " ".join(sentence for sentence, _ in sentences)
+            lines.append(f"[{s['heading']}] {text}" if headings else text)
+    stats["tokens_out"] = sum(tokens for sentences in kept for _, tokens in sentences)
+    return "\n".join(lines), stats
+
+
+def describe(stats: dict):
+    """One log line fragment for compact_sections stats."""
+    return (f"article {stats['tokens_in']} -> {stats['tokens_out']} tokens (budget {stats['budget']}, "
+            f"-{stats['boilerplate']} boilerplate, -{stats['duplicates']} duplicates, "
+            f"{stats['truncated_sections']} sections truncated)")
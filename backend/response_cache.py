@@ -0,0 +1,175 @@
+# response_cache.py
+# Ready-to-send bodies of the read endpoints: an in-memory LRU of hot /quiz responses (bounded by bytes),
+# brotli/gzip encoding and strong ETags with 304 handling.
+# Stored quizzes are already JSON, so /quiz splices the decompressed bytes into its body instead of
+# decoding and re-encoding them; a cached entry also keeps every encoding it has been sent in.
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from fastapi import Response
+
+try:
+    import brotli
+except ImportError:  # Optional dependency, gzip only without it
+    brotli = None
+
+QUIZ_CACHE_MAX_BYTES = int(os.getenv("QUIZ_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))   # 0 disables the LRU
+# Invalidation only reaches this process, the TTL bounds how stale another worker's "latest variant" can get
+QUIZ_CACHE_TTL_SECONDS = int(os.getenv("QUIZ_CACHE_TTL_SECONDS", "60"))
+
+MIN_COMPRESS_BYTES = 1024   # Smaller bodies are sent as they are
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def _compress(body: bytes, encoding: str):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, GZIP_LEVEL, mtime=0)    # mtime=0 keeps the bytes (and so the ETag) stable
+
+
+def accepted_encoding(accept_encoding: str | None, size: int):
+    """br or gzip when the client accepts it (q > 0) and the body is worth compressing, None for identity."""
+    if not accept_encoding or size < MIN_COMPRESS_BYTES:
+        return None
+    accepted = set()
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def json_bytes(value):
+    """Compact UTF-8 JSON, like FastAPI's JSONResponse renders it."""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def body_etag(body: bytes):
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str):
+    # Encoded responses carry "<etag>-br"/"<etag>-gzip", any of them validates the same content
+    if not if_none_match:
+        return False
+    base = etag.strip('"')
+    return any(tag.strip().removeprefix("W/").strip('"').split("-")[0] == base for tag in if_none_match.split(","))
+
+
+class CachedBody:
+    """One response body, its ETag and the encodings it has been compressed to so far."""
+    __slots__ = ("body", "etag", "encoded", "created", "on_grow")
+
+    def __init__(self, body: bytes, etag: str | None = None):
+        self.body = body
+        self.etag = etag or body_etag(body)
+        self.encoded = {}
+        self.created = time.monotonic()
+        self.on_grow = None     # Set by the cache holding it, to account for encodings added later
+
+    def size(self):
+        return len(self.body) + sum(len(b) for b in self.encoded.values())
+
+    def respond(self, request, cache_control: str, media_type: str = "application/json", headers: dict | None = None):
+        """304 when If-None-Match matches, otherwise the body in the best encoding the client accepts."""
+        headers = {**(headers or {}), "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        encoding = accepted_encoding(request.headers.get("accept-encoding"), len(self.body))
+        headers["ETag"] = self.etag if encoding is None else f'{self.etag[:-1]}-{encoding}"'
+        if etag_matches(request.headers.get("if-none-match"), self.etag):
+            return Response(status_code=304, headers=headers)
+        if encoding is None:
+            return Response(self.body, media_type=media_type, headers=headers)
+        content = self.encoded.get(encoding)
+        if content is None:
+            content = self.encoded[encoding] = _compress(self.body, encoding)
+            if self.on_grow is not None:
+                self.on_grow(self, len(content))
+        return Response(content, media_type=media_type, headers={**headers, "Content-Encoding": encoding})
+
+
+class QuizResponseCache:
+    def __init__(self, max_bytes: int, ttl: int):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()    # (quiz_id, variant_id or None for latest) -> [CachedBody, accounted bytes]
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.lock = threading.Lock()    # Used from worker threads
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is not None and time.monotonic() - item[0].created > self.ttl:
+                self._drop(key)
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)   # Most recently used
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, entry: CachedBody):
+        if entry.size() > self.max_bytes:
+            return  # Also covers max_bytes=0 (disabled)
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            self.entries[key] = [entry, entry.size()]
+            self.resident_bytes += entry.size()
+            entry.on_grow = lambda e, added: self._grew(key, e, added)
+            self._evict()
+
+    def _grew(self, key, entry: CachedBody, added: int):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is not None and item[0] is entry:
+                item[1] += added
+                self.resident_bytes += added
+                self._evict()
+
+    def invalidate(self, quiz_id: int):
+        """Drop every cached response of an article, called whenever a variant is stored or the article changes."""
+        with self.lock:
+            for key in [k for k in self.entries if k[0] == quiz_id]:
+                self._drop(key)
+                self.invalidations += 1
+
+    def _drop(self, key):
+        self.resident_bytes -= self.entries.pop(key)[1]
+
+    def _evict(self):
+        while self.resident_bytes > self.max_bytes and self.entries:
+            _, (_, evicted_size) = self.entries.popitem(last=False)    # Least recently used
+            self.resident_bytes -= evicted_size
+            self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self.entries),
+                "resident_bytes": self.resident_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+quiz_cache = QuizResponseCache(QUIZ_CACHE_MAX_BYTES, QUIZ_CACHE_TTL_SECONDS)
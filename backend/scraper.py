@@ -1,6 +1,13 @@
 # scraper.py
-import requests
+import asyncio
+import os
+import re
+from urllib.parse import urlsplit, quote
+import httpx
 from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
+from url_normalizer import normalize_url
+from timings import StageTimer
 
 headers = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -18,10 +25,197 @@ def remove_tables(content_tag):
         table.decompose()
     return content_tag
 
-def scrape_wikipedia(url):
-    res = requests.get(url, headers=headers, timeout=10)    # Getting wikipedia raw data
+# Fetch backend: "rest" uses the MediaWiki REST API (Parsoid HTML, no skin, ETag/revision aware),
+# "html" downloads the full article page like before
+FETCH_BACKEND = os.getenv("WIKI_FETCH_BACKEND", "rest")
+# Overrides scheme://host of the REST API, e.g. a local stub server in tests
+REST_BASE_URL = os.getenv("WIKI_REST_BASE_URL")
+
+# Wikimedia asks API clients to identify themselves
+api_headers = {
+    "User-Agent": "AIQuizGenerator/1.0 (https://github.com/Adarsh20082006/ai-quiz-generator)",
+    "Accept": "text/html; charset=utf-8",
+}
+
+_client = None
+_client_loop = None
+
+def get_client():
+    """Shared keep-alive HTTP client, one per event loop."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            timeout=10,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=60),
+        )
+        _client_loop = loop
+    return _client
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def rest_html_url(url):
+    """
+    /wiki/<Title> article URL (index.php?title= links are normalized to one) -> REST endpoint with the
+    Parsoid HTML of its latest revision. None when the URL names no title (?curid=, special pages).
+    """
+    parts = urlsplit(normalize_url(url))
+    if not parts.path.startswith("/wiki/") or len(parts.path) == len("/wiki/"):
+        return None
+    title = parts.path[len("/wiki/"):]
+    base = REST_BASE_URL or f"{parts.scheme}://{parts.netloc}"
+    return f"{base}/api/rest_v1/page/html/{quote(title, safe='')}", title.replace("_", " ")
+
+def revision_from_etag(etag):
+    # REST ETags look like W/"1234567890/8a7f3c00-..." , the part before the slash is the revision id
+    if not etag:
+        return None
+    value = etag.removeprefix("W/").strip('"').split("/")[0]
+    return int(value) if value.isdigit() else None
+
+
+async def fetch_raw(url, etag=None, last_modified=None):
+    """
+    Download step of fetch_article, without parsing.
+    Returns {"not_modified", "html", "parser", "title", "revision_id", "etag", "last_modified"}, html is None on a 304.
+    """
+    rest = rest_html_url(url) if FETCH_BACKEND == "rest" else None
+    if rest is None:    # html backend, or a URL without a title the REST API could be asked about
+        res = await get_client().get(url, headers=headers)    # Getting wikipedia raw data without blocking the event loop
+        res.raise_for_status()
+        return {"not_modified": False, "html": res.text, "parser": "html", "title": None,
+                "revision_id": None, "etag": None, "last_modified": None}
+
+    request_url, fallback_title = rest
+    conditional = {}
+    if etag:
+        conditional["If-None-Match"] = etag
+    if last_modified:
+        conditional["If-Modified-Since"] = last_modified
+    res = await get_client().get(request_url, headers={**api_headers, **conditional})
+
+    if res.status_code == 304:
+        return {"not_modified": True, "html": None, "parser": "parsoid", "title": fallback_title,
+                "revision_id": revision_from_etag(etag), "etag": etag, "last_modified": last_modified}
     res.raise_for_status()
-    soup = BeautifulSoup(res.text, "lxml") # Scraping using BeautifulSoup
+
+    new_etag = res.headers.get("etag")
+    return {
+        "not_modified": False,
+        "html": res.text,
+        "parser": "parsoid",
+        "title": fallback_title,
+        "revision_id": revision_from_etag(new_etag),
+        "etag": new_etag,
+        "last_modified": res.headers.get("last-modified"),
+    }
+
+def parse_fetched(raw):
+    """Parse the html of a fetch_raw result, a plain top-level function so it can run in a process pool."""
+    if raw["parser"] == "html":
+        return parse_wikipedia(raw["html"])
+    return parse_parsoid(raw["html"], raw["title"])
+
+async def fetch_article(url, etag=None, last_modified=None):
+    """
+    Fetch and parse an article. With validators from an earlier fetch the request is conditional,
+    an unchanged page comes back as {"not_modified": True} without a download or re-parse.
+    Returns {"not_modified", "data", "revision_id", "etag", "last_modified"}.
+    """
+    timer = StageTimer("scrape")
+    with timer.stage("fetch"):
+        raw = await fetch_raw(url, etag, last_modified)
+    data = None
+    if not raw["not_modified"]:
+        # Parsing is CPU bound, so run it in a worker thread
+        with timer.stage("parse"):
+            data = await asyncio.to_thread(parse_fetched, raw)
+    print(f"[TIMING] scrape {url}: {timer.summary()}")
+    return {
+        "not_modified": raw["not_modified"],
+        "data": data,
+        "revision_id": raw["revision_id"],
+        "etag": raw["etag"],
+        "last_modified": raw["last_modified"],
+    }
+
+async def scrape_wikipedia(url):
+    return (await fetch_article(url))["data"]
+
+# sections to exclude to avoid overhead to the AI model
+EXCLUDED_SECTIONS = {
+    "see also",
+    "notes",
+    "references",
+    "external links",
+    "further reading",
+    "citations",
+    "bibliography",
+    "footnotes",
+    "sources",
+    "contents",     # Table of contents box of the legacy skin, inside the content div
+}
+
+# "[edit]" link of legacy headings. get_text(" ") puts spaces between its bracket spans: "History [ edit ]"
+_edit_link = re.compile(r"\[\s*edit\s*\]", re.IGNORECASE)
+
+# Text under these tags never shows up in BeautifulSoup's get_text() (comments are skipped too)
+_HIDDEN_TEXT = "ancestor::style or ancestor::script or ancestor::template or ancestor::rt or ancestor::rp"
+_find_title = etree.XPath('//h1[@id="firstHeading"]')
+_find_content = etree.XPath('//div[@id="mw-content-text"]')
+# h2/h3/p/ul blocks in document order, skipping everything inside <sup> and <table>
+_find_blocks = etree.XPath(".//*[self::h2 or self::h3 or self::p or self::ul][not(ancestor::sup) and not(ancestor::table)]")
+_block_strings = etree.XPath(f".//text()[not(ancestor::sup or ancestor::table or {_HIDDEN_TEXT})]")
+_title_strings = etree.XPath(f".//text()[not({_HIDDEN_TEXT})]")
+
+
+def _join_strings(strings, separator):
+    # Same as BeautifulSoup's get_text(separator, strip=True)
+    return separator.join(t for t in (s.strip() for s in strings) if t)
+
+
+def parse_wikipedia(html):
+    """
+    Fast path: one lxml parse and compiled XPath queries instead of a BeautifulSoup tree.
+    Produces exactly the same {title, sections} as parse_wikipedia_bs4.
+    """
+    root = lxml_html.document_fromstring(html)
+
+    title_tags = _find_title(root)  # Finding heading in scraped data
+    title = _join_strings(_title_strings(title_tags[0]), "") if title_tags else "Untitled"
+
+    content_divs = _find_content(root)    # Finding contents in scraped data
+    if not content_divs:
+        raise ValueError("Main content not found")
+
+    return {"title": title, "sections": _extract_sections(content_divs[0])}
+
+
+def parse_parsoid(html, fallback_title="Untitled"):
+    """REST API (Parsoid) HTML: the body is the article content, the <title> is the page title."""
+    root = lxml_html.document_fromstring(html)
+    title_tags = root.xpath("//head/title")
+    title = _join_strings(_title_strings(title_tags[0]), "").replace("_", " ") if title_tags else ""
+    body = root.find("body")
+    if body is None:
+        raise ValueError("Main content not found")
+    return {"title": title or fallback_title, "sections": _extract_sections(body)}
+
+
+def _extract_sections(content):
+    blocks = ((el.tag, _join_strings(_block_strings(el), " ")) for el in _find_blocks(content))
+    return build_sections(blocks)
+
+
+def parse_wikipedia_bs4(html):
+    """Reference BeautifulSoup implementation, kept for parity checks (benchmarks/parser_parity.py)."""
+    soup = BeautifulSoup(html, "lxml") # Scraping using BeautifulSoup
 
     title_tag = soup.find("h1", id="firstHeading")  # Finding heading in scraped data
     title = title_tag.get_text(strip=True) if title_tag else "Untitled"
@@ -32,28 +226,22 @@ def scrape_wikipedia(url):
 
     content_div = remove_reference_links(content_div)
     content_div = remove_tables(content_div)
-    # sections to exclude to avoid overhead to the AI model
-    EXCLUDED_SECTIONS = {
-        "see also",
-        "notes",
-        "references",
-        "external links",
-        "further reading",
-        "citations",
-        "bibliography",
-        "footnotes",
-        "sources"
-    }
 
+    blocks = ((el.name, el.get_text(" ", strip=True)) for el in content_div.find_all(["h2", "h3", "p", "ul"], recursive=True))
+    return {"title": title, "sections": build_sections(blocks)}
+
+
+def build_sections(blocks):
+    """Group (tag, text) blocks into sections and subsections. Content pieces are joined once at the end."""
     sections = []
     current_section = None
     current_subsection = None
 
-    for element in content_div.find_all(["h2", "h3", "p", "ul"], recursive=True):
+    for tag, text in blocks:
         # Handle new main section (h2)
-        if element.name == "h2":
+        if tag == "h2":
             # Get the raw section title (without [edit])
-            heading_text = element.get_text(" ", strip=True).replace("[edit]", "").strip().lower()
+            heading_text = _edit_link.sub("", text).strip().lower()
 
             # If the previous section exists, append it before starting a new one
             if current_section and current_section["heading"].lower() not in EXCLUDED_SECTIONS:
@@ -64,31 +252,34 @@ def scrape_wikipedia(url):
 
             # Start a new section only if NOT excluded
             if heading_text not in EXCLUDED_SECTIONS:
-                current_section = {"heading": heading_text.title(), "content": "", "subsections": []}
+                current_section = {"heading": heading_text.title(), "content": [], "subsections": []}
             else:
                 current_section = None  # skip excluded section entirely
 
         # Handle subsections (h3)
-        elif element.name == "h3" and current_section:
-            subheading_text = element.get_text(" ", strip=True).replace("[edit]", "").strip().lower()
+        elif tag == "h3" and current_section:
+            subheading_text = _edit_link.sub("", text).strip().lower()
             if subheading_text not in EXCLUDED_SECTIONS:
                 if current_subsection:
                     current_section["subsections"].append(current_subsection)
-                current_subsection = {"subheading": subheading_text.title(), "content": ""}
+                current_subsection = {"subheading": subheading_text.title(), "content": []}
 
         # Handle paragraph or list content
-        elif element.name in ["p", "ul"]:
-            text = element.get_text(" ", strip=True)
+        elif tag in ["p", "ul"]:
             if current_subsection:
-                current_subsection["content"] += " " + text
+                current_subsection["content"].append(text)
             elif current_section:
-                current_section["content"] += " " + text
+                current_section["content"].append(text)
 
     # Append last section at end
     if current_section and current_section["heading"].lower() not in EXCLUDED_SECTIONS:
         if current_subsection:
             current_section["subsections"].append(current_subsection)
         sections.append(current_section)
-    return {"title": title, "sections": sections}
-
 
+    # Collected pieces -> " piece1 piece2 ...", same strings the old += concatenation produced
+    for section in sections:
+        section["content"] = "".join(" " + t for t in section["content"])
+        for subsection in section["subsections"]:
+            subsection["content"] = "".join(" " + t for t in subsection["content"])
+    return sections
@@ -1,57 +1,502 @@
 # scraper_service.py
+import asyncio
+import hashlib
 import json
+import os
+import time
+import httpx
+from lxml import etree
 from fastapi import HTTPException
-from database import SessionLocal, Quiz
-from scraper import scrape_wikipedia
-from llm_quiz_generator import generate_quiz
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import or_, and_, func
+from sqlalchemy.exc import IntegrityError
+from database import SessionLocal, Quiz, ArticleContent, GeneratedQuiz, ArticleFingerprint, ArticleFingerprintBand, ArticleAlias
+from compression import pack_json, unpack_json
+from scraper import fetch_article
+from llm_quiz_generator import generate_quiz, quiz_prompt_version
 from llm_summary_extractor import generate_summary_points
-from datetime import datetime
+from url_normalizer import normalize_url
+from prompt_budget import compact_sections, describe, SUMMARY_TOKEN_BUDGET
+from metrics import span
+from response_cache import quiz_cache
+from fingerprint import fingerprint, near_duplicate_score, ARTICLE_DEDUPE_THRESHOLD, MIN_SHINGLES
+from incremental import section_hashes, refresh_summary, refresh_stats
+from datetime import datetime, timedelta
 
+# Canonical URL -> running scrape task, so concurrent requests for one article share a single scrape + summary call
+_inflight: dict[str, asyncio.Task] = {}
 
-def get_or_create_scraped_data(url: str):
+# Cached articles older than this are revalidated with a conditional request (0 = never)
+ARTICLE_REVALIDATE_SECONDS = int(os.getenv("ARTICLE_REVALIDATE_SECONDS", "86400"))
+# After a failed revalidation (timeout, 404/5xx, unparsable page) the stored article is served as is and
+# the URL is not retried for this long, so an outage doesn't cost every cache hit a timeout
+ARTICLE_REVALIDATE_RETRY_SECONDS = int(os.getenv("ARTICLE_REVALIDATE_RETRY_SECONDS", "300"))
+_revalidate_retry_at: dict[str, float] = {}     # Canonical URL -> monotonic time of the next attempt
+
+# Scrape cache counters for the request traffic, reported by /cache_stats
+# "deduplicated" counts misses whose content was already stored under another URL (no summary call)
+# "revalidate_errors" counts stale hits served from the DB because the conditional re-fetch failed
+cache_stats = {"hits": 0, "misses": 0, "coalesced": 0, "revalidated": 0, "refreshed": 0, "deduplicated": 0, "revalidate_errors": 0}
+# Stored quiz variant lookups, a hit skips the quiz LLM call
+variant_cache_stats = {"hits": 0, "misses": 0}
+
+def get_cache_stats():
+    lookups = cache_stats["hits"] + cache_stats["misses"]
+    return {**cache_stats, "hit_rate": round(cache_stats["hits"] / lookups, 4) if lookups else 0.0, "incremental_refresh": refresh_stats}
+
+# Blocking DB helpers, always called through run_in_threadpool so the event loop stays free
+def _find_article(db, url: str, query):
+    """
+    First row of `query` for the article of a URL: through the unique url_key index, or for a URL that was
+    found to duplicate a stored article (see find_duplicate_article), through that article's id.
+    """
+    key = normalize_url(url)
+    row = query.filter(Quiz.url_key == key).first()
+    if row is None:
+        alias_of = db.query(ArticleAlias.quiz_id).filter(ArticleAlias.url_key == key).scalar()
+        if alias_of is not None:
+            row = query.filter(Quiz.id == alias_of).first()
+    return row
+
+def load_scraped_content(url: str):
     db = SessionLocal()
     try:
-        existing = db.query(Quiz).filter(Quiz.url == url).first() # Checking the data in DB(Cache)
-        if existing:
-            print("Cache hit – returning stored data")
-            scraped_data = json.loads(existing.scraped_content)
-            # Return with summary points if available
-            return {**scraped_data, "summary_points": scraped_data.get("summary_points", [])} # Returning {All scraped data, summary_points}
-
-        # Scrape new article
-        scraped_data = scrape_wikipedia(url)
-        formatted_content = json.dumps(scraped_data, ensure_ascii=False)
+        # Checking the data in DB(Cache), reading only the article blob
+        existing = _find_article(db, url, db.query(ArticleContent.data).join(Quiz, Quiz.id == ArticleContent.quiz_id))
+        return unpack_json(existing.data) if existing else None
+    finally:
+        db.close()
 
-        # Generate summary points for user revision
-        summary_points = generate_summary_points(scraped_data["title"], " ".join(
-            [s["content"] for s in scraped_data["sections"][:5]]
+def load_cached_article(url: str):
+    """Stored article plus the validators needed to revalidate it, or None."""
+    db = SessionLocal()
+    try:
+        existing = _find_article(db, url, (
+            db.query(ArticleContent.data, Quiz.url, Quiz.etag, Quiz.last_modified, Quiz.checked_at)
+            .join(Quiz, Quiz.id == ArticleContent.quiz_id)
         ))
+        if not existing:
+            return None
+        return {
+            "data": unpack_json(existing.data),
+            "url": existing.url,    # The article's own URL, differs from the requested one for a duplicate
+            "etag": existing.etag,
+            "last_modified": existing.last_modified,
+            "checked_at": existing.checked_at,
+        }
+    finally:
+        db.close()
 
-        # Add to scraped data
-        scraped_data["summary_points"] = summary_points
+def _validator_columns(fetched: dict | None):
+    fetched = fetched or {}
+    return {
+        "revision_id": fetched.get("revision_id"),
+        "etag": fetched.get("etag"),
+        "last_modified": fetched.get("last_modified"),
+        "checked_at": datetime.utcnow(),
+    }
 
-        # Save in DB
+def _fingerprint_rows(fp: dict):
+    """Relationship values of Quiz for a fingerprint() result, the article's near-duplicate index entries."""
+    return {
+        "fingerprint": ArticleFingerprint(
+            text_hash=fp["text_hash"], shingles=fp["shingles"], simhash=fp["simhash"], minhash=fp["minhash"].tobytes()
+        ),
+        # Too short for a reliable estimate, such articles are only matched exactly
+        "fingerprint_bands": [ArticleFingerprintBand(band_key=key) for key in set(fp["bands"])] if fp["shingles"] >= MIN_SHINGLES else [],
+    }
+
+def save_scraped_content(url: str, scraped_data: dict, fetched: dict | None = None, fp: dict | None = None):
+    scraped_data["section_hashes"] = section_hashes(scraped_data)   # What changed on the next refresh, see incremental.py
+    db = SessionLocal()
+    try:
         new_entry = Quiz(
             url=url,
+            url_key=normalize_url(url),
             title=scraped_data["title"],
-            scraped_content=json.dumps(scraped_data, ensure_ascii=False),
-            full_quiz_data=json.dumps({}, ensure_ascii=False)
+            content=ArticleContent(data=pack_json(scraped_data)),
+            **_fingerprint_rows(fp or fingerprint(scraped_data)),
+            **_validator_columns(fetched)
         )
         db.add(new_entry)   # Adding and updating the DB
         db.commit()
-        db.refresh(new_entry)
-
-        print("New data scraped and stored!")
         return scraped_data
+    except IntegrityError:
+        # Another worker stored this URL first, keep its row and return that content
+        db.rollback()
+        existing = (
+            db.query(ArticleContent.data)
+            .join(Quiz, Quiz.id == ArticleContent.quiz_id)
+            .filter(or_(Quiz.url_key == normalize_url(url), Quiz.url == url))
+            .first()
+        )
+        return unpack_json(existing.data)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
 
-    except Exception as e:
+def existing_url_keys(url_keys):
+    """Subset of the canonical URLs that are already stored (or known duplicates of a stored article)."""
+    db = SessionLocal()
+    try:
+        url_keys = list(url_keys)
+        stored = {r.url_key for r in db.query(Quiz.url_key).filter(Quiz.url_key.in_(url_keys)).all()}
+        return stored | {r.url_key for r in db.query(ArticleAlias.url_key).filter(ArticleAlias.url_key.in_(url_keys)).all()}
+    finally:
+        db.close()
+
+def bulk_save_scraped_content(entries):
+    """
+    Insert many (url, scraped_data, fetched) articles in one transaction.
+    If any of them was stored meanwhile, falls back to row-by-row inserts for this batch.
+    """
+    for _, scraped_data, _ in entries:
+        scraped_data["section_hashes"] = section_hashes(scraped_data)
+    db = SessionLocal()
+    try:
+        db.add_all([
+            Quiz(
+                url=url,
+                url_key=normalize_url(url),
+                title=scraped_data["title"],
+                content=ArticleContent(data=pack_json(scraped_data)),
+                **_fingerprint_rows(fingerprint(scraped_data)),
+                **_validator_columns(fetched)
+            )
+            for url, scraped_data, fetched in entries
+        ])
+        db.commit()
+    except IntegrityError:
         db.rollback()
-        raise HTTPException(status_code=500, detail=f"Error saving scraped data: {str(e)}")
+        for url, scraped_data, fetched in entries:
+            save_scraped_content(url, scraped_data, fetched)
+    except Exception:
+        db.rollback()
+        raise
     finally:
         db.close()
 
+def update_scraped_content(url: str, scraped_data: dict | None, fetched: dict | None):
+    """Store revalidation results. scraped_data=None only refreshes the validators and checked_at."""
+    if scraped_data is not None:
+        scraped_data["section_hashes"] = section_hashes(scraped_data)
+    db = SessionLocal()
+    try:
+        entry = _find_article(db, url, db.query(Quiz))
+        if entry is None:
+            return
+        for column, value in _validator_columns(fetched).items():
+            if value is not None or column == "checked_at":
+                setattr(entry, column, value)
+        if scraped_data is not None:
+            entry.title = scraped_data["title"]
+            entry.updated_at = datetime.utcnow()     # Part of the /history ETag
+            db.query(ArticleContent).filter(ArticleContent.quiz_id == entry.id).update(
+                {"data": pack_json(scraped_data)}, synchronize_session=False
+            )
+            # New text, new fingerprint. The delete-orphan cascade removes the replaced rows
+            for relation, value in _fingerprint_rows(fingerprint(scraped_data)).items():
+                setattr(entry, relation, value)
+        quiz_id = entry.id
+        db.commit()
+        if scraped_data is not None:
+            quiz_cache.invalidate(quiz_id)      # Title may have changed
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
 
+def find_duplicate_article(scraped_data: dict, threshold: float = ARTICLE_DEDUPE_THRESHOLD):
+    """
+    Fingerprint a freshly scraped article and look for a stored one with the same content:
+    the exact normalized text first, then MinHash LSH candidates (articles sharing a band) scored by
+    fingerprint.near_duplicate_score. Returns (fingerprint, None or {quiz_id, url, similarity}).
+    """
+    fp = fingerprint(scraped_data)
+    if threshold <= 0 or fp["shingles"] == 0:
+        return fp, None
+    db = SessionLocal()
+    try:
+        exact = (
+            db.query(Quiz.id, Quiz.url)
+            .join(ArticleFingerprint, ArticleFingerprint.quiz_id == Quiz.id)
+            .filter(ArticleFingerprint.text_hash == fp["text_hash"])
+            .first()
+        )
+        if exact:
+            return fp, {"quiz_id": exact.id, "url": exact.url, "similarity": 1.0}
+        if fp["shingles"] < MIN_SHINGLES:
+            return fp, None
+
+        # Most shared bands first, a near duplicate shares most of them
+        shared = func.count(ArticleFingerprintBand.band_key)
+        candidate_ids = [
+            r.quiz_id for r in db.query(ArticleFingerprintBand.quiz_id)
+            .filter(ArticleFingerprintBand.band_key.in_(set(fp["bands"])))
+            .group_by(ArticleFingerprintBand.quiz_id)
+            .order_by(shared.desc())
+            .limit(20)
+            .all()
+        ]
+        if not candidate_ids:
+            return fp, None
+        candidates = (
+            db.query(Quiz.id, Quiz.url, ArticleFingerprint.shingles, ArticleFingerprint.simhash, ArticleFingerprint.minhash)
+            .join(ArticleFingerprint, ArticleFingerprint.quiz_id == Quiz.id)
+            .filter(Quiz.id.in_(candidate_ids))
+            .all()
+        )
+        best = None
+        for c in candidates:
+            score = near_duplicate_score(fp, {"shingles": c.shingles, "simhash": c.simhash, "minhash": c.minhash}, threshold)
+            if score is not None and (best is None or score > best["similarity"]):
+                best = {"quiz_id": c.id, "url": c.url, "similarity": score}
+        return fp, best
+    finally:
+        db.close()
+
+def link_duplicate(url: str, duplicate: dict):
+    """Record `url` as another URL of the duplicate's article and return that article's stored data."""
+    db = SessionLocal()
+    try:
+        db.add(ArticleAlias(url_key=normalize_url(url), url=url, quiz_id=duplicate["quiz_id"], similarity=duplicate["similarity"]))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()   # Linked by a concurrent request already
+        data = db.query(ArticleContent.data).filter(ArticleContent.quiz_id == duplicate["quiz_id"]).scalar()
+        return unpack_json(data)
+    finally:
+        db.close()
 
 
+def content_hash(scraped_data: dict):
+    sections = json.dumps(scraped_data.get("sections", []), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(sections.encode("utf-8")).hexdigest()
 
+def quiz_variant_key(scraped_data: dict, difficulty: str, selected_sections=None):
+    """Cache key of one generated quiz: (article content, difficulty, sorted sections, prompt version + context mode)."""
+    variant = {
+        "content_hash": content_hash(scraped_data),
+        "difficulty": difficulty.strip().lower(),
+        "sections": sorted(set(selected_sections or [])),
+        "prompt_version": quiz_prompt_version(),
+    }
+    variant["variant_key"] = hashlib.sha256(json.dumps(variant, sort_keys=True).encode("utf-8")).hexdigest()
+    # Not part of the key: stored so a later revision can tell which of this quiz's sections changed
+    variant["section_hashes"] = scraped_data.get("section_hashes") or section_hashes(scraped_data)
+    return variant
 
+def load_quiz_variant(url: str, variant_key: str):
+    db = SessionLocal()
+    try:
+        existing = _find_article(db, url, (
+            db.query(Quiz.id.label("quiz_id"), GeneratedQuiz.id, GeneratedQuiz.data)
+            .outerjoin(GeneratedQuiz, and_(GeneratedQuiz.quiz_id == Quiz.id, GeneratedQuiz.variant_key == variant_key))
+        ))
+        variant_cache_stats["hits" if existing and existing.data else "misses"] += 1
+        if not existing:
+            return None, None, None
+        return existing.quiz_id, existing.id, (unpack_json(existing.data) if existing.data else None)
+    finally:
+        db.close()
+
+def load_previous_variant(url: str, variant: dict):
+    """
+    Latest stored quiz for the same difficulty, sections and prompt version generated from an earlier revision
+    of the article, as {"quiz", "section_hashes"}, or None. The starting point of incremental.refresh_quiz.
+    """
+    db = SessionLocal()
+    try:
+        article = _find_article(db, url, db.query(Quiz.id))
+        if article is None:
+            return None
+        rows = (
+            db.query(GeneratedQuiz.id, GeneratedQuiz.sections, GeneratedQuiz.section_hashes)
+            .filter(
+                GeneratedQuiz.quiz_id == article.id,
+                GeneratedQuiz.difficulty == variant["difficulty"],
+                GeneratedQuiz.prompt_version == variant["prompt_version"],
+                GeneratedQuiz.content_hash != variant["content_hash"],
+            )
+            .order_by(GeneratedQuiz.id.desc())
+            .limit(20)
+            .all()
+        )
+        # Section lists and JSON nulls compared here, JSON equality differs between databases
+        match = next((r for r in rows if r.section_hashes and sorted(r.sections or []) == variant["sections"]), None)
+        if match is None:
+            return None
+        data = db.query(GeneratedQuiz.data).filter(GeneratedQuiz.id == match.id).scalar()
+        return {"quiz": unpack_json(data), "section_hashes": match.section_hashes}
+    finally:
+        db.close()
+
+def load_variant_quiz(variant_id: int):
+    db = SessionLocal()
+    try:
+        data = db.query(GeneratedQuiz.data).filter(GeneratedQuiz.id == variant_id).scalar()
+        return unpack_json(data) if data else None
+    finally:
+        db.close()
+
+def save_quiz_data(url: str, quiz: dict, variant: dict):
+    db = SessionLocal()
+    try:
+        article = _find_article(db, url, db.query(Quiz.id))
+        if article is None:
+            return None
+        quiz_id = article.id
+        entry = GeneratedQuiz(quiz_id=quiz_id, data=pack_json(quiz), **variant)
+        db.add(entry)   # Every variant is kept, earlier difficulties/sections are not overwritten
+        db.commit()
+        quiz_cache.invalidate(quiz_id)  # Latest variant and variant list of GET /quiz changed
+        return entry.id
+    except IntegrityError:
+        # Same variant was stored by a concurrent request, keep that one
+        db.rollback()
+        return db.query(GeneratedQuiz.id).filter(
+            GeneratedQuiz.quiz_id == quiz_id, GeneratedQuiz.variant_key == variant["variant_key"]
+        ).scalar()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def list_quiz_variants(db, quiz_ids):
+    """Variant metadata (no blobs) for the given article ids, grouped by article id."""
+    variants = {quiz_id: [] for quiz_id in quiz_ids}
+    if not quiz_ids:
+        return variants
+    rows = (
+        db.query(GeneratedQuiz.id, GeneratedQuiz.quiz_id, GeneratedQuiz.difficulty, GeneratedQuiz.sections, GeneratedQuiz.date_generated)
+        .filter(GeneratedQuiz.quiz_id.in_(quiz_ids))
+        .order_by(GeneratedQuiz.id)
+        .all()
+    )
+    for r in rows:
+        variants[r.quiz_id].append(
+            {"id": r.id, "difficulty": r.difficulty, "sections": r.sections or [], "date_generated": r.date_generated}
+        )
+    return variants
+
+
+async def get_or_create_scraped_data(url: str):
+    key = normalize_url(url)
+    # Tasks copy the current context, so the scrape and summary spans nest under this one
+    with span("scraper_service.get_or_create_scraped_data", url=key):
+        task = _inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(_load_or_scrape(url))
+            _inflight[key] = task
+            task.add_done_callback(lambda _: _inflight.pop(key, None))
+        else:
+            cache_stats["coalesced"] += 1
+            print("Scrape already in progress – waiting for it")
+        # shield() keeps a disconnecting client from cancelling the scrape other callers wait on
+        return {**await asyncio.shield(task)}
+
+
+def _is_stale(cached: dict):
+    if ARTICLE_REVALIDATE_SECONDS <= 0:
+        return False
+    checked_at = cached["checked_at"]
+    return checked_at is None or datetime.utcnow() - checked_at > timedelta(seconds=ARTICLE_REVALIDATE_SECONDS)
+
+
+def summary_source(scraped_data: dict):
+    """Text the summary model sees: the whole article, compacted to SUMMARY_TOKEN_BUDGET across all sections."""
+    text, stats = compact_sections(scraped_data["sections"], SUMMARY_TOKEN_BUDGET)
+    print(f"[TOKENS] summary source '{scraped_data['title']}': {describe(stats)}")
+    return text
+
+
+async def _summarize(scraped_data: dict):
+    # Generate summary points for user revision
+    return await generate_summary_points(scraped_data["title"], summary_source(scraped_data))
+
+
+def _revalidate_failed(url: str, key: str, error: Exception):
+    cache_stats["revalidate_errors"] += 1
+    _revalidate_retry_at[key] = time.monotonic() + ARTICLE_REVALIDATE_RETRY_SECONDS
+    print(f"[WARN] Revalidation of {url} failed, serving the stored article: {error!r}")
+
+
+async def _revalidate(url: str, cached: dict):
+    """
+    Conditional re-fetch of a stale cached article, unchanged pages cost a 304. When the fetch or the summary of
+    the changed article fails the stored data is returned, checked_at stays as it was and the URL backs off for
+    ARTICLE_REVALIDATE_RETRY_SECONDS.
+    """
+    scraped_data = cached["data"]
+    key = normalize_url(url)
+    if time.monotonic() < _revalidate_retry_at.get(key, 0):
+        return scraped_data
+    try:
+        fetched = await fetch_article(url, etag=cached["etag"], last_modified=cached["last_modified"])
+    except (httpx.HTTPError, ValueError, etree.LxmlError) as e:
+        _revalidate_failed(url, key, e)
+        return scraped_data
+    if fetched["not_modified"] or content_hash(fetched["data"]) == content_hash(scraped_data):
+        _revalidate_retry_at.pop(key, None)
+        cache_stats["revalidated"] += 1
+        print("Cached article still current")
+        await run_in_threadpool(update_scraped_content, url, None, fetched)
+        return scraped_data
+
+    new_data = fetched["data"]
+    try:
+        # Points about unchanged sections are kept, a mostly rewritten article is summarized again
+        points = await refresh_summary(scraped_data, new_data)
+        new_data["summary_points"] = points if points is not None else await _summarize(new_data)
+    except Exception as e:     # LLMUnavailableError, unparsable answer: the stored article is still worth serving
+        _revalidate_failed(url, key, e)
+        return scraped_data
+    _revalidate_retry_at.pop(key, None)
+    cache_stats["refreshed"] += 1
+    print("Article changed upstream – refreshing stored data")
+    await run_in_threadpool(update_scraped_content, url, new_data, fetched)
+    return new_data
+
+
+async def _load_or_scrape(url: str):
+    try:
+        cached = await run_in_threadpool(load_cached_article, url)
+        if cached is not None:
+            cache_stats["hits"] += 1
+            print("Cache hit – returning stored data")
+            # Revalidated under the article's own URL, a duplicate's page is not the stored text
+            scraped_data = await _revalidate(cached["url"], cached) if _is_stale(cached) else cached["data"]
+            # Return with summary points if available
+            return {**scraped_data, "summary_points": scraped_data.get("summary_points", [])} # Returning {All scraped data, summary_points}
+
+        cache_stats["misses"] += 1
+
+        # Scrape new article
+        fetched = await fetch_article(url)
+        scraped_data = fetched["data"]
+
+        # Same content stored under another URL (redirect, title variant, older revision): reuse that article,
+        # its summary and its quizzes instead of paying for them again
+        fp, duplicate = await run_in_threadpool(find_duplicate_article, scraped_data)
+        if duplicate is not None:
+            cache_stats["deduplicated"] += 1
+            print(f"[DEDUPE] {url} matches {duplicate['url']} (similarity {duplicate['similarity']:.2f}) – reusing its data")
+            stored = await run_in_threadpool(link_duplicate, url, duplicate)
+            return {**stored, "summary_points": stored.get("summary_points", [])}
+
+        # Add summary points to scraped data
+        scraped_data["summary_points"] = await _summarize(scraped_data)
+
+        # Save in DB (returns the already stored row if another process won the insert)
+        scraped_data = await run_in_threadpool(save_scraped_content, url, scraped_data, fetched, fp)
+
+        print("New data scraped and stored!")
+        return scraped_data
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error saving scraped data: {str(e)}")
@@ -0,0 +1,69 @@
+# stream_parser.py
+import json
+from pydantic import ValidationError
+from models import Question
+
+
+class QuizStreamParser:
+    """
+    Incremental scanner over the streamed quiz JSON.
+    feed() receives raw model chunks and returns every question of the top-level "quiz" array
+    that became complete and valid since the last call. Text outside the JSON object
+    (like ```json fences) is ignored.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0                # Next character to scan
+        self.depth = 0              # Nesting of {} and []
+        self.in_string = False
+        self.escape = False
+        self.string_start = None
+        self.last_string = None     # Last string closed at depth 1, a candidate key
+        self.current_key = None     # Key of the value being read at depth 1
+        self.in_quiz = False        # Inside the top-level "quiz" array
+        self.object_start = None    # Start of the question object being read
+
+    def feed(self, chunk: str):
+        self.buffer += chunk
+        questions = []
+        while self.pos < len(self.buffer):
+            ch = self.buffer[self.pos]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    if self.depth == 1:
+                        self.last_string = self.buffer[self.string_start + 1:self.pos]
+            elif ch == '"':
+                self.in_string = True
+                self.string_start = self.pos
+            elif ch == ":" and self.depth == 1:
+                self.current_key = self.last_string
+            elif ch in "{[":
+                if ch == "[" and self.depth == 1 and self.current_key == "quiz":
+                    self.in_quiz = True
+                elif ch == "{" and self.in_quiz and self.depth == 2:
+                    self.object_start = self.pos
+                self.depth += 1
+            elif ch in "}]":
+                self.depth -= 1
+                if ch == "}" and self.in_quiz and self.depth == 2 and self.object_start is not None:
+                    question = self._parse_question(self.buffer[self.object_start:self.pos + 1])
+                    if question is not None:
+                        questions.append(question)
+                    self.object_start = None
+                elif ch == "]" and self.in_quiz and self.depth == 1:
+                    self.in_quiz = False
+            self.pos += 1
+        return questions
+
+    @staticmethod
+    def _parse_question(text: str):
+        try:
+            return Question.model_validate(json.loads(text)).model_dump()
+        except (ValueError, ValidationError):
+            return None     # Incomplete or invalid question, the final parse decides
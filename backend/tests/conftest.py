@@ -0,0 +1,21 @@
+# Tests run against a throwaway SQLite DB and the offline LLM backend: no network, no Gemini key.
+#   cd backend && python -m pytest -q
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test.db")
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("LLM_BACKEND", "synthetic")
+os.environ.setdefault("LLM_SYNTHETIC_LATENCY", "fixed:0")
+for quota, value in (("QUIZ_LLM_RPM", "100000"), ("QUIZ_LLM_TPM", "100000000"), ("SUMMARY_LLM_RPM", "100000"), ("SUMMARY_LLM_TPM", "100000000")):
+    os.environ.setdefault(quota, value)     # Test the code, not the Gemini quota
+
+import pytest
+from database import init_db
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    init_db()
@@ -0,0 +1,68 @@
+import os
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError
+import database
+from database import TimedQueuePool, _engine_options, pool_metrics, pool_stats
+
+MYSQL_URL = os.getenv("TEST_MYSQL_URL")
+
+
+@pytest.mark.parametrize("url", ["sqlite://", "sqlite:///:memory:", "sqlite+pysqlite:///:memory:"])
+def test_in_memory_sqlite_keeps_its_default_pool(url):
+    assert _engine_options(url) == {}
+
+
+@pytest.mark.parametrize("url", ["sqlite:////tmp/quiz.db", "mysql+pymysql://root:pw@db:3306/ai_quiz_db"])
+def test_file_and_server_databases_get_the_timed_pool(url):
+    options = _engine_options(url)
+    assert options["poolclass"] is TimedQueuePool
+    assert options["pool_size"] == database.DB_POOL_SIZE
+    assert options["max_overflow"] == database.DB_MAX_OVERFLOW
+    assert options["pool_timeout"] == database.DB_POOL_TIMEOUT
+    assert options["pool_recycle"] == database.DB_POOL_RECYCLE
+    assert options["pool_pre_ping"] == database.DB_POOL_PRE_PING
+
+
+def single_connection_engine(url):
+    """Engine with the app's pool options, cut to one connection and a short wait so a second checkout times out."""
+    return create_engine(url, **{**_engine_options(url), "pool_size": 1, "max_overflow": 0, "pool_timeout": 0.05})
+
+
+def check_pool_counts_checkouts_and_timeouts(url):
+    engine = single_connection_engine(url)
+    checkouts, timeouts = pool_metrics["checkouts"], pool_metrics["timeouts"]
+    try:
+        with engine.connect() as held:
+            assert held.execute(text("SELECT 1")).scalar() == 1
+            with pytest.raises(TimeoutError):
+                engine.connect()
+        with engine.connect() as conn:     # Back in the pool, checked out again without waiting
+            conn.execute(text("SELECT 1"))
+    finally:
+        engine.dispose()
+    assert pool_metrics["checkouts"] - checkouts == 2
+    assert pool_metrics["timeouts"] - timeouts == 1
+
+
+def test_timed_pool_counts_checkouts_and_timeouts(tmp_path):
+    check_pool_counts_checkouts_and_timeouts(f"sqlite:///{tmp_path}/pool.db")
+
+
+def test_pool_stats_reports_the_app_pool():
+    with database.SessionLocal() as db:
+        db.execute(text("SELECT 1"))
+        stats = pool_stats()
+        assert stats["pool"] == "TimedQueuePool"
+        assert stats["checked_out"] == 1
+    assert pool_stats()["checked_out"] == 0
+    assert stats["size"] == database.DB_POOL_SIZE
+    assert stats["timeout_s"] == database.DB_POOL_TIMEOUT
+    assert stats["checkouts"] >= 1
+    assert 0 <= stats["wait_p50_ms"] <= stats["wait_p95_ms"] <= stats["wait_max_ms"]
+
+
+@pytest.mark.mysql
+@pytest.mark.skipif(not MYSQL_URL, reason="TEST_MYSQL_URL is not set")
+def test_mysql_pool_counts_checkouts_and_timeouts():
+    check_pool_counts_checkouts_and_timeouts(MYSQL_URL)
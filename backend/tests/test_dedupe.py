@@ -0,0 +1,72 @@
+import os
+import sys
+import pytest
+from fingerprint import ARTICLE_DEDUPE_THRESHOLD, MIN_SHINGLES, fingerprint, near_duplicate_score
+from scraper_service import find_duplicate_article, save_scraped_content
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+from dedupe_corpus import Corpus, scraped   # The benchmark's generated articles, Zipf words plus topic words
+
+BASE_URL = "https://en.wikipedia.org/wiki/Dedupe_test_base"
+SHORT_URL = "https://en.wikipedia.org/wiki/Dedupe_test_stub"
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    return Corpus(seed=22)
+
+
+@pytest.fixture(scope="module")
+def base(corpus):
+    article = corpus.article(0)
+    save_scraped_content(BASE_URL, scraped(article))
+    return article
+
+
+def stub(words):
+    return {"title": "Stub", "sections": [{"heading": "Stub", "content": " ".join(words), "subsections": []}], "summary_points": []}
+
+
+def test_fingerprint_ignores_case_and_whitespace(base):
+    assert fingerprint(scraped(base, reformat=True))["text_hash"] == fingerprint(scraped(base))["text_hash"]
+
+
+def test_revision_scores_above_the_threshold(corpus, base):
+    score = near_duplicate_score(fingerprint(scraped(corpus.edited(base, 0.03))), fingerprint(scraped(base)), threshold=0)
+    assert score >= 0.8
+
+
+@pytest.mark.parametrize("kind", ["unrelated", "sibling 40%"])
+def test_different_articles_score_nothing(corpus, base, kind):
+    other = corpus.article(-1) if kind == "unrelated" else corpus.sibling(base, 0.4)
+    assert near_duplicate_score(fingerprint(scraped(other)), fingerprint(scraped(base))) is None
+
+
+def test_exact_duplicate_is_found(base):
+    fp, match = find_duplicate_article(scraped(base, reformat=True))
+    assert match is not None
+    assert (match["url"], match["similarity"]) == (BASE_URL, 1.0)
+    assert fp["shingles"] >= MIN_SHINGLES
+
+
+def test_revision_is_found(corpus, base):
+    _, match = find_duplicate_article(scraped(corpus.edited(base, 0.03)))
+    assert match is not None
+    assert match["url"] == BASE_URL
+    assert ARTICLE_DEDUPE_THRESHOLD <= match["similarity"] < 1.0
+
+
+@pytest.mark.parametrize("kind", ["unrelated", "sibling 40%"])
+def test_different_articles_are_not_matched(corpus, base, kind):
+    other = corpus.article(-1) if kind == "unrelated" else corpus.sibling(base, 0.4)
+    assert find_duplicate_article(scraped(other))[1] is None
+
+
+def test_short_articles_only_match_exactly(corpus):
+    words = corpus.rng.choices(corpus.words[:500], k=MIN_SHINGLES)     # Fewer than MIN_SHINGLES shingles
+    save_scraped_content(SHORT_URL, stub(words))
+    revised = words[:-1] + ["zeppelin"]
+    assert fingerprint(stub(revised))["shingles"] < MIN_SHINGLES
+    assert near_duplicate_score(fingerprint(stub(revised)), fingerprint(stub(words)), threshold=0) is None
+    assert find_duplicate_article(stub(revised))[1] is None
+    assert find_duplicate_article(stub(words))[1]["url"] == SHORT_URL
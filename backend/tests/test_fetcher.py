@@ -0,0 +1,168 @@
+# The fetcher and revalidation against a stub Wikipedia (httpx.MockTransport at WIKI_REST_BASE_URL)
+import asyncio
+import httpx
+import pytest
+import scraper
+import scraper_service
+from scraper import fetch_article, rest_html_url
+from llm_client import LLMUnavailableError
+from scraper_service import get_or_create_scraped_data, load_cached_article
+
+STUB = "http://wiki.stub"
+
+
+def parsoid_page(title, words):
+    sections = "".join(
+        f"<section><h2>{heading}</h2><p>{' '.join(f'{title.lower()}{heading.lower()}{n}' for n in range(words))}.</p></section>"
+        for heading in ("Early life", "Career")
+    )
+    return f"<html><head><title>{title}</title></head><body><p>Lead.</p>{sections}</body></html>"
+
+
+class Stub:
+    """Serves revision `revision` of every page with its ETag, a 304 for a matching If-None-Match, or `fail`."""
+
+    def __init__(self):
+        self.revision = 100
+        self.fail = None
+        self.requests = []
+
+    def __call__(self, request: httpx.Request):
+        self.requests.append(request)
+        if self.fail is not None:
+            return self.fail(request)
+        etag = f'W/"{self.revision}/stub"'
+        if request.headers.get("if-none-match") == etag:
+            return httpx.Response(304, headers={"etag": etag})
+        title = request.url.path.rsplit("/", 1)[-1].replace("_", " ")
+        return httpx.Response(200, text=parsoid_page(title, 20 + self.revision % 7), headers={
+            "etag": etag, "last-modified": "Tue, 01 Oct 2024 12:00:00 GMT", "content-type": "text/html"})
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    monkeypatch.setattr(scraper, "FETCH_BACKEND", "rest")
+    monkeypatch.setattr(scraper, "REST_BASE_URL", STUB)
+    return Stub()
+
+
+def run(stub, coro_fn):
+    async def go():
+        scraper._client = httpx.AsyncClient(transport=httpx.MockTransport(stub))
+        scraper._client_loop = asyncio.get_running_loop()
+        try:
+            return await coro_fn()
+        finally:
+            await scraper.close_client()
+    return asyncio.run(go())
+
+
+def test_rest_url_of_article_links():
+    assert rest_html_url("https://en.wikipedia.org/wiki/Alan_Turing#Legacy")[1] == "Alan Turing"
+    assert rest_html_url("https://en.wikipedia.org/w/index.php?title=Alan_Turing&oldid=1")[0].endswith("/page/html/Alan_Turing")
+    assert rest_html_url("https://en.wikipedia.org/?curid=1208") is None
+    assert rest_html_url("https://en.wikipedia.org/w/index.php?search=turing") is None
+
+
+def test_fetch_captures_validators(stub):
+    fetched = run(stub, lambda: fetch_article("https://en.wikipedia.org/wiki/Ada_Lovelace"))
+    assert str(stub.requests[0].url) == f"{STUB}/api/rest_v1/page/html/Ada_Lovelace"
+    assert fetched["not_modified"] is False
+    assert fetched["etag"] == 'W/"100/stub"'
+    assert fetched["revision_id"] == 100
+    assert fetched["last_modified"] == "Tue, 01 Oct 2024 12:00:00 GMT"
+    assert [s["heading"] for s in fetched["data"]["sections"]] == ["Early Life", "Career"]
+
+
+def test_unchanged_page_is_a_304(stub):
+    fetched = run(stub, lambda: fetch_article("https://en.wikipedia.org/wiki/Ada_Lovelace", etag='W/"100/stub"',
+                                              last_modified="Tue, 01 Oct 2024 12:00:00 GMT"))
+    assert stub.requests[0].headers["if-none-match"] == 'W/"100/stub"'
+    assert stub.requests[0].headers["if-modified-since"] == "Tue, 01 Oct 2024 12:00:00 GMT"
+    assert fetched["not_modified"] is True and fetched["data"] is None
+    assert fetched["etag"] == 'W/"100/stub"' and fetched["revision_id"] == 100
+
+
+def test_url_without_title_uses_the_html_backend(stub):
+    stub.fail = lambda request: httpx.Response(200, text=(
+        "<html><body><h1 id='firstHeading'>Alan Turing</h1><div id='mw-content-text'>"
+        "<h2>Career</h2><p>Worked at Bletchley Park.</p></div></body></html>"))
+    fetched = run(stub, lambda: fetch_article("https://en.wikipedia.org/?curid=1208"))
+    assert str(stub.requests[0].url) == "https://en.wikipedia.org/?curid=1208"
+    assert fetched["data"]["title"] == "Alan Turing"
+
+
+def test_revalidation_reuses_validators(stub, monkeypatch):
+    url = "https://en.wikipedia.org/wiki/Grace_Hopper"
+    run(stub, lambda: get_or_create_scraped_data(url))
+    monkeypatch.setattr(scraper_service, "ARTICLE_REVALIDATE_SECONDS", 1e-9)
+    before = dict(scraper_service.cache_stats)
+    data = run(stub, lambda: get_or_create_scraped_data(url))
+    assert stub.requests[-1].headers["if-none-match"] == 'W/"100/stub"'
+    assert scraper_service.cache_stats["revalidated"] == before["revalidated"] + 1
+    assert data["title"] == "Grace Hopper"
+
+
+def timeout(request):
+    raise httpx.ConnectTimeout("timed out", request=request)
+
+
+@pytest.mark.parametrize("name, failure", [
+    ("Unavailable", lambda request: httpx.Response(503, text="upstream down")),
+    ("Deleted", lambda request: httpx.Response(404, text="gone")),
+    ("Timeout", timeout),
+    ("Unparsable", lambda request: httpx.Response(200, text="<html><head><title>x</title></head></html>", headers={"etag": 'W/"101/stub"'})),
+])
+def test_failed_revalidation_serves_stored_article(stub, monkeypatch, name, failure):
+    url = f"https://en.wikipedia.org/wiki/Revalidation_{name}"
+    stored = run(stub, lambda: get_or_create_scraped_data(url))
+    checked_at = load_cached_article(url)["checked_at"]
+
+    monkeypatch.setattr(scraper_service, "ARTICLE_REVALIDATE_SECONDS", 1e-9)
+    stub.fail = failure
+    errors = scraper_service.cache_stats["revalidate_errors"]
+    data = run(stub, lambda: get_or_create_scraped_data(url))
+    assert data["sections"] == stored["sections"]
+    assert scraper_service.cache_stats["revalidate_errors"] == errors + 1
+    assert load_cached_article(url)["checked_at"] == checked_at
+
+    # Backing off: the next stale hit doesn't try again
+    requests = len(stub.requests)
+    run(stub, lambda: get_or_create_scraped_data(url))
+    assert len(stub.requests) == requests
+
+
+async def unavailable(*args):
+    raise LLMUnavailableError("summary model is unavailable, circuit breaker open", 30)
+
+
+async def garbage(*args):
+    raise ValueError("unparsable summary")
+
+
+async def mostly_rewritten(*args):
+    return None
+
+
+@pytest.mark.parametrize("refresh, summarize", [(unavailable, None), (garbage, None), (mostly_rewritten, unavailable)])
+def test_failed_summary_of_changed_article_serves_stored_article(stub, monkeypatch, refresh, summarize):
+    url = f"https://en.wikipedia.org/wiki/Resummary_{refresh.__name__}"
+    stored = run(stub, lambda: get_or_create_scraped_data(url))
+    checked_at = load_cached_article(url)["checked_at"]
+
+    monkeypatch.setattr(scraper_service, "ARTICLE_REVALIDATE_SECONDS", 1e-9)
+    monkeypatch.setattr(scraper_service, "refresh_summary", refresh)
+    if summarize is not None:
+        monkeypatch.setattr(scraper_service, "_summarize", summarize)
+    stub.revision = 101     # Changed upstream
+    errors, refreshed = scraper_service.cache_stats["revalidate_errors"], scraper_service.cache_stats["refreshed"]
+    data = run(stub, lambda: get_or_create_scraped_data(url))
+    assert data == stored
+    assert scraper_service.cache_stats["revalidate_errors"] == errors + 1
+    assert scraper_service.cache_stats["refreshed"] == refreshed
+    cached = load_cached_article(url)
+    assert (cached["data"]["sections"], cached["checked_at"]) == (stored["sections"], checked_at)
+
+    requests = len(stub.requests)
+    run(stub, lambda: get_or_create_scraped_data(url))
+    assert len(stub.requests) == requests
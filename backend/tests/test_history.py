@@ -0,0 +1,71 @@
+# Keyset pagination of GET /history: (date_generated, id) cursors, newest first
+import base64
+from datetime import datetime, timedelta
+import pytest
+from fastapi.testclient import TestClient
+import main
+from database import SessionLocal, Quiz
+
+client = TestClient(main.app)   # Not entered: no lifespan, the job workers stay off
+NOW = datetime(2024, 6, 1, 12, 0, 0)
+
+
+def add_rows(prefix, dates):
+    """One article row per date, titles "<prefix> <n>", returns the ids in insertion order."""
+    db = SessionLocal()
+    try:
+        rows = [Quiz(url=f"https://en.wikipedia.org/wiki/{prefix}_{n}_{date.timestamp()}", title=f"{prefix} {n}", date_generated=date)
+                for n, date in enumerate(dates)]
+        db.add_all(rows)
+        db.commit()
+        return [r.id for r in rows]
+    finally:
+        db.close()
+
+
+def pages(prefix, limit, between_pages=None):
+    """Every page of the listing filtered to `prefix`, following X-Next-Cursor. between_pages runs after the first."""
+    ids, cursor = [], None
+    while True:
+        params = {"limit": limit, "title_prefix": prefix, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/history", params=params)
+        assert response.status_code == 200
+        ids.append([row["id"] for row in response.json()])
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            return ids
+        if between_pages is not None:
+            between_pages()
+            between_pages = None
+
+
+def test_pages_are_stable_across_inserts():
+    ids = add_rows("Paging stable", [NOW - timedelta(minutes=n) for n in range(7)])
+    inserted = []
+    seen = pages("Paging stable", 3, lambda: inserted.extend(add_rows("Paging stable", [NOW + timedelta(minutes=1), NOW - timedelta(minutes=3)])))
+    assert [len(page) for page in seen] == [3, 3, 2]
+    flat = [i for page in seen for i in page]
+    assert len(flat) == len(set(flat))
+    assert [i for i in flat if i in ids] == ids     # Newest first, nothing skipped
+    # A newer row stays out of later pages, a row inserted below the cursor shows up in its place
+    assert inserted[0] not in flat and inserted[1] in flat
+
+
+def test_rows_sharing_a_date_are_neither_duplicated_nor_skipped():
+    ids = add_rows("Paging ties", [NOW] * 5 + [NOW - timedelta(minutes=1)] * 2)
+    seen = pages("Paging ties", 2)
+    assert [len(page) for page in seen] == [2, 2, 2, 1]
+    flat = [i for page in seen for i in page]
+    assert flat == sorted(ids[:5], reverse=True) + sorted(ids[5:], reverse=True)
+
+
+def cursor_of(raw: str):
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor!", cursor_of("2024-06-01T12:00:00"), cursor_of("yesterday|3"),
+                                    cursor_of("2024-06-01T12:00:00|three"), cursor_of("a|b|c")])
+def test_malformed_cursor_is_a_400(cursor):
+    response = client.get("/history", params={"cursor": cursor})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
@@ -0,0 +1,71 @@
+import asyncio
+import llm_backends
+import main
+from incremental import refresh_quiz, refresh_summary, section_hashes, _merge
+
+HEADINGS = ("Early life", "Career", "Research", "Legacy")
+
+
+def article(revision=0):
+    sections = []
+    for n, heading in enumerate(HEADINGS):
+        text = " ".join(f"The {heading.lower()} involved topic{n}word{k} and related{n}detail{k}." for k in range(12))
+        if revision and heading == "Research":
+            text += f" Revision {revision} added material about zeppelins."
+        sections.append({"heading": heading, "content": text, "subsections": []})
+    return {"title": "Test Page", "sections": sections}
+
+
+def previous_quiz():
+    questions = [{"question": f"Q{n}", "options": ["a", "b", "c", "d"], "answer": "a", "difficulty": "easy",
+                  "explanation": "", "section": HEADINGS[n % len(HEADINGS)]} for n in range(8)]
+    return {"quiz": {"title": "Test Page", "quiz": questions}, "section_hashes": section_hashes(article())}
+
+
+def test_merge_fills_stale_positions_in_place():
+    assert _merge(["a", "b", "c", "d"], [1, 3], ["B", "D"]) == ["a", "B", "c", "D"]
+
+
+def test_refresh_keeps_unchanged_questions():
+    quiz = asyncio.run(refresh_quiz(article(1), "Easy", None, previous_quiz()))
+    old = previous_quiz()["quiz"]["quiz"]
+    assert len(quiz["quiz"]) == 8
+    assert [q for q in quiz["quiz"] if q in old] == [q for q in old if q["section"] != "Research"]
+
+
+def test_short_refresh_answer_falls_back_to_full_generation(monkeypatch):
+    original = llm_backends.synthetic_quiz
+
+    def one_question(text, rng):
+        body = original(text, rng)
+        body["quiz"] = body["quiz"][:1]
+        return body
+    monkeypatch.setattr(llm_backends, "synthetic_quiz", one_question)
+    assert asyncio.run(refresh_quiz(article(1), "Easy", None, previous_quiz())) is None
+
+
+def test_short_summary_answer_falls_back_to_full_summary(monkeypatch):
+    old = {**article(), "summary_points": [f"The research involved topic2word{k} and related2detail{k}." for k in range(3)]
+           + [f"The career involved topic1word{k}." for k in range(7)]}
+    monkeypatch.setattr(llm_backends, "synthetic_summary", lambda text: ["Only one point."])
+    assert asyncio.run(refresh_summary(old, article(1))) is None
+
+
+def test_batch_refreshes_variants_concurrently(monkeypatch):
+    running, peak = [0], [0]
+
+    async def slow_refresh(url, scraped_data, variant, difficulty, sections):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.05)
+        running[0] -= 1
+        return {"title": "Test Page", "quiz": []}
+
+    monkeypatch.setattr(main, "load_scraped_content", lambda url: article(1))
+    monkeypatch.setattr(main, "load_quiz_variant", lambda url, key: (1, None, None))
+    monkeypatch.setattr(main, "save_quiz_data", lambda url, quiz, key: 7)
+    monkeypatch.setattr(main, "refresh_quiz_variant", slow_refresh)
+    variants = [{"difficulty": d, "sections": []} for d in ("Easy", "Medium", "Hard")]
+    result = asyncio.run(main.build_quiz_batch("https://en.wikipedia.org/wiki/Test_Page", variants))
+    assert peak[0] == 3
+    assert [v["variant_id"] for v in result["variants"]] == [7, 7, 7]
@@ -0,0 +1,47 @@
+# Bulk ingestion against the stub Wikipedia of test_fetcher, with a summary model that fails for some articles
+import argparse
+import json
+import llm_backends
+import pytest
+from ingest import ingest
+from scraper_service import existing_url_keys, load_cached_article
+from test_fetcher import run, stub  # noqa: F401 (stub is a fixture)
+from url_normalizer import normalize_url
+
+URLS = ["https://en.wikipedia.org/wiki/Ingest_good", "https://en.wikipedia.org/wiki/Ingest_broken"]
+
+
+def options(tmp_path):
+    return argparse.Namespace(checkpoint=str(tmp_path / "checkpoint.json"), batch_size=10, concurrency=2,
+                              rate=0, workers=1, llm_concurrency=2)
+
+
+@pytest.fixture
+def broken_summaries(monkeypatch):
+    original = llm_backends.synthetic_summary
+
+    def summary(text):
+        if "ingest broken" in text.lower():
+            raise ValueError("model answered garbage")
+        return original(text)
+    monkeypatch.setattr(llm_backends, "synthetic_summary", summary)
+    return monkeypatch
+
+
+def test_failed_summary_is_not_stored_and_retried_on_resume(stub, broken_summaries, tmp_path):
+    args = options(tmp_path)
+    run(stub, lambda: ingest(URLS, args))
+    checkpoint = json.loads((tmp_path / "checkpoint.json").read_text())
+    good, broken = (normalize_url(u) for u in URLS)
+    assert checkpoint["done"] == [good]
+    assert "model answered garbage" in checkpoint["failed"][broken]
+    assert existing_url_keys([good, broken]) == {good}
+    assert "Could not generate summary" not in " ".join(load_cached_article(URLS[0])["data"]["summary_points"])
+
+    broken_summaries.undo()     # The model is back, the resumed run picks up the failed article only
+    stub.requests.clear()
+    run(stub, lambda: ingest(URLS, args))
+    checkpoint = json.loads((tmp_path / "checkpoint.json").read_text())
+    assert sorted(checkpoint["done"]) == sorted([good, broken])
+    assert checkpoint["failed"] == {}
+    assert [r.url.path.rsplit("/", 1)[-1] for r in stub.requests] == ["Ingest_broken"]
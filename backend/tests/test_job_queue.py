@@ -0,0 +1,92 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+import job_queue
+from database import SessionLocal, Job
+from job_queue import JobQueue, MemoryJobBackend, DatabaseJobBackend
+from llm_client import LLMUnavailableError
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_RETRY_MIN_SECONDS", 0)
+    monkeypatch.setattr(job_queue, "JOB_POLL_SECONDS", 0.01)
+    monkeypatch.setattr(job_queue, "JOB_MAX_ATTEMPTS", 3)
+
+
+def run_job(backend, handler):
+    """Runs one job through a single worker until it is finished, returns the stored job."""
+    async def go():
+        queue = JobQueue(backend, concurrency=1)
+        queue.handler("test")(handler)
+        await queue.start()
+        job = await queue.submit("test", {})
+        try:
+            while (await queue.get(job["id"]))["status"] in ("queued", "running"):
+                await asyncio.sleep(0.01)
+        finally:
+            await queue.stop()
+        return await queue.get(job["id"])
+    return asyncio.run(asyncio.wait_for(go(), 10))
+
+
+def throttled(times):
+    calls = []
+    async def handler(payload):
+        calls.append(1)
+        if len(calls) <= times:
+            raise LLMUnavailableError("429 quota", retry_after=0)
+        return {"ok": True}
+    return handler
+
+
+@pytest.mark.parametrize("backend", [MemoryJobBackend, DatabaseJobBackend])
+def test_throttled_job_is_retried(backend):
+    job = run_job(backend(), throttled(2))
+    assert job["status"] == "succeeded"
+    assert job["attempts"] == 3
+    assert job["result"] == {"ok": True}
+
+
+@pytest.mark.parametrize("backend", [MemoryJobBackend, DatabaseJobBackend])
+def test_throttled_job_gives_up_after_max_attempts(backend):
+    job = run_job(backend(), throttled(10))
+    assert job["status"] == "failed"
+    assert job["attempts"] == 3
+    assert "429" in job["error"]
+
+
+@pytest.mark.parametrize("backend", [MemoryJobBackend, DatabaseJobBackend])
+def test_other_errors_fail_at_once(backend):
+    async def handler(payload):
+        raise ValueError("bad payload")
+    job = run_job(backend(), handler)
+    assert job["status"] == "failed"
+    assert job["attempts"] == 1
+    assert job["error"] == "bad payload"
+
+
+def expire_backoff(backend, job_id):
+    past = datetime.utcnow() - timedelta(seconds=1)
+    if isinstance(backend, MemoryJobBackend):
+        backend.jobs[job_id]["not_before"] = past
+        return
+    db = SessionLocal()
+    try:
+        db.query(Job).filter(Job.id == job_id).update({"not_before": past})
+        db.commit()
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("backend", [MemoryJobBackend, DatabaseJobBackend])
+def test_retried_job_waits_for_not_before(backend):
+    backend = backend()
+    job = backend.enqueue("test", {})
+    assert backend.claim("w")["id"] == job["id"]
+    backend.retry(job["id"], "w", "429 quota", delay=60)
+    assert backend.claim("w") is None
+    assert backend.get(job["id"])["status"] == "queued"
+    expire_backoff(backend, job["id"])
+    claimed = backend.claim("w")
+    assert claimed["id"] == job["id"] and claimed["attempts"] == 2
@@ -0,0 +1,134 @@
+import asyncio
+import time
+import pytest
+import llm_client
+from llm_client import CircuitBreaker, LLMClient, LLMUnavailableError
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"{status_code} from fake model")
+        self.status_code = status_code
+
+
+class FakeModel:
+    """Plays a script of outcomes, one per call: an exception to raise or the seconds to wait before answering."""
+
+    def __init__(self, *script, default=0.0):
+        self.script = list(script)
+        self.default = default
+        self.calls = 0
+
+    async def ainvoke(self, inputs):
+        self.calls += 1
+        outcome = self.script.pop(0) if self.script else self.default
+        if isinstance(outcome, Exception):
+            raise outcome
+        await asyncio.sleep(outcome)
+        return f"answer {self.calls}"
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(llm_client, "LLM_BACKOFF_BASE", 0)
+    monkeypatch.setattr(llm_client, "LLM_BACKOFF_MAX", 0.01)
+
+
+def client(threshold=5, **kwargs):
+    llm = LLMClient("test", rpm=100000, tpm=100000000, **kwargs)
+    llm.breaker = CircuitBreaker(threshold, reset_seconds=0.05)
+    return llm
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_retryable_errors_are_retried(status):
+    llm, model = client(), FakeModel(FakeAPIError(status), FakeAPIError(status))
+    assert asyncio.run(llm.ainvoke(model, {"q": "x"})) == "answer 3"
+    assert (model.calls, llm.stats["retries"]) == (3, 2)
+
+
+def test_client_errors_are_not_retried():
+    llm, model = client(), FakeModel(FakeAPIError(400))
+    with pytest.raises(FakeAPIError):
+        asyncio.run(llm.ainvoke(model, {"q": "x"}))
+    assert (model.calls, llm.stats["retries"], llm.breaker.failures) == (1, 0, 0)
+
+
+def test_throttling_halves_the_rate_and_success_recovers_it():
+    llm = client()
+    asyncio.run(llm.ainvoke(FakeModel(FakeAPIError(429), FakeAPIError(429)), {"q": "x"}))
+    assert llm.rate_factor == pytest.approx(0.25 + 0.05)
+    assert llm.requests.rate == pytest.approx(llm.requests.max_rate * llm.rate_factor)
+    assert llm.token_bucket.rate == pytest.approx(llm.token_bucket.max_rate * llm.rate_factor)
+    assert (llm.stats["throttled"], llm.breaker.failures) == (2, 0)    # Over quota is not an outage
+
+
+def test_throttling_never_drops_below_a_tenth():
+    llm = client(max_retries=6)
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(llm.ainvoke(FakeModel(*[FakeAPIError(429)] * 7), {"q": "x"}))
+    assert llm.rate_factor == 0.1
+
+
+def test_exhausted_retries_raise_unavailable_with_retry_after():
+    llm = client(max_retries=1)
+    with pytest.raises(LLMUnavailableError) as raised:
+        asyncio.run(llm.ainvoke(FakeModel(FakeAPIError(503), FakeAPIError(503)), {"q": "x"}))
+    assert raised.value.retry_after == llm_client.LLM_BACKOFF_MAX
+    assert llm.stats["failures"] == 1
+
+
+def test_breaker_opens_then_lets_one_probe_through():
+    llm, model = client(threshold=2, max_retries=0), FakeModel(FakeAPIError(503), FakeAPIError(503))
+    for _ in range(2):
+        with pytest.raises(LLMUnavailableError):
+            asyncio.run(llm.ainvoke(model, {"q": "x"}))
+    assert llm.breaker.state == "open"
+
+    with pytest.raises(LLMUnavailableError) as raised:
+        asyncio.run(llm.ainvoke(model, {"q": "x"}))
+    assert model.calls == 2     # Failed fast, the model was not called
+    assert raised.value.retry_after >= 1.0
+    assert llm.stats["rejected"] == 1
+
+    time.sleep(0.06)
+    assert llm.breaker.state == "half_open"
+    assert asyncio.run(llm.ainvoke(model, {"q": "x"})) == "answer 3"
+    assert (llm.breaker.state, llm.breaker.opened) == ("closed", 1)
+
+
+def test_failed_probe_reopens_the_breaker():
+    llm, model = client(threshold=2, max_retries=0), FakeModel(*[FakeAPIError(503)] * 3)
+    for _ in range(2):
+        with pytest.raises(LLMUnavailableError):
+            asyncio.run(llm.ainvoke(model, {"q": "x"}))
+    time.sleep(0.06)
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(llm.ainvoke(model, {"q": "x"}))
+    assert (model.calls, llm.breaker.state, llm.breaker.opened) == (3, "open", 2)
+
+
+def test_half_open_breaker_allows_a_single_probe():
+    breaker = CircuitBreaker(threshold=1, reset_seconds=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.check("test")
+    with pytest.raises(LLMUnavailableError):
+        breaker.check("test")
+
+
+def test_hedges_calls_slower_than_the_percentile():
+    llm, model = client(hedge_percentile=90), FakeModel(0.5, default=0)
+    llm.latencies.extend([0.01] * llm_client.HEDGE_MIN_SAMPLES)
+    start = time.monotonic()
+    assert asyncio.run(llm.ainvoke(model, {"q": "x"})) == "answer 2"
+    assert time.monotonic() - start < 0.4
+    assert (model.calls, llm.stats["hedged"], llm.stats["hedge_wins"]) == (2, 1, 1)
+
+
+def test_no_hedge_below_the_percentile_or_without_samples():
+    llm, model = client(hedge_percentile=90), FakeModel(0.05, default=0.05)
+    assert asyncio.run(llm.ainvoke(model, {"q": "x"})) == "answer 1"     # Too few samples to know the pXX
+    llm.latencies.extend([0.2] * llm_client.HEDGE_MIN_SAMPLES)
+    assert asyncio.run(llm.ainvoke(model, {"q": "x"})) == "answer 2"
+    assert llm.stats["hedged"] == 0
@@ -0,0 +1,63 @@
+import asyncio
+import pytest
+import llm_backends
+import llm_quiz_generator
+import vector_service
+from llm_quiz_generator import generate_quiz_batch, match_variants
+from models import QuizVariantOutput
+
+ARTICLE = {
+    "title": "Test Article",
+    "sections": [
+        {"heading": heading, "content": f"{heading} of the subject was documented in detail. " * 40, "subsections": []}
+        for heading in ("Early life", "Career", "Legacy")
+    ],
+}
+REQUESTED = [
+    {"difficulty": "Easy", "sections": []},
+    {"difficulty": "Hard", "sections": ["Career", "Legacy"]},
+    {"difficulty": "Medium", "sections": ["Career"]},
+]
+
+
+def answer(difficulty, scope):
+    return QuizVariantOutput(difficulty=difficulty, scope=scope, quiz=[])
+
+
+def test_variants_are_matched_by_difficulty_and_scope():
+    answered = [answer("medium", "career"), answer("Easy", "All"), answer("HARD", "Legacy;  Career")]
+    matched = match_variants(REQUESTED, answered)
+    assert [a.difficulty for a in matched] == ["Easy", "HARD", "medium"]
+
+
+def test_missing_or_mislabeled_variant_is_an_error():
+    with pytest.raises(ValueError):
+        match_variants(REQUESTED, [answer("Easy", "All"), answer("Hard", "Career; Legacy"), answer("Hard", "Career")])
+
+
+def test_reordered_batch_answer_is_stored_under_the_right_variant(monkeypatch):
+    original = llm_backends.synthetic_quiz
+
+    def reversed_quiz(text, rng):
+        body = original(text, rng)
+        body["variants"].reverse()
+        return body
+    monkeypatch.setattr(llm_backends, "synthetic_quiz", reversed_quiz)
+
+    quizzes = asyncio.run(generate_quiz_batch(ARTICLE["title"], ARTICLE, REQUESTED))
+    assert [q["quiz"][0]["difficulty"] for q in quizzes] == ["easy", "hard", "medium"]
+
+
+def test_batch_context_follows_retrieval_mode(monkeypatch):
+    calls = []
+
+    def fake_select_context(structured_content, query, budget, selected_sections, headings):
+        calls.append(selected_sections)
+        return "[Career] Retrieved text."
+    monkeypatch.setattr(llm_quiz_generator, "CONTEXT_MODE", "retrieval")
+    monkeypatch.setattr(llm_quiz_generator, "RETRIEVAL_TOKEN_BUDGET", 50)
+    monkeypatch.setattr(vector_service, "select_context", fake_select_context)
+
+    quizzes = asyncio.run(generate_quiz_batch(ARTICLE["title"], ARTICLE, REQUESTED[1:]))
+    assert calls == [["Career", "Legacy"]]
+    assert len(quizzes) == 2
@@ -0,0 +1,93 @@
+# Strong ETags, 304s, content negotiation and invalidation of GET /quiz/{id} and GET /history
+import gzip
+import json
+import pytest
+from fastapi.testclient import TestClient
+import main
+import response_cache
+from scraper_service import load_quiz_variant, quiz_variant_key, save_quiz_data, save_scraped_content
+
+client = TestClient(main.app)   # Not entered: no lifespan, the job workers stay off
+IDENTITY = {"Accept-Encoding": "identity"}
+
+
+def quiz(difficulty):
+    questions = [{"question": f"Which statement about topic {n} is accurate for the {difficulty} quiz?",
+                  "options": [f"Option {k} describing topic {n} at some length" for k in range(4)],
+                  "answer": f"Option 0 describing topic {n} at some length", "difficulty": difficulty.lower(),
+                  "explanation": f"Topic {n} is explained in the article."} for n in range(10)]
+    return {"title": "Cache Test", "quiz": questions}
+
+
+@pytest.fixture
+def stored(request):
+    """An article with one Easy quiz variant, returns (url, data, quiz_id)."""
+    url = f"https://en.wikipedia.org/wiki/Cache_{request.node.name.replace('[', '_').rstrip(']')}"
+    data = {"title": "Cache Test", "sections": [{"heading": "Intro", "content": " Some text.", "subsections": []}],
+            "summary_points": []}
+    save_scraped_content(url, data)
+    variant = quiz_variant_key(data, "Easy", None)
+    save_quiz_data(url, quiz("Easy"), variant)
+    return url, data, load_quiz_variant(url, variant["variant_key"])[0]
+
+
+@pytest.mark.parametrize("path", ["/quiz/{id}", "/history"])
+def test_matching_etag_is_a_304(stored, path):
+    path = path.format(id=stored[2])
+    first = client.get(path, headers=IDENTITY)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert etag.startswith('"') and not etag.startswith("W/")   # Strong
+    again = client.get(path, headers={**IDENTITY, "If-None-Match": etag})
+    assert (again.status_code, again.content, again.headers["etag"]) == (304, b"", etag)
+
+
+def test_encoded_etag_validates_too(stored):
+    path = f"/quiz/{stored[2]}"
+    etag = client.get(path, headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    assert etag.endswith('-gzip"')
+    assert client.get(path, headers={**IDENTITY, "If-None-Match": etag}).status_code == 304
+
+
+@pytest.mark.parametrize("path", ["/quiz/{id}", "/history"])
+def test_new_variant_changes_the_etag(stored, path):
+    url, data, quiz_id = stored
+    path = path.format(id=quiz_id)
+    before = client.get(path, headers=IDENTITY)     # Also puts /quiz in the response cache
+    save_quiz_data(url, quiz("Hard"), quiz_variant_key(data, "Hard", None))
+    after = client.get(path, headers={**IDENTITY, "If-None-Match": before.headers["etag"]})
+    assert after.status_code == 200
+    assert after.headers["etag"] != before.headers["etag"]
+    if path.startswith("/quiz"):
+        assert after.json()["quiz_data"]["quiz"][0]["difficulty"] == "hard"    # Not the cached Easy body
+
+
+def test_gzip_when_the_client_accepts_it(stored):
+    response = client.get(f"/quiz/{stored[2]}", headers={"Accept-Encoding": "gzip, deflate"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json()["quiz_data"]["title"] == "Cache Test"    # httpx decoded it
+
+
+def test_brotli_preferred_when_available(stored):
+    pytest.importorskip("brotli")
+    response = client.get(f"/quiz/{stored[2]}", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+
+
+@pytest.mark.parametrize("accept", [None, "identity", "gzip;q=0", "br"])
+def test_no_compressed_body_unless_asked_for(stored, monkeypatch, accept):
+    monkeypatch.setattr(response_cache, "brotli", None)     # "br" alone can't be served then
+    path = f"/quiz/{stored[2]}"
+    client.get(path, headers={"Accept-Encoding": "gzip"})   # The gzip encoding is cached alongside the body now
+    with client.stream("GET", path, headers={"Accept-Encoding": accept or ""}) as response:
+        raw = b"".join(response.iter_raw())
+    assert "content-encoding" not in response.headers
+    assert json.loads(raw)["quiz_data"]["title"] == "Cache Test"
+    assert raw[:2] != b"\x1f\x8b"   # Not gzip
+
+
+def test_gzip_bytes_are_stable_for_the_etag():
+    body = b"x" * 4096
+    assert response_cache._compress(body, "gzip") == response_cache._compress(body, "gzip")
+    assert gzip.decompress(response_cache._compress(body, "gzip")) == body
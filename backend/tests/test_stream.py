@@ -0,0 +1,56 @@
+# PUT /generate_quiz/stream: the quiz is saved even when the client leaves, timings only count the model
+import asyncio
+import json
+import main
+import timings
+from llm_quiz_generator import stream_quiz
+from scraper_service import load_quiz_variant, quiz_variant_key, save_scraped_content
+
+
+def article(title):
+    sections = [{"heading": heading, "content": " ".join(f"The {heading.lower()} covered point{k} in depth." for k in range(15)),
+                 "subsections": []} for heading in ("Background", "Design", "Reception")]
+    return {"title": title, "sections": sections, "summary_points": ["A point."]}
+
+
+def events(chunks):
+    return [(e.split("\n")[0].removeprefix("event: "), json.loads(e.split("\n")[1].removeprefix("data: "))) for e in chunks]
+
+
+def test_stream_sends_questions_then_the_saved_quiz():
+    url = "https://en.wikipedia.org/wiki/Stream_complete"
+    save_scraped_content(url, article("Stream complete"))
+
+    async def go():
+        response = await main.generate_quiz_stream(main.QuizRequest(url=url, difficulty="Easy"))
+        return [chunk async for chunk in response.body_iterator]
+    received = events(asyncio.run(go()))
+    assert {kind for kind, _ in received[:-1]} == {"question"}
+    kind, done = received[-1]
+    assert kind == "done" and done["cached"] is False and done["variant_id"] is not None
+    assert len(done["quiz"]["quiz"]) == len(received) - 1
+
+
+def test_quiz_is_saved_when_the_client_disconnects():
+    url = "https://en.wikipedia.org/wiki/Stream_disconnect"
+    data = article("Stream disconnect")
+    save_scraped_content(url, data)
+
+    async def go():
+        response = await main.generate_quiz_stream(main.QuizRequest(url=url, difficulty="Hard"))
+        first = await response.body_iterator.__anext__()
+        await response.body_iterator.aclose()     # What Starlette does when the client goes away
+        await asyncio.gather(*main._stream_tasks)
+        return first
+    assert asyncio.run(go()).startswith("event: question")
+    _, variant_id, quiz = load_quiz_variant(url, quiz_variant_key(data, "Hard", None)["variant_key"])
+    assert variant_id is not None and quiz["quiz"]
+
+
+def test_model_stage_excludes_time_spent_by_the_consumer():
+    async def go():
+        async for kind, _ in stream_quiz("Slow reader", article("Slow reader"), "Medium"):
+            if kind == "question":
+                await asyncio.sleep(0.05)   # The consumer holds each question
+    asyncio.run(go())
+    assert timings.stage_samples["quiz_stream.model"][-1] < 50
@@ -0,0 +1,56 @@
+# timings.py
+# Per-stage latency of the LLM request path (prompt rendering, model call, parsing).
+# Every request logs its stages, the last samples per stage are kept for /llm_stats,
+# every sample also goes to the quiz_stage_seconds histogram of /metrics and, when tracing is on, is a span.
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from metrics import stage_seconds, span
+
+SAMPLES = 500
+
+stage_samples = defaultdict(lambda: deque(maxlen=SAMPLES))   # "quiz.model" -> recent durations in ms
+stage_counts = defaultdict(int)
+
+
+class StageTimer:
+    """Times the stages of one request: `with timer.stage("render"): ...`, then `timer.summary()` for the log."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, stage: str):
+        start = time.perf_counter()
+        try:
+            with span(f"{self.name}.{stage}"):
+                yield
+        finally:
+            self.record(stage, (time.perf_counter() - start) * 1000)
+
+    def record(self, stage: str, ms: float):
+        """A stage timed by the caller, e.g. the model time of a stream without the time spent in its consumer."""
+        stage_seconds.observe(ms / 1000, self.name, stage)
+        self.stages[stage] = round(ms, 2)
+        stage_samples[f"{self.name}.{stage}"].append(ms)
+        stage_counts[f"{self.name}.{stage}"] += 1
+
+    def summary(self):
+        return " | ".join(f"{stage} {ms}ms" for stage, ms in self.stages.items())
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def stage_stats():
+    return {
+        key: {
+            "count": stage_counts[key],
+            "p50_ms": round(percentile(samples, 50), 2),
+            "p95_ms": round(percentile(samples, 95), 2),
+            "max_ms": round(max(samples), 2),
+        }
+        for key, samples in stage_samples.items() if samples
+    }
@@ -0,0 +1,25 @@
+# tokens.py
+import re
+
+# Word pieces, digit runs and single punctuation marks, roughly how SentencePiece/BPE tokenizers cut text
+_PIECES = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Local approximation of the Gemini token count, no tokenizer download needed.
+    Common words are one token, long words one per ~6 letters, numbers one per 3 digits,
+    every punctuation mark and non-Latin character one token.
+    """
+    if not text:
+        return 0
+    count = 0
+    for piece in _PIECES.findall(text):
+        first = piece[0]
+        if first.isdigit():
+            count += (len(piece) + 2) // 3
+        elif first.isascii() and first.isalpha():
+            count += (len(piece) + 5) // 6
+        else:
+            count += 1
+    return max(1, count)
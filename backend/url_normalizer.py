@@ -0,0 +1,25 @@
+# url_normalizer.py
+import re
+from urllib.parse import urlsplit, urlunsplit, unquote, parse_qs
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical cache key for a Wikipedia article URL.
+    Alan_Turing, Alan%20Turing, en.m.wikipedia.org links, index.php?title=... links
+    and #fragment variants all map to https://en.wikipedia.org/wiki/Alan_Turing
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower().replace(".m.wikipedia.org", ".wikipedia.org")  # Mobile site -> desktop
+
+    if parts.path.startswith("/wiki/"):
+        title = parts.path[len("/wiki/"):]
+    else:
+        title = parse_qs(parts.query).get("title", [""])[0]   # /w/index.php?title=Alan_Turing
+
+    if not title:   # Not an article link, only drop the fragment and normalize scheme/host
+        return urlunsplit(("https", host, parts.path.rstrip("/"), parts.query, ""))
+
+    title = re.sub(r"[ _]+", "_", unquote(title)).strip("_")
+    title = title[:1].upper() + title[1:]   # MediaWiki always capitalizes the first letter
+    return f"https://{host}/wiki/{title}"
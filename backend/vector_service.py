@@ -1,7 +1,44 @@
 # vector_service.py
+import hashlib
+import json
+import threading
+import numpy as np
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
 from langchain_community.embeddings import HuggingFaceEmbeddings
+from sqlalchemy.exc import IntegrityError
+from database import SessionLocal, ArticleIndex
+from compression import pack_json, unpack_json
+from tokens import estimate_tokens
+from index_cache import index_cache
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L3-v2"  # lighter than paraphrase model
+EMBED_BATCH_SIZE = 64   # Chunks per forward pass
+
+_embedding_model = None
+_embedding_lock = threading.Lock()
+
+
+def _text_splitter():
+    return RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200,
+        separators=["\n\n", "\n", ".", "!", "?"]
+    )
+
+def _embeddings():
+    """Process-wide embedding model, the weights are loaded once on first use."""
+    global _embedding_model
+    if _embedding_model is None:
+        with _embedding_lock:
+            if _embedding_model is None:
+                # Ultra-tiny multilingual embedding model
+                _embedding_model = HuggingFaceEmbeddings(
+                    model_name=EMBEDDING_MODEL,
+                    cache_folder="/tmp",  # helps Render memory management
+                    encode_kwargs={"batch_size": EMBED_BATCH_SIZE}
+                )
+    return _embedding_model
 
 
 def build_faiss_index(article_text: str):
@@ -10,19 +47,109 @@ def build_faiss_index(article_text: str):
     - Free and low-memory (<200MB total usage)
     - Ideal for Render free tier (512MB)
     """
+    chunks = _text_splitter().split_text(article_text)
+    vector_store = FAISS.from_texts(chunks, embedding=_embeddings())
+    return vector_store, chunks
 
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200,
-        separators=["\n\n", "\n", ".", "!", "?"]
-    )
-    chunks = text_splitter.split_text(article_text)
 
-    # Ultra-tiny multilingual embedding model
-    embeddings = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/all-MiniLM-L3-v2",  # lighter than paraphrase model
-        cache_folder="/tmp"  # helps Render memory management
-    )
+def chunk_article(structured_content: dict):
+    """Split every section (with its subsections) into chunks tagged with the section heading."""
+    splitter = _text_splitter()
+    chunks = []
+    for s in structured_content.get("sections", []):
+        text = (s.get("content", "")) + " " + " ".join(sub.get("content", "") for sub in s.get("subsections", []))
+        for piece in splitter.split_text(text.strip()):
+            chunks.append({"section": s["heading"], "text": piece})
+    return chunks
 
-    vector_store = FAISS.from_texts(chunks, embedding=embeddings)
-    return vector_store, chunks
+def article_index_key(structured_content: dict):
+    raw = json.dumps(structured_content.get("sections", []), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def build_article_index(chunks):
+    """Embed the chunks in batches, rows are L2-normalized so a dot product is the cosine similarity."""
+    texts = [c["text"] for c in chunks]
+    model = _embeddings()
+    vectors = np.vstack([
+        np.asarray(model.embed_documents(texts[i:i + EMBED_BATCH_SIZE]), dtype=np.float32)
+        for i in range(0, len(texts), EMBED_BATCH_SIZE)
+    ])
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+    return vectors.astype(np.float16)     # Half precision keeps the stored index small
+
+
+def get_article_index(structured_content: dict):
+    """
+    Chunks + embedding matrix of an article. Built once per article content and embedding model,
+    persisted in article_indexes, and kept in the in-memory LRU (index_cache) while it is hot.
+    """
+    key = article_index_key(structured_content)
+    cached = index_cache.get((key, EMBEDDING_MODEL))
+    if cached is not None:
+        return cached
+
+    db = SessionLocal()
+    try:
+        stored = db.query(ArticleIndex.dim, ArticleIndex.chunks, ArticleIndex.embeddings).filter(
+            ArticleIndex.content_hash == key, ArticleIndex.model_name == EMBEDDING_MODEL
+        ).first()
+        if stored:
+            chunks = unpack_json(stored.chunks)
+            vectors = np.frombuffer(stored.embeddings, dtype=np.float16).reshape(-1, stored.dim)
+            index_cache.put((key, EMBEDDING_MODEL), chunks, vectors)
+            return chunks, vectors
+
+        chunks = chunk_article(structured_content)
+        vectors = build_article_index(chunks) if chunks else np.zeros((0, 1), dtype=np.float16)
+        db.add(ArticleIndex(
+            content_hash=key,
+            model_name=EMBEDDING_MODEL,
+            dim=vectors.shape[1],
+            chunks=pack_json(chunks),
+            embeddings=vectors.tobytes()
+        ))
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()   # Built concurrently by another request, same content so same vectors
+        index_cache.put((key, EMBEDDING_MODEL), chunks, vectors)
+        return chunks, vectors
+    finally:
+        db.close()
+
+
+def select_context(structured_content: dict, query: str, token_budget: int, selected_sections=None, headings: bool = False):
+    """
+    Token-budgeted, section-diverse subset of the article for the quiz prompt.
+    Sections take turns (best matching section first), each contributing its next most
+    relevant chunk, so the budget is spread over the article instead of one section.
+    Picked chunks are returned in article order, prefixed with "[Heading] " when headings=True.
+    """
+    chunks, vectors = get_article_index(structured_content)
+    allowed = [i for i, c in enumerate(chunks) if not selected_sections or c["section"] in selected_sections]
+    if not allowed:
+        return ""
+
+    query_vector = np.asarray(_embeddings().embed_query(query), dtype=np.float32)
+    query_vector /= np.linalg.norm(query_vector) + 1e-12
+    scores = vectors[allowed].astype(np.float32) @ query_vector
+
+    # Per-section queues, most relevant chunk first
+    queues = {}
+    for i, score in sorted(zip(allowed, scores), key=lambda item: -item[1]):
+        queues.setdefault(chunks[i]["section"], []).append(i)
+
+    picked, used = [], 0
+    while queues:
+        for section in list(queues):
+            i = queues[section].pop(0)
+            cost = estimate_tokens(chunks[i]["text"])
+            if used + cost <= token_budget:
+                picked.append(i)
+                used += cost
+            if not queues[section]:
+                del queues[section]
+
+    if headings:
+        return "\n".join(f"[{chunks[i]['section']}] {chunks[i]['text']}" for i in sorted(picked))
+    return "\n".join(chunks[i]["text"] for i in sorted(picked))
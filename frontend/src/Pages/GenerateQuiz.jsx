@@ -94,20 +94,24 @@ export default function GenerateQuiz() {
       // 🕐 Step 2: Wait briefly to ensure DB commit on Render
       await new Promise((res) => setTimeout(res, 800));
 
-      // 🧾 Step 3: Fetch /history and find matching record by URL
-      const historyResponse = await fetch(
-        "https://ai-quiz-generator-dqj9.onrender.com/history"
-      );
-      const history = await historyResponse.json();
-
-      const matchedQuiz = history.find((q) => q.url === url);
+      // 🧾 Step 3: Use the record id returned by the backend, fall back to searching /history by URL
+      let matchedQuiz = quizData.quiz_id ? { id: quizData.quiz_id } : null;
+      if (!matchedQuiz) {
+        const historyResponse = await fetch(
+          "https://ai-quiz-generator-dqj9.onrender.com/history"
+        );
+        const history = await historyResponse.json();
+        matchedQuiz = history.find((q) => q.url === url);
+      }
 
       // 🚀 Step 4: Navigate to quiz display with correct ID
       if (matchedQuiz) {
         setQuiz(quizData.quiz);
         setCheckingStatus("SUCCESS");
         setModalOpen(false);
-        navigate(`/quiz/${matchedQuiz.id}`, { state: { quiz: quizData.quiz } });
+        // Pin the variant just returned, /quiz/{id} alone shows the latest one (maybe another difficulty or sections)
+        const variantQuery = quizData.variant_id ? `?variant_id=${quizData.variant_id}` : "";
+        navigate(`/quiz/${matchedQuiz.id}${variantQuery}`, { state: { quiz: quizData.quiz } });
         return;
       }
 
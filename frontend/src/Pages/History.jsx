@@ -4,9 +4,21 @@ import { Link, useNavigate } from "react-router-dom";
 
 export default function History() {
     const [rows, setRows] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const navigate = useNavigate();
+
+    // Loads the next page and appends it to the table
+    const loadPage = (cursor = null) => {
+        getHistory(cursor)
+            .then(({ rows: page, nextCursor }) => {
+                setRows((prev) => (cursor ? [...prev, ...page] : page));
+                setNextCursor(nextCursor);
+            })
+            .catch(() => alert("Failed to load history"));
+    };
+
     useEffect(() => {
-        getHistory().then(setRows).catch(() => alert("Failed to load history"));
+        loadPage();
     }, []);
 
     return (
@@ -79,6 +91,18 @@ export default function History() {
                     </tbody>
                 </table>
             </div>
+
+            {/* Pagination */}
+            {nextCursor && (
+                <div className="flex justify-center mt-4">
+                    <button
+                        onClick={() => loadPage(nextCursor)}
+                        className="bg-slate-700 hover:bg-slate-600 text-slate-100 px-4 py-2 rounded-lg shadow transition"
+                    >
+                        Load more
+                    </button>
+                </div>
+            )}
         </div>
     );
 }
@@ -1,22 +1,24 @@
 import { useEffect, useState } from "react";
-import { useLocation, useParams, useNavigate } from "react-router-dom";
+import { useLocation, useParams, useNavigate, useSearchParams } from "react-router-dom";
 import { getQuizById } from "../services/api";
 import QuizDisplay from "../components/QuizDisplay";
 
 export default function QuizDetail() {
     const { id } = useParams();
+    const [searchParams] = useSearchParams();
+    const variantId = searchParams.get("variant_id"); // The variant just generated, null = latest
     // const { state } = useLocation(); // may contain { quiz }
     const [quiz, setQuiz] = useState(null);
     const navigate = useNavigate();
 
     useEffect(() => {
         if (!quiz) {
-            getQuizById(id)
+            getQuizById(id, variantId)
                 .then((data) => setQuiz(data))
                 .catch(() => setError("Failed to load quiz. Please try again."))
                 .finally(console.log("Got the individual quiz data"));
         }
-    }, [id]);
+    }, [id, variantId]);
 
     return (
         <div className="min-h-screen p-4 max-w-3xl mx-auto">
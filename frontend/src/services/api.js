@@ -58,14 +58,18 @@ export async function generateQuiz(payload) {
   }
 }
 
-//  Fetch all saved quizzes
-export const getHistory = async () => {
-  const { data } = await axios.get(`${API_BASE}/history`);
-  return data; // [{id,url,title,date_generated}, ...]
+//  Fetch one page of saved quizzes (newest first)
+export const getHistory = async (cursor = null) => {
+  const { data, headers } = await axios.get(`${API_BASE}/history`, {
+    params: cursor ? { cursor } : {},
+  });
+  return { rows: data, nextCursor: headers["x-next-cursor"] || null }; // rows: [{id,url,title,date_generated,variants}, ...]
 };
 
-//  Fetch quiz by ID
-export const getQuizById = async (id) => {
-  const { data } = await axios.get(`${API_BASE}/quiz/${id}`);
+//  Fetch quiz by ID, the given variant or the latest one when variantId is null
+export const getQuizById = async (id, variantId = null) => {
+  const { data } = await axios.get(`${API_BASE}/quiz/${id}`, {
+    params: variantId ? { variant_id: variantId } : {},
+  });
   return data; // full quiz JSON
 };